@@ -1,3 +1,6 @@
+import os
+import json
+import time
 from config.settings import API_KEY
 import google.generativeai as genai
 
@@ -6,6 +9,11 @@ if not API_KEY or not isinstance(API_KEY, str):
     raise EnvironmentError("Missing or invalid API key. Please set 'API_KEY' in the configuration properly.")
 genai.configure(api_key=API_KEY)
 
+# Per-call metrics in the same format as the back-end scripts (back-end/aiMetrics.py).
+# AI_METRICS_FILE appends one JSON line per call; AI_METRICS=0 turns them off.
+METRICS_ENABLED = os.getenv("AI_METRICS", "1") != "0"
+METRICS_FILE = os.getenv("AI_METRICS_FILE")
+
 
 def get_response(prompt: str) -> str:
     """
@@ -15,6 +23,28 @@ def get_response(prompt: str) -> str:
     Returns:
         str: The generated response from the AI model or an error message.
     """
+    return get_response_with_metrics(prompt)[0]
+
+
+def get_response_with_metrics(prompt: str) -> tuple:
+    """
+    Same as get_response, but also returns the call's metrics.
+    Parameters:
+        prompt (str): The input text for which a response is needed.
+    Returns:
+        tuple: (response text or error message, metrics dict or None if AI_METRICS=0)
+    """
+    started = time.perf_counter()
+    call = {"llm_seconds": 0.0, "response": None}
+    text = _generate(prompt, call)
+    if not METRICS_ENABLED:
+        return text, None
+    metrics = _call_metrics(started, call["llm_seconds"], call["response"])
+    _write_metrics(metrics)
+    return text, metrics
+
+
+def _generate(prompt: str, call: dict) -> str:
     try:
 
         # Validate input before any processing
@@ -28,7 +58,12 @@ def get_response(prompt: str) -> str:
             return f"Model Initialization Error: {str(model_error)}"
 
         # Generate content based on the prompt
-        response = model.generate_content(prompt)
+        llm_started = time.perf_counter()
+        try:
+            response = model.generate_content(prompt)
+        finally:
+            call["llm_seconds"] = time.perf_counter() - llm_started
+        call["response"] = response
 
         # Validate the response if it exists
         if response and hasattr(response, "text"):
@@ -43,6 +78,40 @@ def get_response(prompt: str) -> str:
         return f"Unexpected Error: {str(general_error)}"
 
 
+def _call_metrics(started: float, llm_seconds: float, response) -> dict:
+    """Builds the metrics record for one call; token counts come from the response's usage_metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    total = time.perf_counter() - started
+    return {
+        "task": "get_response",
+        "totalMs": round(total * 1000, 1),
+        "parseMs": 0.0,
+        "promptBuildMs": round(max(0.0, total - llm_seconds) * 1000, 1),
+        "llmWaitMs": round(llm_seconds * 1000, 1),
+        "timeToFirstTokenMs": None,
+        "extractMs": 0.0,
+        "llmCalls": 1 if response is not None else 0,
+        "promptTokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "completionTokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "cacheHits": 0,
+        "ruleHits": 0,
+        "retries": 0,
+        "rateLimitWaitMs": 0.0
+    }
+
+
+def _write_metrics(metrics: dict) -> None:
+    """Appends one call's metrics to AI_METRICS_FILE, if set."""
+    if not METRICS_FILE:
+        return
+    try:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics) + "\n")
+    except OSError:
+        # Metrics must never fail the call they describe
+        pass
+
+
 # Example usage
 if __name__ == "__main__":
     try:
@@ -0,0 +1,78 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from aiSettings import data_path
+
+# Counters have to outlive the one-shot scripts, so they are kept in SQLite
+# next to the other AI stores. Increments are buffered in memory and written
+# in batches (and at exit) so counting stays off the hot path.
+# AI_COUNTERS=0 turns recording off.
+FLUSH_EVERY = 200
+FLUSH_INTERVAL_SECONDS = 5
+
+_pending = Counter()
+_updates = 0
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("counters.sqlite3"), timeout=30)
+    try:
+        with db:
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            yield db
+    finally:
+        db.close()
+
+def increment(*names):
+    """Adds one to each named counter."""
+    _update(Counter(names))
+
+def add(name, amount):
+    """Adds `amount` to one counter (totals such as milliseconds of latency)."""
+    _update(Counter({name: int(round(amount))}))
+
+def _update(amounts):
+    global _updates
+    if os.getenv("AI_COUNTERS", "1") == "0" or not amounts:
+        return
+    with _lock:
+        _pending.update(amounts)
+        _updates += len(amounts)
+        due = _updates >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_INTERVAL_SECONDS
+    if due:
+        flush()
+
+def flush():
+    """Writes buffered increments to the counters database."""
+    global _last_flush, _updates
+    with _lock:
+        if not _pending:
+            return
+        batch = list(_pending.items())
+        _pending.clear()
+        _updates = 0
+        _last_flush = time.monotonic()
+    with _connect() as db:
+        db.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            batch
+        )
+
+atexit.register(flush)
+
+def read_counters(prefix=""):
+    """Returns {name: value} for every counter whose name starts with `prefix`."""
+    flush()
+    with _connect() as db:
+        rows = db.execute(
+            "SELECT name, value FROM counters WHERE substr(name, 1, ?) = ?",
+            (len(prefix), prefix)
+        ).fetchall()
+    return dict(rows)
@@ -0,0 +1,168 @@
+"""
+Per-call timing and token usage for the AI scripts.
+
+route.js treats anything on stderr as a failure, so timings can't be
+logged there. Instead every call collects its own metrics, which end up in
+the result under "callMetrics" ("metrics" is already part of the strategy
+schema), in the worker's response envelope next to "result", and, with
+AI_METRICS_FILE set, as one JSON line per call in that file (use /dev/fd/N
+to send them to a descriptor the parent opened).
+AI_METRICS=0 turns collection off.
+
+    {"task": "generate_ai_report", "totalMs": 812.4, "parseMs": 3.1,
+     "promptBuildMs": 41.7, "llmWaitMs": 760.2, "timeToFirstTokenMs": null,
+     "extractMs": 0.4, "llmCalls": 3, "promptTokens": 5120,
+     "completionTokens": 611, "cacheHits": 0, "ruleHits": 0, "retries": 1,
+     "rateLimitWaitMs": 0.0}
+
+promptBuildMs is the time the call spent outside input parsing, model
+requests and JSON extraction: building prompts, packing answers and local
+statistics. Stages that overlap (concurrent batch requests) are counted
+once. timeToFirstTokenMs is only known for streamed requests.
+
+The metrics of the running call are kept in a context variable; functions
+handed to a thread pool have to be wrapped with propagate() to report into
+the caller's metrics.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("AI_METRICS", "1") != "0"
+METRICS_FILE = os.getenv("AI_METRICS_FILE")
+
+COUNTERS = ("llmCalls", "promptTokens", "completionTokens", "cacheHits", "ruleHits", "retries")
+
+_current = contextvars.ContextVar("ai_metrics", default=None)
+_file_lock = threading.Lock()
+
+class CallMetrics:
+    """Stage intervals and counters of one script call or worker job."""
+
+    def __init__(self, task, started=None):
+        self.task = task
+        self.started = started if started is not None else time.perf_counter()
+        self.intervals = {"parse": [], "llm": [], "extract": []}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.first_token = None
+        self.rate_limit_wait = 0.0
+        self._lock = threading.Lock()
+
+    def add_interval(self, stage, start, end):
+        with self._lock:
+            self.intervals[stage].append((start, end))
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            if self.first_token is None or seconds < self.first_token:
+                self.first_token = seconds
+
+    def record_rate_limit_wait(self, seconds):
+        with self._lock:
+            self.rate_limit_wait += seconds
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        with self._lock:
+            intervals = {stage: list(values) for stage, values in self.intervals.items()}
+            summary = {
+                "task": self.task,
+                "totalMs": _ms(total),
+                "parseMs": _ms(_covered(intervals["parse"])),
+                "promptBuildMs": _ms(max(0.0, total - _covered([i for values in intervals.values() for i in values]))),
+                "llmWaitMs": _ms(_covered(intervals["llm"])),
+                "timeToFirstTokenMs": _ms(self.first_token) if self.first_token is not None else None,
+                "extractMs": _ms(_covered(intervals["extract"])),
+            }
+            summary.update(self.counters)
+            summary["rateLimitWaitMs"] = _ms(self.rate_limit_wait)
+        return summary
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+def _covered(intervals):
+    """Total length of the union of (start, end) intervals."""
+    covered = 0.0
+    end_so_far = None
+    for start, end in sorted(intervals):
+        if end_so_far is not None and start < end_so_far:
+            if end > end_so_far:
+                covered += end - end_so_far
+                end_so_far = end
+            continue
+        covered += end - start
+        end_so_far = end
+    return covered
+
+def start_call(task, started=None):
+    """Starts collecting metrics for `task` in the current context; returns them (None if disabled)."""
+    metrics = CallMetrics(task, started) if METRICS_ENABLED else None
+    _current.set(metrics)
+    return metrics
+
+def current():
+    return _current.get()
+
+@contextmanager
+def timed(stage):
+    """Records the time spent in the block as a "parse", "llm" or "extract" interval."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_interval(stage, start, time.perf_counter())
+
+def count(name, amount=1):
+    metrics = _current.get()
+    if metrics is not None and amount:
+        metrics.count(name, amount)
+
+def propagate(function):
+    """Wraps `function` so it reports into the caller's metrics when run on another thread."""
+    metrics = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(metrics)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+def finish_call(metrics, result):
+    """
+    Attaches the call's metrics to a dict result under "callMetrics" and writes
+    them to AI_METRICS_FILE. Returns the result.
+    """
+    if metrics is None:
+        return result
+    summary = metrics.summary()
+    if isinstance(result, dict):
+        result["callMetrics"] = summary
+    write_metrics(summary)
+    return result
+
+def write_metrics(summary):
+    """Appends one call's metrics to AI_METRICS_FILE, if set."""
+    if not METRICS_FILE:
+        return
+    line = json.dumps(summary) + "\n"
+    with _file_lock:
+        try:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            # Metrics must never fail the call they describe
+            pass
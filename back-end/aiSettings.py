@@ -0,0 +1,9 @@
+import os
+
+# Where the AI scripts keep their local state (caches, stored reports, queues)
+DATA_DIR = os.getenv("AI_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ai-data"))
+
+def data_path(name):
+    """Returns the path of a file inside DATA_DIR, creating the directory if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
@@ -0,0 +1,444 @@
+"""
+Long-running AI worker.
+
+Instead of spawning a fresh interpreter per request, the Node server can keep
+one of these processes alive and send it jobs as JSON lines, either over
+stdin/stdout (default) or over a Unix socket:
+
+    python3 aiWorker.py [--concurrency 4]
+    python3 aiWorker.py --socket /tmp/formora-ai.sock
+    python3 aiWorker.py --queue [--concurrency 2]
+
+With --queue it serves jobs from the durable priority queue (jobQueue.py)
+instead of a stream; start several for more throughput, the per-class
+limits hold across all of them. Each runs one dispatcher that polls the
+queue, backing off while it is empty.
+
+Request line:  {"id": "42", "task": "generate_ai_report", "payload": {...}}
+Response line: {"id": "42", "result": {...}}  or  {"id": "42", "error": "..."}
+
+Responses also carry the job's timings and token usage as "callMetrics" (see
+aiMetrics.py).
+
+Form and follow-up generation requests may add "stream": true to receive
+{"id": "42", "partial": {...}} lines for each question as it is generated.
+A {"id": "42", "partial": {"reset": true}} line means the questions so far
+were replaced (a larger model took over) and will be sent again.
+
+The payload for each task has the same shape as the JSON the matching
+script takes on the command line. Responses may come back out of order;
+match them on "id".
+"""
+import sys
+import json
+import os
+import argparse
+import importlib
+import uuid
+import itertools
+import sqlite3
+import time
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+import strategy
+import generateForm
+import generateFollowUp
+import generateReport
+import precomputeFollowUps
+import formAnalytics
+import rollupStore
+from llmCache import get_cache
+from followUpRules import rule_stats
+from modelRouter import model_stats
+from singleFlight import flight_key, single_flight
+from jobQueue import (
+    JOB_CLASSES, LEASE_SECONDS, claim_job, enqueue_job, finish_job, get_job, queue_stats, recover_jobs, renew_lease
+)
+from aiMetrics import start_call, write_metrics
+
+# "try" is a keyword, so it can't be imported with a plain import statement
+feedback_summary = importlib.import_module("try")
+
+DEFAULT_CONCURRENCY = 4
+QUEUE_POLL_SECONDS = 0.2
+QUEUE_IDLE_POLL_SECONDS = 2
+QUEUE_RECOVER_SECONDS = 30
+
+
+def run_analyze_feedback(payload):
+    if not isinstance(payload, dict) or "questions" not in payload:
+        return {"error": "Invalid input format. Ensure 'questions' key is present with an array of questions and answers."}
+    return feedback_summary.analyze_feedback(payload["questions"])
+
+
+def run_analyze_cross_feedback(payload):
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or len(payload) < 1:
+        return {"error": "No feedback data provided"}
+    # Identical jobs on other threads or workers share one run
+    return single_flight(
+        flight_key("analyze_cross_feedback", json.dumps(payload, sort_keys=True)),
+        lambda: strategy.analyze_cross_feedback(payload)
+    )
+
+
+def run_generate_form(payload, on_item=None, on_reset=None):
+    if isinstance(payload, dict):
+        payload = payload.get("businessDescription")
+    if not payload:
+        return {"error": "Missing business description"}
+    return generateForm.generate_form_from_description(payload, on_item=on_item, on_reset=on_reset)
+
+
+def run_generate_followup(payload, on_item=None, on_reset=None):
+    if not isinstance(payload, dict):
+        return {"error": "Missing input data"}
+    return generateFollowUp.generate_followup_questions(
+        payload.get("question"),
+        payload.get("answer"),
+        payload.get("allResponses", []),
+        form_id=payload.get("formId"),
+        template=payload.get("template"),
+        cache_policy=payload.get("cachePolicy"),
+        on_item=on_item,
+        on_reset=on_reset
+    )
+
+
+def run_generate_followup_batch(payload):
+    if not isinstance(payload, dict) or not isinstance(payload.get("answers"), list):
+        return {"error": "Missing answers"}
+    return generateFollowUp.generate_followup_batch(
+        payload["answers"],
+        payload.get("allResponses", []),
+        form_id=payload.get("formId"),
+        template=payload.get("template"),
+        cache_policy=payload.get("cachePolicy")
+    )
+
+
+def run_form_analytics(payload):
+    if not isinstance(payload, dict):
+        return {"error": "Missing input data"}
+    return formAnalytics.form_analytics(
+        payload.get("form", {}),
+        payload.get("submissions", []),
+        bucket=payload.get("bucket", "day"),
+        crosstabs=[tuple(pair) for pair in payload.get("crosstabs") or []]
+    )
+
+
+def run_record_submission(payload):
+    if not isinstance(payload, dict) or not payload.get("formId"):
+        return {"error": "Missing formId"}
+    return {"recorded": rollupStore.record_submission(payload["formId"], payload.get("submission") or {}, payload.get("form"))}
+
+
+def run_rollup_dashboard(payload):
+    if not isinstance(payload, dict) or not payload.get("formId"):
+        return {"error": "Missing formId"}
+    return rollupStore.read_dashboard(
+        payload["formId"], payload.get("granularity", "day"), payload.get("start"), payload.get("end")
+    )
+
+
+def run_precompute_followups(payload):
+    if not isinstance(payload, dict):
+        return {"error": "Missing input data"}
+    return precomputeFollowUps.precompute_followups(
+        payload.get("formId"), payload.get("questions", []), template=payload.get("template")
+    )
+
+
+def run_generate_report(payload):
+    if not isinstance(payload, dict):
+        return {"error": "Missing input data"}
+
+    def run():
+        if payload.get("formId"):
+            return generateReport.generate_incremental_report(
+                payload["formId"], payload.get("form", {}), payload.get("submissions", [])
+            )
+        return generateReport.generate_ai_report(payload.get("form", {}), payload.get("submissions", []))
+    return single_flight(flight_key("generate_ai_report", json.dumps(payload, sort_keys=True)), run)
+
+
+def run_enqueue_job(payload):
+    if not isinstance(payload, dict) or payload.get("task") not in TASKS:
+        return {"error": "Missing or unknown task"}
+    job_id = enqueue_job(
+        payload["task"],
+        payload.get("payload"),
+        job_class=payload.get("jobClass"),
+        deadline_seconds=payload.get("deadline")
+    )
+    return get_job(job_id)
+
+
+def run_job_status(payload):
+    job = get_job(payload.get("jobId")) if isinstance(payload, dict) else None
+    return job if job is not None else {"error": "Job not found"}
+
+
+TASKS = {
+    "analyze_feedback": run_analyze_feedback,
+    "analyze_cross_feedback": run_analyze_cross_feedback,
+    "generate_form_from_description": run_generate_form,
+    "generate_followup_questions": run_generate_followup,
+    "generate_followup_batch": run_generate_followup_batch,
+    "generate_ai_report": run_generate_report,
+    "precompute_followups": run_precompute_followups,
+    "form_analytics": run_form_analytics,
+    "record_submission": run_record_submission,
+    "rollup_dashboard": run_rollup_dashboard,
+    "ping": lambda payload: "pong",
+    "cache_stats": lambda payload: get_cache().stats() if get_cache() else None,
+    "followup_rule_stats": lambda payload: rule_stats(),
+    "model_stats": lambda payload: model_stats(),
+    "enqueue_job": run_enqueue_job,
+    "job_status": run_job_status,
+    "queue_stats": lambda payload: queue_stats(),
+}
+
+
+# Tasks that can report partial results when a request sets "stream": true.
+# Each partial is sent as {"id": ..., "partial": {"key", "index", "item"}}
+# (or {"reset": true}) before the final {"id": ..., "result": ...} line.
+STREAMING_TASKS = {"generate_form_from_description", "generate_followup_questions"}
+
+
+def handle_request(request, send_partial=None, parsed=None):
+    """
+    Runs one decoded request and returns the response envelope.
+
+    `parsed` is the (start, end) perf_counter interval spent decoding the
+    request line, counted as the job's parse time.
+    """
+    request_id = request.get("id") if isinstance(request, dict) else None
+    if not isinstance(request, dict):
+        return {"id": request_id, "error": "Request must be a JSON object"}
+
+    task = TASKS.get(request.get("task"))
+    if task is None:
+        return {"id": request_id, "error": f"Unknown task: {request.get('task')}"}
+
+    metrics = start_call(request.get("task"), started=parsed[0] if parsed else None)
+    if metrics and parsed:
+        metrics.add_interval("parse", *parsed)
+    try:
+        if send_partial and request.get("stream") and request.get("task") in STREAMING_TASKS:
+            def on_item(key, index, item):
+                send_partial({"id": request_id, "partial": {"key": key, "index": index, "item": item}})
+
+            def on_reset():
+                send_partial({"id": request_id, "partial": {"reset": True}})
+            response = {"id": request_id, "result": task(request.get("payload"), on_item=on_item, on_reset=on_reset)}
+        else:
+            response = {"id": request_id, "result": task(request.get("payload"))}
+    except Exception as e:
+        response = {"id": request_id, "error": str(e)}
+
+    if metrics:
+        response["callMetrics"] = metrics.summary()
+        write_metrics(response["callMetrics"])
+    return response
+
+
+class JsonLineChannel:
+    """Reads requests from one stream and writes responses to another."""
+
+    def __init__(self, reader, writer, executor):
+        self.reader = reader
+        self.writer = writer
+        self.executor = executor
+        self.write_lock = threading.Lock()
+
+    def send(self, response):
+        line = json.dumps(response) + "\n"
+        with self.write_lock:
+            self.writer.write(line)
+            self.writer.flush()
+
+    def dispatch(self, request, parsed=None):
+        self.send(handle_request(request, send_partial=self.send, parsed=parsed))
+
+    def serve(self):
+        pending = set()
+        for line in self.reader:
+            line = line.strip()
+            if not line:
+                continue
+            started = time.perf_counter()
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                self.send({"id": None, "error": "Invalid JSON request"})
+                continue
+            future = self.executor.submit(self.dispatch, request, (started, time.perf_counter()))
+            pending.add(future)
+            future.add_done_callback(pending.discard)
+        # Let in-flight jobs finish before the stream is closed
+        for future in list(pending):
+            future.result()
+
+
+def serve_stdio(executor):
+    JsonLineChannel(sys.stdin, sys.stdout, executor).serve()
+
+
+def _renew_job_lease(job_id, worker_id, done):
+    while not done.wait(LEASE_SECONDS / 3):
+        try:
+            if not renew_lease(job_id, worker_id):
+                return
+        except sqlite3.OperationalError:
+            # Queue database busy; the lease still has two thirds left
+            pass
+
+
+def run_job(job, worker_id):
+    """Runs one claimed job and records its result."""
+    # Long reports outlive one lease; keep renewing it so no other worker re-runs the job
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_renew_job_lease, args=(job["id"], worker_id, done), daemon=True)
+    heartbeat.start()
+    try:
+        response = handle_request({"id": job["id"], "task": job["task"], "payload": job["payload"]})
+    finally:
+        done.set()
+    result = response.get("result")
+    if isinstance(result, dict) and "callMetrics" in response:
+        # Job records only keep the result, so the metrics travel inside it
+        result["callMetrics"] = response["callMetrics"]
+    finish_job(job["id"], result=result, error=response.get("error"))
+
+
+def serve_queue(executor, concurrency, stop_on_eof=False, stop=None):
+    """
+    One dispatcher claims jobs while a slot is free and hands them to the
+    executor until `stop` is set. Polling backs off from QUEUE_POLL_SECONDS
+    to QUEUE_IDLE_POLL_SECONDS while the queue stays empty, and expired
+    leases and deadlines are handled every QUEUE_RECOVER_SECONDS.
+    """
+    stop = stop or threading.Event()
+    wake = threading.Event()
+    if stop_on_eof:
+        # Started by the Node server: stdin closes when the server exits
+        def watch_stdin():
+            for _ in sys.stdin:
+                pass
+            stop.set()
+            wake.set()
+        threading.Thread(target=watch_stdin, daemon=True).start()
+
+    slots = threading.Semaphore(concurrency)
+    claims = itertools.count()
+    prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    pending = set()
+
+    def job_done(future):
+        pending.discard(future)
+        slots.release()
+        # A free slot may have a job waiting for it
+        wake.set()
+
+    delay = QUEUE_POLL_SECONDS
+    next_recover = 0
+    try:
+        while not stop.is_set():
+            if time.monotonic() >= next_recover:
+                try:
+                    recover_jobs()
+                except sqlite3.OperationalError:
+                    # Queue database busy; recover on the next pass
+                    pass
+                next_recover = time.monotonic() + QUEUE_RECOVER_SECONDS
+
+            job = None
+            if slots.acquire(blocking=False):
+                # Each claim gets its own id, so a job re-queued after a missed lease can't be renewed by its old run
+                worker_id = f"{prefix}-{next(claims)}"
+                try:
+                    job = claim_job(worker_id)
+                except sqlite3.OperationalError:
+                    # Queue database busy; try again on the next poll
+                    pass
+                if job is None:
+                    slots.release()
+            if job is None:
+                wake.wait(delay)
+                wake.clear()
+                delay = min(delay * 2, QUEUE_IDLE_POLL_SECONDS)
+                continue
+
+            delay = QUEUE_POLL_SECONDS
+            future = executor.submit(run_job, job, worker_id)
+            pending.add(future)
+            future.add_done_callback(job_done)
+    finally:
+        stop.set()
+        # Let running jobs finish and record their results
+        for future in list(pending):
+            future.result()
+
+
+def serve_socket(path, executor):
+    if os.path.exists(path):
+        os.remove(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = (line.decode("utf-8") for line in self.rfile)
+            writer = _TextWriter(self.wfile)
+            JsonLineChannel(reader, writer, executor).serve()
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+class _TextWriter:
+    """Minimal text wrapper over a socket's binary write file."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode("utf-8"))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formora AI worker (JSON lines)")
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--queue", action="store_true", help="Serve jobs from the durable job queue")
+    parser.add_argument("--stop-on-eof", action="store_true", help="With --queue, stop once stdin closes")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("AI_WORKER_CONCURRENCY", 0)),
+        help="Maximum number of jobs running at once (queue default: the sum of the class limits)"
+    )
+    args = parser.parse_args()
+
+    concurrency = args.concurrency or (
+        sum(settings["concurrency"] for settings in JOB_CLASSES.values()) if args.queue else DEFAULT_CONCURRENCY
+    )
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        try:
+            if args.queue:
+                serve_queue(executor, max(1, concurrency), stop_on_eof=args.stop_on_eof)
+            elif args.socket:
+                serve_socket(args.socket, executor)
+            else:
+                serve_stdio(executor)
+        except KeyboardInterrupt:
+            pass
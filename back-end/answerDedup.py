@@ -0,0 +1,222 @@
+"""
+Near-duplicate answer collapsing for report and strategy prompts.
+
+Free-text answers repeat a lot ("Great!", "great", "GREAT!!!", "Great
+product", "great product!!"). Instead of sending every copy, answers are
+grouped per question: exact matches after normalization are merged
+directly, and the rest are compared by MinHash signatures over character
+3-grams (with LSH banding, so each new answer is only checked against a
+handful of candidates). Each group is sent once as its most common wording
+with a multiplicity, e.g.
+
+    Q: What did you like most?
+      - "Great product" x37
+      - "Comfortable, but the sizing runs small" x4
+
+Answers are never merged across a change in meaning that 3-grams can't
+see: "I would recommend it" and "I would not recommend it" are 90%
+similar, so two answers only share a group when they have the same
+negators ("not", "never", "don't", ...) and the same lexicon polarity sign.
+
+DEDUP_SIMILARITY sets the Jaccard similarity at which two answers are
+merged (default 0.6); REPORT_DEDUP=0 / STRATEGY_DEDUP=0 turn collapsing off.
+"""
+import os
+import re
+import zlib
+from collections import Counter
+import numpy as np
+from promptBudget import count_tokens
+from lexiconSentiment import PROMPT_LABELS_NOTE, label_scores, negators, score_texts, with_label
+from reportStats import answer_polarities
+from answerText import normalize_answer
+
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_SIMILARITY", 0.6))
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+# Signature estimates are noisy; candidates this close below the threshold
+# still get an exact check, and only the best few are checked
+ESTIMATE_MARGIN = 0.15
+MAX_EXACT_CHECKS = 3
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(1, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+
+def normalize_text(answer):
+    """normalize_answer() with letter runs squeezed ("soooo" -> "soo"), so stretched spellings collapse."""
+    return re.sub(r"(.)\1{2,}", r"\1\1", normalize_answer(answer))
+
+def shingles(normalized):
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_HASHES values) of a set of shingles."""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    return ((np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % _PRIME).min(axis=1)
+
+def _band_keys(signature):
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(BANDS)]
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def meaning_key(answer):
+    """Answers with different keys are never merged: (negator tokens, lexicon polarity sign)."""
+    return negators(answer), int(np.sign(score_texts([answer])[0]))
+
+class AnswerDeduplicator:
+    """Collapses one question's answers into groups of near-duplicates."""
+
+    def __init__(self, threshold=None):
+        self.threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.groups = []
+        self.exact = {}
+        self.buckets = {}
+        self.signatures = np.empty((16, NUM_HASHES), dtype=np.uint64)
+
+    def add(self, answer, count=1):
+        """
+        Adds an answer and returns (group index, True if it started a new
+        group), or (None, False) for an empty answer.
+        """
+        normalized = normalize_text(answer)
+        if not normalized:
+            return None, False
+
+        index = self.exact.get(normalized)
+        if index is None:
+            shingle_set = shingles(normalized)
+            signature = minhash(shingle_set)
+            keys = _band_keys(signature)
+            meaning = meaning_key(answer)
+            candidates = [
+                i for i in {i for key in keys for i in self.buckets.get(key, ())}
+                if self.groups[i]["meaning"] == meaning
+            ]
+            best = self._best_match(shingle_set, signature, candidates) if candidates else None
+            if best is None:
+                index = len(self.groups)
+                if index == len(self.signatures):
+                    self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+                self.signatures[index] = signature
+                self.groups.append({
+                    "shingles": shingle_set, "meaning": meaning, "count": 0, "variants": Counter(), "wording": {}
+                })
+                for key in keys:
+                    self.buckets.setdefault(key, []).append(index)
+                created = True
+            else:
+                index = best
+                created = False
+            self.exact[normalized] = index
+        else:
+            created = False
+
+        group = self.groups[index]
+        group["count"] += count
+        group["variants"][normalized] += count
+        group["wording"].setdefault(normalized, str(answer).strip())
+        return index, created
+
+    def _best_match(self, shingle_set, signature, candidates):
+        """The candidate group most similar to the answer, if any reaches the threshold."""
+        estimates = (self.signatures[candidates] == signature).mean(axis=1)
+        order = np.argsort(-estimates)[:MAX_EXACT_CHECKS]
+        best, best_score = None, self.threshold
+        for position in order:
+            if estimates[position] < self.threshold - ESTIMATE_MARGIN:
+                break
+            candidate = candidates[position]
+            score = jaccard(shingle_set, self.groups[candidate]["shingles"])
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def representative(self, index):
+        """The most common wording in a group."""
+        group = self.groups[index]
+        return group["wording"][group["variants"].most_common(1)[0][0]]
+
+    def collapsed(self):
+        """[(representative, count)] with the most frequent groups first."""
+        order = sorted(range(len(self.groups)), key=lambda i: -self.groups[i]["count"])
+        return [(self.representative(i), self.groups[i]["count"]) for i in order]
+
+GROUPED_ANSWERS_NOTE = (
+    "(Answers are grouped by question. Near-identical answers are merged into one line; "
+    '"xN" means N respondents gave that answer, so weigh it accordingly.)\n'
+)
+
+# Room for a " [negative]" tag on a new group's line
+_LABEL_TOKENS = count_tokens(" [negative]")
+
+def _answer_line(answer, count, label="neutral"):
+    line = f'    - "{answer}" x{count}' if count > 1 else f'    - "{answer}"'
+    return with_label(line, label) + "\n"
+
+class AnswerGroups:
+    """
+    Collapsed answers for a set of submissions, grouped by question, with a
+    running token estimate of the formatted text.
+
+    `truncate` shortens each answer before it is grouped (e.g.
+    PromptPacker.truncate_answer). With `labels`, each group's line is
+    tagged with its lexicon sentiment.
+    """
+
+    def __init__(self, truncate=None, labels=False):
+        self.truncate = truncate
+        self.labels = labels
+        self.questions = {}
+        self.submissions = 0
+        self.answers = 0
+        self.tokens = 0
+
+    def add_submission(self, responses):
+        """Adds one submission's [{question, answer}] and returns the tokens it added."""
+        added = 0
+        for response in responses:
+            question = response.get("question", "")
+            answer = response.get("answer", "")
+            if isinstance(answer, (list, dict)):
+                answer = ", ".join(map(str, answer)) if isinstance(answer, list) else str(answer)
+            if self.truncate:
+                answer = self.truncate(answer)
+            dedup = self.questions.get(question)
+            if dedup is None:
+                dedup = self.questions[question] = AnswerDeduplicator()
+                added += count_tokens(f"\nQ: {question}\n")
+            index, created = dedup.add(answer)
+            if index is None:
+                continue
+            self.answers += 1
+            # A new group adds a line; a repeat only bumps a count
+            added += count_tokens(_answer_line(answer, 1)) + 1 + (_LABEL_TOKENS if self.labels else 0) if created else 0
+        self.submissions += 1
+        self.tokens += added
+        return added
+
+    def distinct_answers(self):
+        return sum(len(dedup.groups) for dedup in self.questions.values())
+
+    def collapsed_answers(self):
+        """How many answers were merged into an earlier group."""
+        return self.answers - self.distinct_answers()
+
+    def text(self):
+        lines = [GROUPED_ANSWERS_NOTE]
+        if self.labels:
+            lines.append(PROMPT_LABELS_NOTE)
+        for question, dedup in self.questions.items():
+            lines.append(f"\nQ: {question}\n")
+            collapsed = dedup.collapsed()
+            if self.labels:
+                labels = label_scores(answer_polarities([answer for answer, _ in collapsed])).tolist()
+            else:
+                labels = ["neutral"] * len(collapsed)
+            lines.extend(_answer_line(answer, count, label) for (answer, count), label in zip(collapsed, labels))
+        return "".join(lines)
@@ -0,0 +1,12 @@
+import re
+
+_NON_WORD = re.compile(r"[^a-z0-9$]+")
+
+def normalize_answer(answer):
+    """
+    The key answers are compared by everywhere (option matching, rules,
+    caches, rollups): lower-cased, punctuation turned into spaces, and
+    whitespace collapsed ("  Too-HIGH!! " -> "too high"). "$" is kept so
+    price options stay apart from plain numbers.
+    """
+    return " ".join(_NON_WORD.sub(" ", str(answer).lower()).split())
@@ -0,0 +1,123 @@
+"""
+Benchmarks the shared jsonExtract.extract_json against the per-script
+extractors it replaced, on large and malformed model outputs.
+
+    python bench/benchJsonExtract.py [--size-kb 256] [--repeat 20]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jsonExtract import extract_json
+
+# Previous implementations, kept verbatim for comparison
+
+def legacy_form_extract(text):
+    """generateForm.py / generateFollowUp.py, including their fence-stripping passes."""
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```\s*', '', text)
+    text = text.strip()
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            json_start = text.find('{')
+            json_end = text.rfind('}') + 1
+            if json_start >= 0 and json_end > json_start:
+                try:
+                    return json.loads(text[json_start:json_end])
+                except:
+                    pass
+    return None
+
+def legacy_report_extract(text):
+    """generateReport.py: greedy object match, then greedy array match."""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    return {"error": "AI response did not contain valid JSON", "raw_response": text[:500]}
+
+def legacy_strategy_extract(text):
+    """strategy.py: greedy object match, then the raw response."""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+IMPLEMENTATIONS = {
+    "jsonExtract": extract_json,
+    "legacy_form": legacy_form_extract,
+    "legacy_report": legacy_report_extract,
+    "legacy_strategy": legacy_strategy_extract
+}
+
+def build_payload(size_kb):
+    questions = []
+    while len(json.dumps(questions)) < size_kb * 1024:
+        index = len(questions) + 1
+        questions.append({
+            "questionId": f"q{index}",
+            "question": f"How would you rate part {index} of the \"experience\" {{overall}}?",
+            "inputType": "radio",
+            "options": ["Excellent", "Good", "Average", "Poor"],
+            "required": True
+        })
+    return {"questions": questions}
+
+def build_cases(size_kb):
+    body = json.dumps(build_payload(size_kb), indent=2)
+    return {
+        "clean": body,
+        "fenced": f"Here is the form:\n```json\n{body}\n```\nLet me know if you need changes.",
+        "trailing_braces": f"{body}\n\nNote: placeholders look like {{name}} and {{date}}.",
+        "leading_note": f"Fields in [brackets] are optional. {{draft}}\n```json\n{body}\n```",
+        "truncated": body[:len(body) * 3 // 4]
+    }
+
+def time_call(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from model outputs")
+    parser.add_argument("--size-kb", type=int, default=256, help="approximate size of the JSON payload")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per case; the best time is reported")
+    args = parser.parse_args()
+
+    results = {}
+    for case, text in build_cases(args.size_kb).items():
+        results[case] = {}
+        for name, func in IMPLEMENTATIONS.items():
+            seconds, value = time_call(func, text, args.repeat)
+            parsed = isinstance(value, (dict, list)) and not (isinstance(value, dict) and "error" in value)
+            results[case][name] = {"ms": round(seconds * 1000, 3), "parsed": parsed}
+
+    print(json.dumps({"sizeKb": args.size_kb, "repeat": args.repeat, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+End-to-end benchmarks for the AI scripts against the local fake Groq server
+(fakeGroq.py), on synthetic forms from 10 to 100k submissions.
+
+    python bench/benchPipeline.py [--sizes 10,1000,10000,100000] [--latency 0.2] [--repeat 3]
+    python bench/benchPipeline.py --save-baseline              # record bench/baseline.json
+    python bench/benchPipeline.py --baseline bench/baseline.json
+
+Every case runs in a fresh interpreter, the way route.js spawns the scripts,
+and reports (median over --repeat runs):
+
+    startup      spawn until the script's module is imported
+    parse        json.loads of the input
+    promptBuild  time in the call not spent waiting on the model or in
+                 JSON extraction (prompt building, packing, statistics)
+    extract      time in jsonExtract.extract_json
+    llm          wall time with at least one model request in flight
+    total        spawn until the result is serialized
+    peakRssMb    peak resident set size of the process
+
+With --baseline, cases that got slower (or bigger) than the stored run by
+more than --tolerance are listed and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Task name -> (module, whether the input grows with the number of submissions)
+TASKS = {
+    "analyze_feedback": ("try", True),
+    "analyze_cross_feedback": ("strategy", True),
+    "generate_form_from_description": ("generateForm", False),
+    "generate_followup_questions": ("generateFollowUp", False),
+    "generate_ai_report": ("generateReport", True),
+}
+
+METRICS = ("startup", "parse", "promptBuild", "extract", "llm", "total", "peakRssMb")
+# Compared against the baseline; llm only reflects the fake server's latency
+COMPARED_METRICS = ("startup", "parse", "promptBuild", "extract", "total", "peakRssMb")
+# Differences below these are noise, whatever the ratio
+NOISE_FLOOR = {"peakRssMb": 5.0}
+NOISE_FLOOR_SECONDS = 0.01
+
+# Synthetic data
+
+FORM = {
+    "title": "Running Shoe Feedback",
+    "description": "Tell us about your new running shoes",
+    "questions": [
+        {"questionId": "q1", "question": "How would you rate the overall quality?", "inputType": "radio",
+         "options": ["Excellent", "Good", "Average", "Poor"]},
+        {"questionId": "q2", "question": "How comfortable are they?", "inputType": "radio",
+         "options": ["Excellent", "Good", "Average", "Poor", "Very Poor"]},
+        {"questionId": "q3", "question": "How do you feel about the price?", "inputType": "radio",
+         "options": ["Too High", "Just Right", "Too Low"]},
+        {"questionId": "q4", "question": "Rate the delivery experience", "inputType": "rating",
+         "options": ["1", "2", "3", "4", "5"]},
+        {"questionId": "q5", "question": "What did you like most?", "inputType": "textarea"},
+        {"questionId": "q6", "question": "What should we improve?", "inputType": "textarea"},
+    ]
+}
+
+LIKES = [
+    "Great cushioning", "great cushioning!!", "Very comfortable on long runs", "Love the colour",
+    "Lightweight and fast", "The grip is excellent", "Good value for money", "nothing really",
+    "Stylish design", "They fit perfectly",
+]
+IMPROVEMENTS = [
+    "Sizing runs small", "sizing runs a bit small", "Laces come undone", "Too expensive",
+    "The sole wore out quickly", "Delivery was late", "More colours please", "nothing",
+    "Not comfortable for wide feet", "The box arrived damaged",
+]
+FILLER = "I have been running for years and tried many brands, and these compare well on most counts. "
+
+def synthetic_submission(rng, index):
+    """One submission with a mix of choice, rating and free-text answers."""
+    def text(pool):
+        answer = rng.choice(pool)
+        # A few long, unique answers so truncation and deduplication both get exercised
+        if rng.random() < 0.05:
+            answer = f"{answer}. {FILLER * rng.randint(1, 20)}(order {index})"
+        return answer
+
+    answers = {
+        "q1": rng.choice(["Excellent", "Good", "Good", "Average", "Poor"]),
+        "q2": rng.choice(["Excellent", "Good", "Average", "Poor", "Very Poor"]),
+        "q3": rng.choice(["Too High", "Just Right", "Just Right", "Too Low"]),
+        "q4": str(rng.randint(1, 5)),
+        "q5": text(LIKES),
+        "q6": text(IMPROVEMENTS),
+    }
+    return {
+        "submissionId": f"s{index}",
+        "completedAt": f"2024-01-01T00:00:00.{index:06d}Z",
+        "responses": [
+            {"questionId": q["questionId"], "question": q["question"], "answer": answers[q["questionId"]]}
+            for q in FORM["questions"]
+        ]
+    }
+
+def build_input(task, size, seed=7):
+    """The input JSON a task's script takes on the command line, for `size` submissions."""
+    rng = random.Random(seed)
+    if task == "generate_form_from_description":
+        return {"businessDescription": "Nike wants feedback on their new running shoe line"}
+    if task == "generate_followup_questions":
+        submission = synthetic_submission(rng, 0)
+        return {
+            "question": FORM["questions"][5],
+            "answer": "The heel rubs after about five miles and the tongue slides to one side",
+            "allResponses": submission["responses"][:5]
+        }
+
+    submissions = [synthetic_submission(rng, index) for index in range(size)]
+    if task == "analyze_feedback":
+        return {"questions": [
+            {"question": response["question"], "answer": response["answer"]}
+            for submission in submissions for response in submission["responses"]
+        ]}
+    if task == "analyze_cross_feedback":
+        return submissions
+    return {"form": FORM, "submissions": submissions}
+
+# Child process: runs one case and prints its metrics
+
+class Probe:
+    """Wraps a script's model and extraction calls to time them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.llm = []
+        self.extract = []
+
+    def wrap(self, function, intervals):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self.lock:
+                    intervals.append((start, end))
+        return timed
+
+def covered_time(intervals):
+    """Total length of the union of (start, end) intervals."""
+    covered = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+def run_case(task, module, data):
+    if task == "analyze_feedback":
+        return module.analyze_feedback(data["questions"])
+    if task == "analyze_cross_feedback":
+        return module.analyze_cross_feedback(data)
+    if task == "generate_form_from_description":
+        return module.generate_form_from_description(data["businessDescription"])
+    if task == "generate_followup_questions":
+        return module.generate_followup_questions(data["question"], data["answer"], data["allResponses"])
+    return module.generate_ai_report(data["form"], data["submissions"])
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def child_main(task, input_path):
+    spawned_at = float(os.environ["BENCH_SPAWNED_AT"])
+    sys.path.insert(0, BACKEND_DIR)
+    import importlib
+    module = importlib.import_module(TASKS[task][0])
+    startup = time.time() - spawned_at
+
+    probe = Probe()
+    module.complete = probe.wrap(module.complete, probe.llm)
+    module.extract_json = probe.wrap(module.extract_json, probe.extract)
+
+    with open(input_path, encoding="utf-8") as f:
+        raw = f.read()
+    start = time.perf_counter()
+    data = json.loads(raw)
+    parse = time.perf_counter() - start
+    del raw
+
+    start = time.perf_counter()
+    result = run_case(task, module, data)
+    call = time.perf_counter() - start
+    output = json.dumps(result)
+
+    metrics = {
+        "startup": startup,
+        "parse": parse,
+        "promptBuild": call - covered_time(probe.llm + probe.extract),
+        "extract": sum(end - start for start, end in probe.extract),
+        "llm": covered_time(probe.llm),
+        "total": time.time() - spawned_at,
+        "peakRssMb": peak_rss_mb(),
+        "requests": len(probe.llm),
+        "outputBytes": len(output),
+        "error": result.get("error") if isinstance(result, dict) else None
+    }
+    print(json.dumps(metrics))
+
+# Parent process: fake server, cases, baseline comparison
+
+def run_child(task, input_path, env):
+    env = dict(env, BENCH_SPAWNED_AT=repr(time.time()))
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", task, input_path],
+        env=env, capture_output=True, text=True
+    )
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["child process failed"])[-1]}
+    return json.loads(lines[-1])
+
+def median_metrics(runs):
+    failed = [run for run in runs if run.get("error")]
+    if failed:
+        return {"error": failed[0]["error"]}
+    merged = {key: statistics.median(run[key] for run in runs) for key in METRICS}
+    merged["requests"] = runs[-1]["requests"]
+    return merged
+
+def compare(results, baseline, tolerance):
+    """Returns [(case, metric, baseline value, current value)] for regressions."""
+    regressions = []
+    for case, metrics in results.items():
+        stored = baseline.get("cases", {}).get(case)
+        if not stored or metrics.get("error") or stored.get("error"):
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = stored.get(metric), metrics.get(metric)
+            if before is None or after is None:
+                continue
+            floor = NOISE_FLOOR.get(metric, NOISE_FLOOR_SECONDS)
+            if after > before * (1 + tolerance) and after - before > floor:
+                regressions.append((case, metric, before, after))
+    return regressions
+
+def format_table(results):
+    header = f"{'case':<38}" + "".join(f"{metric:>12}" for metric in METRICS) + f"{'requests':>10}"
+    lines = [header, "-" * len(header)]
+    for case, metrics in results.items():
+        if metrics.get("error"):
+            lines.append(f"{case:<38}  error: {metrics['error']}")
+            continue
+        row = f"{case:<38}"
+        for metric in METRICS:
+            value = metrics[metric]
+            row += f"{value:>11.1f} " if metric == "peakRssMb" else f"{value * 1000:>10.1f}ms"
+        lines.append(row + f"{metrics['requests']:>10}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI scripts against a fake Groq server")
+    parser.add_argument("--sizes", default="10,1000,10000,100000", help="comma-separated submission counts")
+    parser.add_argument("--tasks", default=",".join(TASKS), help="comma-separated tasks to run")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case (the median is reported)")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake requests answered with a 500")
+    parser.add_argument("--baseline", help="compare against this stored run")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"store this run as the baseline (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a regression")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("TASK", "INPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(*args.child)
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    from fakeGroq import start_server
+
+    server, fake, base_url = start_server(latency=args.latency, error_rate=args.error_rate, seed=1)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    tasks = [task for task in args.tasks.split(",") if task]
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="formora-bench-") as workdir:
+        env = dict(
+            os.environ,
+            GROQ_API="bench",
+            GROQ_BASE_URL=base_url,
+            GROQ_RPM="0",
+            GROQ_TPM="0",
+            AI_CACHE="0",
+            AI_DATA_DIR=os.path.join(workdir, "data"),
+            FOLLOWUP_CACHE_POLICY="off",
+        )
+        for task in tasks:
+            scaled = TASKS[task][1]
+            for size in (sizes if scaled else [1]):
+                case = f"{task}/{size}" if scaled else task
+                input_path = os.path.join(workdir, f"{task}-{size}.json")
+                with open(input_path, "w", encoding="utf-8") as f:
+                    json.dump(build_input(task, size), f)
+                results[case] = median_metrics([run_child(task, input_path, env) for _ in range(args.repeat)])
+                os.remove(input_path)
+                if not args.json:
+                    print(f"done {case}", file=sys.stderr)
+
+    server.shutdown()
+
+    settings = {"latency": args.latency, "errorRate": args.error_rate, "repeat": args.repeat}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.json:
+        print(json.dumps({
+            "settings": settings,
+            "cases": results,
+            "fakeServer": fake.snapshot(),
+            "regressions": [
+                {"case": case, "metric": metric, "baseline": before, "current": after}
+                for case, metric, before, after in regressions
+            ]
+        }, indent=2))
+    else:
+        print(format_table(results))
+        for case, metric, before, after in regressions:
+            print(f"REGRESSION {case} {metric}: {before:.4f} -> {after:.4f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "cases": results}, f, indent=2)
+
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Local stand-in for the Groq chat completions API, for exercising the AI
+scripts offline (rate limiting, retries, streaming, benchmarks).
+
+    python bench/fakeGroq.py --port 8765 --latency 0.2 --rpm 30 --error-rate 0.1
+    GROQ_API=test GROQ_BASE_URL=http://127.0.0.1:8765 python generateForm.py "..."
+
+It answers every POST with a canned JSON response chosen from the prompt
+(form, follow-ups, report, strategy and strategy digests, feedback analysis), optionally as an
+SSE stream, and enforces requests/tokens-per-minute windows with 429s and
+retry-after headers the way Groq does. Models named with --bad-json-model
+answer with truncated JSON, or in JSON mode with Groq's 400
+json_validate_failed, to exercise the model cascade (modelRouter.py). GET /stats returns request counts
+and the number of distinct client connections (to check keep-alive).
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FOLLOWUP = {
+    "followUpQuestions": [
+        {"questionId": "f1", "question": "What price range do you think it should fall in?", "inputType": "radio",
+         "options": ["$50-75", "$75-100", "$100-150", "Above $150"], "required": True, "order": 1}
+    ]
+}
+
+FORM = {
+    "title": "Product Feedback",
+    "description": "Tell us about your experience",
+    "questions": [
+        {"questionId": f"q{i}", "question": f"Question {i}", "inputType": "radio",
+         "options": ["Excellent", "Good", "Average", "Poor"], "required": True, "order": i}
+        for i in range(1, 6)
+    ]
+}
+
+PARTIAL_REPORT = {
+    "submissionCount": 1,
+    "sentimentCounts": {"positive": 1, "negative": 0, "neutral": 0},
+    "sentimentExamples": {"positive": ["Great"], "negative": [], "neutral": []},
+    "keyFindings": ["Customers like the product"],
+    "strengths": ["Quality"],
+    "improvements": ["Price"]
+}
+
+REPORT = {
+    "executiveSummary": {"overview": "Mostly positive", "keyFindings": ["Customers like the product"], "overallSentiment": "positive"},
+    "sentimentAnalysis": {
+        "positive": {"count": 1, "percentage": 100, "examples": ["Great"]},
+        "negative": {"count": 0, "percentage": 0, "examples": []},
+        "neutral": {"count": 0, "percentage": 0, "examples": []}
+    },
+    "keyInsights": [{"insight": "Quality is valued", "impact": "high"}],
+    "trends": [],
+    "strengths": ["Quality"],
+    "improvements": [{"area": "Price", "priority": "medium"}],
+    "recommendations": [{"recommendation": "Review pricing", "priority": "medium"}],
+    "statistics": {}
+}
+
+DIGEST = {
+    "formCount": 1,
+    "customerSentiment": "mixed",
+    "keyInsights": ["Sizing runs small"],
+    "productStrengths": ["Comfort"],
+    "productWeaknesses": ["Sizing"],
+    "priorityAreas": ["Sizing"],
+    "recommendations": ["Publish a fit guide"],
+    "issueCounts": {"criticalIssues": 1, "highPriority": 2, "improvementOpportunities": 3,
+                    "productImprovements": 2, "customerConcerns": 1}
+}
+
+STRATEGY = {
+    "summary": {"keyInsights": ["Insight"], "recommendations": ["Recommendation"], "actionItems": ["Action"]},
+    "strategies": [{"title": "Improve pricing", "actions": ["Survey competitors"]}],
+    "metrics": [],
+    "tasks": []
+}
+
+ANALYSIS = {
+    "positiveResponses": {"count": 1},
+    "negativeResponses": {"negativeResponses": []},
+    "sentiment": {"sentiment": {"positive": 1, "negative": 0, "neutral": 0}}
+}
+
+# First marker found in the prompt picks the response
+RESPONSES = [
+    ('"followUps"', {"followUps": {}}),
+    ('"followUpQuestions"', FOLLOWUP),
+    ('"executiveSummary"', REPORT),
+    ('"submissionCount"', PARTIAL_REPORT),
+    ('"strategies"', STRATEGY),
+    ('"issueCounts"', DIGEST),
+    ('"positiveResponses"', ANALYSIS),
+    ('"questions"', FORM)
+]
+
+def response_content(messages):
+    prompt = "\n".join(message.get("content") or "" for message in messages)
+    for marker, payload in RESPONSES:
+        if marker in prompt:
+            return json.dumps(payload)
+    return json.dumps({"result": "ok"})
+
+def prompt_tokens(body):
+    return sum(len(message.get("content") or "") for message in body.get("messages", [])) // 4 + 1
+
+class RateWindow:
+    """Sliding one-minute window of (timestamp, amount) entries."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.entries = deque()
+        self.used = 0
+
+    def _expire(self, now):
+        while self.entries and now - self.entries[0][0] >= 60:
+            self.used -= self.entries.popleft()[1]
+
+    def try_take(self, amount, now):
+        """Records `amount` and returns 0, or returns the seconds until it would fit."""
+        self._expire(now)
+        if not self.limit or self.used + amount <= self.limit or not self.entries:
+            self.entries.append((now, amount))
+            self.used += amount
+            return 0
+        freed = self.used
+        for timestamp, entry_amount in self.entries:
+            freed -= entry_amount
+            if freed + amount <= self.limit:
+                return 60 - (now - timestamp)
+        return 60
+
+    def remaining(self):
+        return max(0, self.limit - self.used) if self.limit else None
+
+class FakeGroq:
+    def __init__(self, latency=0.0, rpm=0, tpm=0, error_rate=0.0, chunk_delay=0.01, seed=None, bad_json_models=(),
+                 stream_usage=True):
+        self.latency = latency
+        self.stream_usage = stream_usage
+        self.bad_json_models = set(bad_json_models)
+        self.error_rate = error_rate
+        self.chunk_delay = chunk_delay
+        self.random = random.Random(seed)
+        self.requests = RateWindow(rpm)
+        self.tokens = RateWindow(tpm)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "rateLimited": 0, "errors": 0, "inFlight": 0, "maxInFlight": 0}
+        self.connections = set()
+
+    def admit(self, body, client_address):
+        """Returns (status, headers) for a new request: 200, 429 or 500."""
+        tokens = prompt_tokens(body)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.connections.add(client_address)
+            now = time.monotonic()
+            wait = self.requests.try_take(1, now) or self.tokens.try_take(tokens, now)
+            if wait:
+                self.stats["rateLimited"] += 1
+                return 429, {"retry-after": str(max(1, round(wait)))}
+            if self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, {}
+            self.stats["ok"] += 1
+            self.stats["inFlight"] += 1
+            self.stats["maxInFlight"] = max(self.stats["maxInFlight"], self.stats["inFlight"])
+            headers = {}
+            if self.requests.limit:
+                headers["x-ratelimit-remaining-requests"] = str(self.requests.remaining())
+                headers["x-ratelimit-reset-requests"] = "60s"
+            if self.tokens.limit:
+                headers["x-ratelimit-limit-tokens"] = str(self.tokens.limit)
+                headers["x-ratelimit-remaining-tokens"] = str(self.tokens.remaining())
+                headers["x-ratelimit-reset-tokens"] = "60s"
+            return 200, headers
+
+    def finish(self):
+        with self.lock:
+            self.stats["inFlight"] -= 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, connections=len(self.connections))
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, fake.snapshot())
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            status, headers = fake.admit(body, self.client_address)
+            if status != 200:
+                message = "Rate limit reached" if status == 429 else "Internal server error"
+                self._send_json(status, {"error": {"message": message, "type": "fake_error"}}, headers)
+                return
+            try:
+                time.sleep(fake.latency)
+                content = response_content(body.get("messages", []))
+                if body.get("model") in fake.bad_json_models:
+                    if (body.get("response_format") or {}).get("type") == "json_object":
+                        # What Groq answers when a JSON-mode generation isn't valid JSON
+                        self._send_json(400, {"error": {
+                            "message": "Failed to generate JSON. Please adjust your prompt.",
+                            "type": "invalid_request_error",
+                            "code": "json_validate_failed"
+                        }})
+                        return
+                    content = content[:len(content) // 2]
+                if body.get("stream"):
+                    self._stream(body, content, headers)
+                else:
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens(body),
+                            "completion_tokens": len(content) // 4,
+                            "total_tokens": prompt_tokens(body) + len(content) // 4
+                        }
+                    }, headers)
+            finally:
+                fake.finish()
+
+        def _stream(self, body, content, headers):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            def write(text):
+                data = text.encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            for start in range(0, len(content), 16):
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}]
+                }
+                write(f"data: {json.dumps(chunk)}\n\n")
+                time.sleep(fake.chunk_delay)
+            if fake.stream_usage:
+                # Like Groq, the final chunk carries the usage under "x_groq"
+                write("data: " + json.dumps({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "x_groq": {"id": "req-fake", "usage": {
+                        "prompt_tokens": prompt_tokens(body),
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": prompt_tokens(body) + len(content) // 4
+                    }}
+                }) + "\n\n")
+            write("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+def start_server(port=0, **options):
+    """Starts a fake server on a background thread; returns (server, fake, base_url)."""
+    fake = FakeGroq(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="prompt tokens per minute before 429s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--bad-json-model", action="append", default=[],
+                        help="model whose responses are truncated (or rejected in JSON mode); repeatable")
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(
+        args.port, latency=args.latency, rpm=args.rpm, tpm=args.tpm,
+        error_rate=args.error_rate, chunk_delay=args.chunk_delay, seed=args.seed,
+        bad_json_models=args.bad_json_model
+    )
+    print(f"Fake Groq listening on {base_url}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
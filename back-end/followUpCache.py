@@ -0,0 +1,106 @@
+"""
+Follow-up cache keyed by (formId, questionId, normalized answer).
+
+The follow-up prompt includes the respondent's earlier answers, so an
+exact-prompt cache almost never hits. Choice answers to the same question
+repeat constantly though, and their follow-ups rarely depend on that
+context, so they are cached on the answer alone.
+
+Whether respondent context may bypass the cache is set by
+FOLLOWUP_CACHE_POLICY (or a per-call `policy`):
+
+    "choice"      cache radio/select/rating answers, ignoring context (default)
+    "no-context"  cache any answer, but only when there is no earlier context
+    "always"      cache every answer, ignoring context
+    "off"         never cache
+"""
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from aiSettings import data_path
+from aiCounters import increment
+from aiMetrics import count
+from answerText import normalize_answer
+
+CACHE_POLICY = os.getenv("FOLLOWUP_CACHE_POLICY", "choice")
+CACHE_TTL_SECONDS = int(os.getenv("FOLLOWUP_CACHE_TTL", 7 * 24 * 60 * 60))
+
+CHOICE_INPUTS = {"radio", "select", "rating"}
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("followup_cache.sqlite3"), timeout=30)
+    try:
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS followups ("
+                "form_id TEXT NOT NULL, question_id TEXT NOT NULL, answer_key TEXT NOT NULL, "
+                "result TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (form_id, question_id, answer_key))"
+            )
+            yield db
+    finally:
+        db.close()
+
+def is_cacheable(question_data, answer, all_responses=None, policy=None):
+    """Applies the cache policy to one answer."""
+    policy = policy or CACHE_POLICY
+    if policy == "off" or answer is None or isinstance(answer, (list, dict)):
+        return False
+    if policy == "always":
+        return True
+    if policy == "no-context":
+        return not all_responses
+    return (question_data or {}).get("inputType") in CHOICE_INPUTS
+
+def get_cached_followups(form_id, question_data, answer, all_responses=None, policy=None, record_metrics=True):
+    """
+    Returns the cached follow-up result for this answer, or None.
+    `record_metrics=False` leaves the hit/miss counters alone.
+    """
+    if not form_id or not is_cacheable(question_data, answer, all_responses, policy):
+        return None
+
+    with _connect() as db:
+        row = db.execute(
+            "SELECT result, created_at FROM followups WHERE form_id = ? AND question_id = ? AND answer_key = ?",
+            (form_id, question_data.get("questionId"), normalize_answer(answer))
+        ).fetchone()
+    if row is None or time.time() - row[1] > CACHE_TTL_SECONDS:
+        if record_metrics:
+            increment("followup_cache.misses")
+        return None
+
+    if record_metrics:
+        increment("followup_cache.hits")
+        count("cacheHits")
+    result = json.loads(row[0])
+    result["source"] = "cache"
+    return result
+
+def store_followups(form_id, question_data, answer, result, all_responses=None, policy=None):
+    """Caches a successful follow-up result for this answer."""
+    if not form_id or not is_cacheable(question_data, answer, all_responses, policy):
+        return
+    if not isinstance(result, dict) or not result.get("followUpQuestions"):
+        return
+
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO followups (form_id, question_id, answer_key, result, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                form_id,
+                question_data.get("questionId"),
+                normalize_answer(answer),
+                json.dumps({"followUpQuestions": result["followUpQuestions"]}),
+                time.time()
+            )
+        )
+
+def clear_form(form_id):
+    """Drops every cached follow-up for a form (e.g. after its questions change)."""
+    with _connect() as db:
+        db.execute("DELETE FROM followups WHERE form_id = ?", (form_id,))
@@ -0,0 +1,223 @@
+"""
+Rule-based fast path for follow-up questions.
+
+Most choice answers map to the same follow-up every time ("Too High" -> ask
+for a price range, "Poor" -> ask what needs improvement), so those are
+answered from a compiled rule table and the model is only called on a miss.
+
+Per-form and per-template rules live in a JSON file (FOLLOWUP_RULES_FILE,
+default AI_DATA_DIR/followup_rules.json):
+
+    {
+        "forms": {"ai_123": {"inheritDefaults": true, "rules": [...]}},
+        "templates": {"product_review": {"rules": [...]}}
+    }
+
+A rule looks like:
+
+    {
+        "name": "price_high",
+        "answers": ["too high", "expensive"],
+        "match": "exact",                 # or "contains" (whole words)
+        "questionPattern": "price|cost",  # optional regex on the question text
+        "inputTypes": ["radio", "select"],# optional
+        "followUpQuestions": [{"question": "...", "inputType": "radio", "options": [...]}]
+    }
+"""
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from aiSettings import data_path
+from aiCounters import increment, read_counters
+from aiMetrics import count
+from answerText import normalize_answer
+
+PRICE_RANGES = ["$50-75", "$75-100", "$100-150", "Above $150"]
+
+CHOICE_INPUTS = ["radio", "select"]
+
+DEFAULT_RULES = [
+    {
+        "name": "price_high",
+        "answers": ["too high", "too expensive", "expensive", "overpriced", "price was high"],
+        "match": "exact",
+        "inputTypes": CHOICE_INPUTS,
+        "followUpQuestions": [
+            {"question": "What price range do you think it should fall in?", "inputType": "radio", "options": PRICE_RANGES}
+        ]
+    },
+    {
+        "name": "price_low",
+        "answers": ["too low", "too cheap"],
+        "match": "exact",
+        "inputTypes": CHOICE_INPUTS,
+        "followUpQuestions": [
+            {"question": "What price range would be more appropriate?", "inputType": "radio", "options": PRICE_RANGES}
+        ]
+    },
+    {
+        "name": "price_right",
+        "answers": ["just right", "about right", "fair price"],
+        "match": "exact",
+        "inputTypes": CHOICE_INPUTS,
+        "followUpQuestions": [
+            {"question": "Would you recommend this product to others at this price?", "inputType": "radio", "options": ["Yes", "Maybe", "No"]}
+        ]
+    },
+    {
+        "name": "negative",
+        "answers": ["poor", "very poor", "bad", "very bad", "terrible", "awful", "uncomfortable", "dissatisfied", "very dissatisfied"],
+        "match": "exact",
+        "inputTypes": CHOICE_INPUTS,
+        "followUpQuestions": [
+            {"question": "What specific aspects need improvement?", "inputType": "textarea", "placeholder": "Tell us what should change..."}
+        ]
+    },
+    {
+        "name": "positive",
+        "answers": ["excellent", "great", "good", "very good", "amazing", "outstanding", "satisfied", "very satisfied"],
+        "match": "exact",
+        "inputTypes": CHOICE_INPUTS,
+        "followUpQuestions": [
+            {"question": "What did you like most about it?", "inputType": "textarea", "placeholder": "Tell us what stood out..."}
+        ]
+    }
+]
+
+RULES_FILE = os.getenv("FOLLOWUP_RULES_FILE")
+
+class CompiledRule:
+    def __init__(self, rule):
+        self.name = rule.get("name", "custom")
+        phrases = sorted({normalize_answer(a) for a in rule.get("answers", []) if normalize_answer(a)}, key=len, reverse=True)
+        alternation = "|".join(re.escape(p) for p in phrases) or r"(?!)"
+        if rule.get("match", "exact") == "contains":
+            self.answer_re = re.compile(rf"(?:^| )(?:{alternation})(?: |$)")
+        else:
+            self.answer_re = re.compile(rf"^(?:{alternation})$")
+        pattern = rule.get("questionPattern")
+        self.question_re = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.input_types = set(rule["inputTypes"]) if rule.get("inputTypes") else None
+        self.follow_ups = rule["followUpQuestions"]
+
+    def matches(self, question_data, normalized_answer):
+        if self.input_types and question_data.get("inputType") not in self.input_types:
+            return False
+        if self.question_re and not self.question_re.search(question_data.get("question", "")):
+            return False
+        return self.answer_re.search(normalized_answer) is not None
+
+# Compiled tables kept for the most recently used (form, template) pairs
+RULE_TABLE_ENTRIES = 512
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+def _rules_path():
+    return RULES_FILE or data_path("followup_rules.json")
+
+def _rules_mtime():
+    try:
+        return os.path.getmtime(_rules_path())
+    except OSError:
+        return None
+
+def _load_config():
+    try:
+        with open(_rules_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def get_rule_table(form_id=None, template=None):
+    """
+    Returns the compiled rules for a form: its own rules, then its
+    template's, then the defaults (unless a level sets inheritDefaults: false).
+    Compiled tables are reused until the rules file changes.
+    """
+    key = (form_id, template)
+    mtime = _rules_mtime()
+    with _compiled_lock:
+        entry = _compiled.get(key)
+        if entry is not None and entry[0] == mtime:
+            _compiled.move_to_end(key)
+            return entry[1]
+
+    config = _load_config()
+    rules = []
+    inherit_defaults = True
+    for section, name in (("forms", form_id), ("templates", template)):
+        entry = (config.get(section) or {}).get(name) if name else None
+        if entry:
+            rules.extend(entry.get("rules", []))
+            inherit_defaults = inherit_defaults and entry.get("inheritDefaults", True)
+    if inherit_defaults:
+        rules.extend(DEFAULT_RULES)
+
+    table = [CompiledRule(rule) for rule in rules]
+    with _compiled_lock:
+        # Replaces the table compiled from an older version of the file
+        _compiled[key] = (mtime, table)
+        _compiled.move_to_end(key)
+        while len(_compiled) > RULE_TABLE_ENTRIES:
+            _compiled.popitem(last=False)
+    return table
+
+def match_followup_rules(question_data, answer, form_id=None, template=None, rules=None, record_metrics=True):
+    """
+    Returns a follow-up result in the same shape as the model's
+    ({"followUpQuestions": [...]}) if a rule matches, otherwise None.
+
+    `rules` overrides the configured table with an inline list of rules.
+    `record_metrics=False` leaves the hit/miss counters alone (for lookups
+    that aren't live requests, such as precomputation).
+    """
+    if not isinstance(question_data, dict) or answer is None or isinstance(answer, (list, dict)):
+        return None
+
+    table = [CompiledRule(rule) for rule in rules] if rules else get_rule_table(form_id, template)
+    normalized = normalize_answer(answer)
+    for rule in table:
+        if rule.matches(question_data, normalized):
+            if record_metrics:
+                increment("followup_rules.hits", f"followup_rules.rule.{rule.name}")
+                count("ruleHits")
+            question_id = question_data.get("questionId", "q")
+            return {
+                "followUpQuestions": [
+                    {
+                        "questionId": f"{question_id}_f{index}",
+                        "question": follow_up["question"],
+                        "inputType": follow_up.get("inputType", "text"),
+                        "options": follow_up.get("options", []),
+                        "required": follow_up.get("required", True),
+                        "placeholder": follow_up.get("placeholder", ""),
+                        "order": index
+                    }
+                    for index, follow_up in enumerate(rule.follow_ups, 1)
+                ],
+                "source": "rule",
+                "rule": rule.name
+            }
+
+    if record_metrics:
+        increment("followup_rules.misses")
+    return None
+
+def rule_stats():
+    """Hit/miss counts and the share of follow-up requests that skipped the model."""
+    counters = read_counters("followup_rules.")
+    hits = counters.get("followup_rules.hits", 0)
+    misses = counters.get("followup_rules.misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hitRate": round(hits / (hits + misses), 4) if hits + misses else 0,
+        "byRule": {
+            name[len("followup_rules.rule."):]: value
+            for name, value in counters.items()
+            if name.startswith("followup_rules.rule.")
+        }
+    }
@@ -0,0 +1,442 @@
+"""
+Columnar analytics over a form's submissions.
+
+Submissions are loaded once into NumPy columns: one category code per
+answer of each choice question (radio/select/checkbox/rating), the numeric
+value of rating answers, a per-submission sentiment label (reportStats) and
+the submission time from `completedAt`. Every aggregate after that is a
+bincount or a mask over those arrays:
+
+    columns = SubmissionColumns(form)
+    columns.observe_many(submissions)
+    columns.option_counts("q1")            -> {"Excellent": 412, "Good": 288, ...}
+    columns.crosstab("q1", "q2")           -> {"rows": [...], "columns": [...], "counts": [[...]]}
+    columns.trend("day", columns.sentiments() == -1)
+    columns.rating_means()                 -> {"q3": {"mean": 4.12, "count": 700}}
+
+Loading is a single pass over the submissions (it can consume a stream);
+the aggregates take milliseconds even for a million submissions.
+`dashboard()` shapes the results for the dashboard cards and
+`prompt_context()` for the report prompt.
+
+    python3 formAnalytics.py '{"form": {...}, "submissions": [...]}' [--bucket day]
+    python3 formAnalytics.py --ndjson - [--bucket hour] [--crosstab q1,q2] < form_and_submissions.ndjson
+"""
+import json
+import argparse
+import warnings
+from array import array
+from datetime import datetime
+import numpy as np
+from reportStats import QUALITY_SCORES, ReportStatistics
+from answerText import normalize_answer
+from ndjsonInput import iter_ndjson, split_header
+from aiMetrics import finish_call, start_call, timed
+
+CATEGORICAL_TYPES = {"radio", "select", "checkbox", "rating"}
+
+BUCKET_SECONDS = {"hour": 60 * 60, "day": 24 * 60 * 60, "week": 7 * 24 * 60 * 60}
+BUCKET_UNITS = {"hour": "m", "day": "D", "week": "D"}
+# Trends longer than this keep only their most recent buckets
+MAX_TREND_BUCKETS = 1000
+# completedAt strings are parsed in blocks of this many, so they aren't all held at once
+TIMESTAMP_BLOCK = 4096
+
+def parse_timestamps(values):
+    """
+    Epoch seconds (int64) for `completedAt` values: ISO strings (as sent by
+    the routes), epoch milliseconds, or missing (-1).
+    """
+    seconds = np.full(len(values), -1, dtype=np.int64)
+    strings, positions = [], []
+    for position, value in enumerate(values):
+        if isinstance(value, str) and value:
+            strings.append(value)
+            positions.append(position)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            seconds[position] = int(value // 1000)
+    if not strings:
+        return seconds
+    try:
+        # NumPy warns (on stderr) about UTC offsets but applies them correctly
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = np.array(strings, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        parsed = np.array([_parse_one(value) for value in strings], dtype=np.int64)
+    seconds[positions] = parsed
+    return seconds
+
+def _parse_one(value):
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+    if parsed.tzinfo is None:
+        return int((parsed - datetime(1970, 1, 1)).total_seconds())
+    return int(parsed.timestamp())
+
+class _ChoiceColumn:
+    """Category codes of one question's answers, as (row, code) pairs."""
+
+    def __init__(self, question):
+        self.question = question
+        self.labels = []
+        self._codes_by_key = {}
+        # Choice answers repeat verbatim, so most skip normalization
+        self._codes_by_answer = {}
+        self.rows = array("I")
+        self.codes = array("i")
+        self.multi = False
+        for option in question.get("options") or []:
+            self.code(option)
+
+    def code(self, answer):
+        if isinstance(answer, str):
+            code = self._codes_by_answer.get(answer)
+            if code is None:
+                code = self._codes_by_answer[answer] = self._code(answer)
+            return code
+        return self._code(answer)
+
+    def _code(self, answer):
+        key = normalize_answer(answer)
+        code = self._codes_by_key.get(key)
+        if code is None:
+            code = self._codes_by_key[key] = len(self.labels)
+            self.labels.append(str(answer).strip())
+        return code
+
+    def add(self, row, answer):
+        if isinstance(answer, list):
+            self.multi = True
+            values = answer
+        else:
+            values = [answer]
+        for value in values:
+            if value is None or value == "" or isinstance(value, (list, dict)):
+                continue
+            self.rows.append(row)
+            self.codes.append(self.code(value))
+
+class SubmissionColumns:
+    """
+    A form's submissions as NumPy columns.
+
+    Pass a ReportStatistics as `stats` when the caller already observes the
+    same submissions through it (generateReport does), so answers aren't
+    scored for sentiment twice.
+    """
+
+    def __init__(self, form_data, stats=None):
+        self.total = 0
+        self.questions = {}
+        self._by_text = {}
+        self._choice = {}
+        self._numeric = {}
+        self._times = array("q")
+        self._pending_times = []
+        self._owns_stats = stats is None
+        self.stats = stats if stats is not None else ReportStatistics(form_data)
+        self._frozen = None
+        for question in (form_data or {}).get("questions", []):
+            question_id = question.get("questionId")
+            if not question_id or question.get("isFollowUp"):
+                continue
+            self.questions[question_id] = question
+            if question.get("question"):
+                self._by_text[question["question"]] = question_id
+            if question.get("inputType") in CATEGORICAL_TYPES:
+                self._choice[question_id] = _ChoiceColumn(question)
+            if question.get("inputType") == "rating":
+                self._numeric[question_id] = (array("I"), array("d"))
+
+    def _question_id(self, response):
+        question_id = response.get("questionId")
+        if question_id in self.questions:
+            return question_id
+        return self._by_text.get(response.get("question"))
+
+    def observe(self, submission):
+        row = self.total
+        self.total += 1
+        self._frozen = None
+        self._pending_times.append(submission.get("completedAt"))
+        if len(self._pending_times) >= TIMESTAMP_BLOCK:
+            self._parse_pending_times()
+        if self._owns_stats:
+            self.stats.observe(submission)
+        for response in submission.get("responses", []):
+            question_id = self._question_id(response)
+            if question_id is None:
+                continue
+            answer = response.get("answer")
+            column = self._choice.get(question_id)
+            if column is not None:
+                column.add(row, answer)
+            numeric = self._numeric.get(question_id)
+            if numeric is not None:
+                try:
+                    value = float(answer)
+                except (TypeError, ValueError):
+                    continue
+                numeric[0].append(row)
+                numeric[1].append(value)
+
+    def observe_all(self, submissions):
+        """Passes submissions through unchanged while recording them."""
+        for submission in submissions:
+            self.observe(submission)
+            yield submission
+
+    def observe_many(self, submissions):
+        for submission in submissions:
+            self.observe(submission)
+        return self
+
+    def _parse_pending_times(self):
+        if self._pending_times:
+            self._times.extend(parse_timestamps(self._pending_times).tolist())
+            self._pending_times = []
+
+    def _arrays(self):
+        # Converted once per batch of observations, then shared by every aggregate
+        if self._frozen is None:
+            self._parse_pending_times()
+            self._frozen = {
+                "timestamps": np.array(self._times, dtype=np.int64),
+                "choice": {
+                    question_id: (np.array(column.rows, dtype=np.int64), np.array(column.codes, dtype=np.int64))
+                    for question_id, column in self._choice.items()
+                },
+                "numeric": {
+                    question_id: (np.array(rows, dtype=np.int64), np.array(values, dtype=np.float64))
+                    for question_id, (rows, values) in self._numeric.items()
+                },
+            }
+        return self._frozen
+
+    def timestamps(self):
+        """Submission times in epoch seconds (-1 when unknown)."""
+        return self._arrays()["timestamps"]
+
+    def sentiments(self):
+        """Per-submission sentiment: 1 positive, -1 negative, 0 neutral."""
+        return self.stats.submission_sentiments()
+
+    def _choice_column(self, question_id):
+        column = self._choice.get(question_id)
+        if column is None:
+            raise KeyError(f"Not a choice question: {question_id}")
+        rows, codes = self._arrays()["choice"][question_id]
+        return column, rows, codes
+
+    def option_counts(self, question_id, mask=None):
+        """Answers per option (options first, then other answers as given)."""
+        column, rows, codes = self._choice_column(question_id)
+        if mask is not None:
+            codes = codes[mask[rows]]
+        counts = np.bincount(codes, minlength=len(column.labels))
+        return dict(zip(column.labels, counts.tolist()))
+
+    def answered(self, question_id, option):
+        """Boolean mask of the submissions that gave `option` to a choice question."""
+        column, rows, codes = self._choice_column(question_id)
+        mask = np.zeros(self.total, dtype=bool)
+        code = column._codes_by_key.get(normalize_answer(option))
+        if code is not None:
+            mask[rows[codes == code]] = True
+        return mask
+
+    def _indicator(self, question_id):
+        column, rows, codes = self._choice_column(question_id)
+        if column.multi:
+            matrix = np.zeros((self.total, len(column.labels)), dtype=np.int32)
+            np.add.at(matrix, (rows, codes), 1)
+            return column, matrix
+        dense = np.full(self.total, -1, dtype=np.int64)
+        dense[rows] = codes
+        return column, dense
+
+    def crosstab(self, first_id, second_id):
+        """Submissions per (first answer, second answer) pair of two choice questions."""
+        first, a = self._indicator(first_id)
+        second, b = self._indicator(second_id)
+        size_a, size_b = len(first.labels), len(second.labels)
+        if a.ndim == 1 and b.ndim == 1:
+            both = (a >= 0) & (b >= 0)
+            counts = np.bincount(a[both] * size_b + b[both], minlength=size_a * size_b).reshape(size_a, size_b)
+        else:
+            # Multi-select questions: one indicator column per option
+            if a.ndim == 1:
+                a = (a[:, None] == np.arange(size_a)).astype(np.int32)
+            if b.ndim == 1:
+                b = (b[:, None] == np.arange(size_b)).astype(np.int32)
+            counts = a.T @ b
+        return {"rows": list(first.labels), "columns": list(second.labels), "counts": counts.tolist()}
+
+    def rating_means(self):
+        """
+        Mean answer of every rating question (on its own scale) and mean
+        1-5 grade of every choice question with quality-label options.
+        """
+        means = {}
+        arrays = self._arrays()
+        for question_id, (rows, values) in arrays["numeric"].items():
+            if len(values):
+                means[question_id] = {"mean": round(float(values.mean()), 2), "count": int(len(values))}
+        for question_id, column in self._choice.items():
+            if question_id in means or column.question.get("inputType") == "checkbox":
+                continue
+            grades = np.array([QUALITY_SCORES.get(normalize_answer(label), np.nan) for label in column.labels])
+            if not len(grades) or np.isnan(grades).all():
+                continue
+            answer_grades = grades[arrays["choice"][question_id][1]]
+            answer_grades = answer_grades[~np.isnan(answer_grades)]
+            if len(answer_grades):
+                means[question_id] = {"mean": round(float(answer_grades.mean()), 2), "count": int(len(answer_grades))}
+        return means
+
+    def trend(self, bucket="day", mask=None, limit=MAX_TREND_BUCKETS):
+        """
+        Submissions per time bucket ("hour", "day" or "week"), oldest first,
+        including empty buckets: [{"date": ..., "value": n}]. `mask`
+        restricts the count to some submissions.
+        """
+        return _trend_points(self.timestamps(), bucket, mask, limit)
+
+    def dashboard(self, bucket="day"):
+        """Exact values for the dashboard cards and per-question charts."""
+        timestamps = self.timestamps()
+        labels = self.sentiments()
+        counts = {
+            "positive": int((labels == 1).sum()),
+            "negative": int((labels == -1).sum()),
+            "neutral": int((labels == 0).sum()),
+        }
+        positive_trend = _trend_points(timestamps, bucket, labels == 1)
+        negative_trend = _trend_points(timestamps, bucket, labels == -1)
+        recent_positive = positive_trend[-4:]
+
+        questions = {}
+        means = self.rating_means()
+        for question_id, question in self.questions.items():
+            entry = {"question": question.get("question", ""), "inputType": question.get("inputType")}
+            if question_id in self._choice:
+                entry["counts"] = self.option_counts(question_id)
+            if question_id in means:
+                entry.update(means[question_id])
+            questions[question_id] = entry
+
+        return {
+            "totalSubmissions": self.total,
+            "sentiment": {"sentiment": counts},
+            "positiveResponses": {
+                "total": counts["positive"],
+                "percentageChange": percentage_change(positive_trend),
+                "chartData": {
+                    "labels": [point["date"] for point in recent_positive],
+                    "values": [point["value"] for point in recent_positive]
+                }
+            },
+            "negativeResponses": {
+                "negativeResponses": negative_trend,
+                "percentageChange": percentage_change(negative_trend),
+                "totalNegative": counts["negative"]
+            },
+            "responseTrend": {"trendData": self.trend(bucket)},
+            "questions": questions
+        }
+
+    def prompt_context(self, max_options=10):
+        """
+        Compact exact aggregates for a report prompt: answer counts of the
+        choice questions (most common options first) and rating means.
+        """
+        context = {}
+        means = self.rating_means()
+        for question_id, question in self.questions.items():
+            entry = {}
+            if question_id in self._choice:
+                counts = sorted(self.option_counts(question_id).items(), key=lambda item: -item[1])
+                entry["answerCounts"] = {label: count for label, count in counts[:max_options] if count}
+            if question_id in means:
+                entry["mean"] = means[question_id]["mean"]
+            if entry.get("answerCounts") or "mean" in entry:
+                context[question.get("question") or question_id] = entry
+        return context
+
+def _trend_points(timestamps, bucket, mask=None, limit=MAX_TREND_BUCKETS):
+    size = BUCKET_SECONDS[bucket]
+    known = timestamps >= 0
+    if not known.any():
+        return []
+    # Weeks start on Monday (the epoch was a Thursday)
+    offset = 3 * 24 * 60 * 60 if bucket == "week" else 0
+    buckets = (timestamps[known] + offset) // size
+    first, last = int(buckets.min()), int(buckets.max())
+    if mask is not None:
+        buckets = buckets[mask[known]]
+    first = max(first, last - limit + 1)
+    buckets = buckets[buckets >= first]
+    values = np.bincount(buckets - first, minlength=last - first + 1)
+    starts = (np.arange(first, last + 1) * size - offset).astype("datetime64[s]")
+    dates = np.datetime_as_string(starts, unit=BUCKET_UNITS[bucket])
+    return [{"date": date, "value": value} for date, value in zip(dates.tolist(), values.tolist())]
+
+def percentage_change(points):
+    """Change of the latest bucket against the one before, in percent."""
+    if len(points) < 2 or not points[-2]["value"]:
+        return 0
+    return round(100 * (points[-1]["value"] - points[-2]["value"]) / points[-2]["value"], 1)
+
+def form_analytics(form_data, submissions_data, bucket="day", crosstabs=()):
+    """
+    Dashboard analytics for a form's submissions (a list or any iterable).
+    `crosstabs` lists (first, second) pairs of choice question ids whose
+    crosstabs are added under "crosstabs".
+    """
+    if bucket not in BUCKET_SECONDS:
+        return {"error": f"Unknown bucket: {bucket}"}
+    columns = SubmissionColumns(form_data)
+    for pair in crosstabs or ():
+        missing = [question_id for question_id in pair if question_id not in columns._choice]
+        if len(pair) != 2 or missing:
+            return {"error": f"Crosstabs need two choice question ids, got: {','.join(map(str, pair))}"}
+    columns.observe_many(submissions_data)
+    result = columns.dashboard(bucket)
+    if crosstabs:
+        result["crosstabs"] = [
+            {"questionIds": list(pair), **columns.crosstab(*pair)} for pair in crosstabs
+        ]
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exact analytics over a form's submissions")
+    parser.add_argument("input", nargs="?", help='JSON: {"form": {...}, "submissions": [...]}')
+    parser.add_argument("--ndjson", metavar="PATH",
+                        help='Read an optional {"form": {...}} header line, then one submission per line ("-" for stdin)')
+    parser.add_argument("--bucket", default="day", choices=list(BUCKET_SECONDS))
+    parser.add_argument("--crosstab", action="append", default=[], metavar="Q1,Q2",
+                        help="Add the crosstab of two choice questions (repeatable)")
+    args = parser.parse_args()
+
+    metrics = start_call("form_analytics")
+    try:
+        if args.ndjson:
+            form_data, submissions_data = split_header(iter_ndjson(args.ndjson), "form")
+            form_data = form_data or {}
+        else:
+            with timed("parse"):
+                input_data = json.loads(args.input or "{}")
+            form_data = input_data.get("form", {})
+            submissions_data = input_data.get("submissions", [])
+
+        crosstabs = [tuple(pair.split(",")) for pair in args.crosstab]
+        result = form_analytics(form_data, submissions_data, bucket=args.bucket, crosstabs=crosstabs)
+        print(json.dumps(finish_call(metrics, result)))
+
+    except json.JSONDecodeError as e:
+        print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}))
+    except Exception as e:
+        print(json.dumps({"error": f"Error: {str(e)}"}))
@@ -0,0 +1,295 @@
+"""
+Similarity index over previously generated forms and stored form templates.
+
+Business descriptions repeat with different wording ("Nike wants feedback
+on their new shoe line" vs "feedback for Nike's new shoes"), so before
+asking the model for a new form, the description is compared against every
+earlier description and template title. Texts are vectorized as TF-IDF over
+words and their character 3/4-grams (after dropping filler words such as
+"feedback", "wants", "form" and a trailing plural "s"), and compared by
+cosine similarity:
+
+    index.lookup("feedback for Nike's new shoes")
+    -> {"key": "generated:nike wants feedback on their new shoe line",
+        "source": "generated", "similarity": 0.84, "form": {...}, ...}
+
+Entries live in SQLite under AI_DATA_DIR. Every write gets a sequence
+number, so a long-running process (aiWorker) only reloads rows changed
+since its last lookup instead of rebuilding the index.
+
+FORM_INDEX=0 turns the index off; FORM_INDEX_THRESHOLD is the similarity a
+match needs (default 0.7).
+
+    python formIndex.py add-templates < templates.json   # JSON array or one per line
+    python formIndex.py remove-template TEMPLATE_ID
+    python formIndex.py lookup "business description"
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from aiSettings import data_path
+from answerText import normalize_answer
+
+INDEX_ENABLED = os.getenv("FORM_INDEX", "1") != "0"
+SIMILARITY_THRESHOLD = float(os.getenv("FORM_INDEX_THRESHOLD", 0.7))
+
+# Words that say nothing about what the form is for
+STOPWORDS = set(
+    "a an the and or of for to on in at by with from about into after before our their its "
+    "your my his her they we you i it is are be been this that these those new wants want "
+    "would like looking need needs get collect gather know think feedback form survey "
+    "questionnaire opinion opinions customer customers client clients user users people".split()
+)
+NGRAM_SIZES = (3, 4)
+
+# AI forms accept fewer input types than templates
+TEMPLATE_INPUT_TYPES = {"password": "text", "tel": "text", "date": "text"}
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+def text_terms(text):
+    """Term counts of a description: its words plus their character n-grams."""
+    terms = Counter()
+    for word in normalize_answer(re.sub(r"['\u2019]s\b", "", str(text))).split():
+        if word in STOPWORDS:
+            continue
+        word = _stem(word)
+        terms["w:" + word] += 1
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            terms.update(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return terms
+
+def form_key(description):
+    return "generated:" + normalize_answer(description)
+
+class FormIndex:
+    """
+    In-memory TF-IDF index over the entries of a SQLite file.
+
+    `sync()` applies rows written (by any process) since the last sync;
+    lookups sync first.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path("form_index.sqlite3")
+        self.seq = 0
+        self.entries = {}
+        self.postings = {}
+        self.document_frequency = Counter()
+        self._norms = None
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS forms ("
+                "key TEXT PRIMARY KEY, source TEXT NOT NULL, text TEXT NOT NULL, form TEXT, "
+                "updated_at REAL NOT NULL, seq INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS forms_seq ON forms (seq)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def sync(self):
+        """Loads entries added, changed or removed since the last sync."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT key, text, form IS NOT NULL, seq FROM forms WHERE seq > ? ORDER BY seq", (self.seq,)
+            ).fetchall()
+        if not rows:
+            return
+        with self._lock:
+            for key, text, live, seq in rows:
+                self._drop(key)
+                if live:
+                    self._insert(key, text)
+                self.seq = max(self.seq, seq)
+            self._norms = None
+
+    def _insert(self, key, text):
+        terms = {term: 1 + math.log(count) for term, count in text_terms(text).items()}
+        self.entries[key] = terms
+        for term, weight in terms.items():
+            self.postings.setdefault(term, {})[key] = weight
+        self.document_frequency.update(terms.keys())
+
+    def _drop(self, key):
+        terms = self.entries.pop(key, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+            self.document_frequency[term] -= 1
+            if not self.document_frequency[term]:
+                del self.document_frequency[term]
+
+    def _idf(self, term):
+        return math.log((len(self.entries) + 1) / (self.document_frequency.get(term, 0) + 1)) + 1
+
+    def _entry_norms(self):
+        # IDF shifts with every change, so norms are recomputed lazily after one
+        if self._norms is None:
+            self._norms = {
+                key: math.sqrt(sum((weight * self._idf(term)) ** 2 for term, weight in terms.items())) or 1.0
+                for key, terms in self.entries.items()
+            }
+        return self._norms
+
+    def lookup(self, description, threshold=None):
+        """
+        The stored entry most similar to `description`, as a dict with its
+        form and "similarity", or None if nothing reaches the threshold.
+        """
+        threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.sync()
+        query = {term: (1 + math.log(count)) for term, count in text_terms(description).items()}
+        with self._lock:
+            if not query or not self.entries:
+                return None
+            norms = self._entry_norms()
+            query = {term: weight * self._idf(term) for term, weight in query.items()}
+            query_norm = math.sqrt(sum(weight * weight for weight in query.values()))
+            scores = Counter()
+            for term, weight in query.items():
+                idf = self._idf(term)
+                for key, entry_weight in self.postings.get(term, {}).items():
+                    scores[key] += weight * entry_weight * idf
+        if not scores:
+            return None
+        key, score = max(((key, score / (query_norm * norms[key])) for key, score in scores.items()), key=lambda item: item[1])
+        if score < threshold:
+            return None
+
+        with self._connect() as db:
+            row = db.execute("SELECT source, text, form, updated_at FROM forms WHERE key = ?", (key,)).fetchone()
+        if row is None or row[2] is None:
+            return None
+        return {
+            "key": key,
+            "source": row[0],
+            "text": row[1],
+            "form": json.loads(row[2]),
+            "updatedAt": row[3],
+            "similarity": round(score, 3),
+        }
+
+    def add(self, key, source, text, form):
+        """Stores (or replaces) one entry; picked up by every index on its next sync."""
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO forms (key, source, text, form, updated_at, seq) "
+                "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM forms))",
+                (key, source, text, json.dumps(form), time.time())
+            )
+
+    def touch(self, key):
+        """Resets an entry's age without re-indexing it."""
+        with self._connect() as db:
+            db.execute("UPDATE forms SET updated_at = ? WHERE key = ?", (time.time(), key))
+
+    def remove(self, key):
+        """Removes an entry, leaving a tombstone so other processes drop it too."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE forms SET form = NULL, text = '', updated_at = ?, "
+                "seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM forms) WHERE key = ?",
+                (time.time(), key)
+            )
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """The process-wide index, or None when FORM_INDEX=0."""
+    global _index
+    if not INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = FormIndex()
+    return _index
+
+def find_similar_form(description):
+    index = get_index()
+    return index.lookup(description) if index else None
+
+def store_generated_form(description, form):
+    """Indexes a successfully generated form under its description."""
+    index = get_index()
+    if index is None or not isinstance(form, dict) or not form.get("questions"):
+        return
+    index.add(form_key(description), "generated", description, form)
+
+def template_form(template):
+    """Converts a form template document into the generated-form structure."""
+    questions = []
+    for order, field in enumerate(template.get("fields") or [], start=1):
+        question = {
+            "questionId": f"q{order}",
+            "question": field.get("question", ""),
+            "inputType": TEMPLATE_INPUT_TYPES.get(field.get("inputType"), field.get("inputType") or "text"),
+            "required": bool(field.get("required", False)),
+            "order": order,
+        }
+        if field.get("options"):
+            question["options"] = field["options"]
+        if field.get("placeholder"):
+            question["placeholder"] = field["placeholder"]
+        questions.append(question)
+    return {"title": template.get("title", ""), "description": template.get("description", ""), "questions": questions}
+
+def index_template(template):
+    """Indexes a form template by its title and description; returns False if it can't be."""
+    index = get_index()
+    template_id = template.get("_id") or template.get("formId")
+    text = f"{template.get('title', '')} {template.get('description') or ''}".strip()
+    if index is None or not template_id or not text or not template.get("fields"):
+        return False
+    index.add(f"template:{template_id}", "template", text, template_form(template))
+    return True
+
+def remove_template(template_id):
+    index = get_index()
+    if index is not None:
+        index.remove(f"template:{template_id}")
+
+def _read_templates(stream):
+    text = stream.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+if __name__ == "__main__":
+    try:
+        command = sys.argv[1] if len(sys.argv) > 1 else ""
+        if command == "add-templates":
+            templates = _read_templates(sys.stdin)
+            print(json.dumps({"indexed": sum(index_template(template) for template in templates)}))
+        elif command == "remove-template" and len(sys.argv) > 2:
+            remove_template(sys.argv[2])
+            print(json.dumps({"removed": sys.argv[2]}))
+        elif command == "lookup" and len(sys.argv) > 2:
+            print(json.dumps(find_similar_form(sys.argv[2]), indent=2))
+        else:
+            print(json.dumps({"error": "Usage: formIndex.py add-templates | remove-template ID | lookup DESCRIPTION"}))
+            sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
@@ -1,26 +1,29 @@
 import sys
 import json
 import os
-import re
-from groq import Groq
+from concurrent.futures import ThreadPoolExecutor
+from modelRouter import complete_json, stream_json
+from streamJson import ndjson_emitter, ndjson_reset
+from followUpRules import match_followup_rules
+from followUpCache import get_cached_followups, store_followups
+from aiMetrics import finish_call, propagate, start_call, timed
 
-def extract_json(text):
-    """Extracts valid JSON from a response string."""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            json_start = text.find('{')
-            json_end = text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                try:
-                    return json.loads(text[json_start:json_end])
-                except:
-                    pass
-    return None
-
-def generate_followup_questions(question_data, answer, all_responses):
+# Answer-to-follow-up mappings shared by the single and batch prompts
+FOLLOWUP_EXAMPLES = """EXAMPLES:
+- If answer is "Too High" or "price was high" or "expensive" → Generate: "What price range do you think it should fall in?" with radio options ["$50-75", "$75-100", "$100-150", "Above $150"]
+- If answer is "Too Low" → Generate: "What price range would be more appropriate?"
+- If answer is "Just Right" → Generate: "Would you recommend this product to others at this price?"
+- If answer mentions "poor" or "bad" or "uncomfortable" → Generate: "What specific aspects need improvement?" with relevant options
+- If answer mentions "excellent" or "great" or "good" → Generate: "What did you like most about it?" with specific options
+- If answer is negative → Generate questions to understand WHY and WHAT should be changed
+- If answer is positive → Generate questions to understand WHAT specifically they liked"""
+
+# How many per-question prompts may run at once when a batch falls back
+# to one call per answer
+FOLLOWUP_BATCH_CONCURRENCY = int(os.getenv("FOLLOWUP_BATCH_CONCURRENCY", 4))
+
+def generate_followup_questions(question_data, answer, all_responses, form_id=None, template=None, cache_policy=None,
+                                on_item=None, on_reset=None, record_metrics=True):
     """
     Generate follow-up questions based on user's answer to a question.
     
@@ -28,7 +31,27 @@ def generate_followup_questions(question_data, answer, all_responses):
         question_data: The question object (questionId, question, inputType, etc.)
         answer: The user's answer
         all_responses: All previous responses to understand context
+        form_id, template: Select the form's/template's follow-up rules
+        cache_policy: Overrides FOLLOWUP_CACHE_POLICY (see followUpCache)
+        on_item: If given, the model's response is streamed and
+            on_item(key, index, question) is called for each follow-up
+            question as soon as it is complete
+        on_reset: Called if the streamed questions are superseded by a
+            larger model's (see modelRouter.stream_json)
+        record_metrics: False keeps the rule and cache hit/miss counters
+            out of it (precomputation isn't respondent traffic)
     """
+
+    # Common answers are served from the rule table; the model only sees misses
+    rule_result = match_followup_rules(
+        question_data, answer, form_id=form_id, template=template, record_metrics=record_metrics
+    )
+    if rule_result:
+        return rule_result
+
+    cached = get_cached_followups(form_id, question_data, answer, all_responses, cache_policy, record_metrics)
+    if cached:
+        return cached
     
     # Build context from all responses
     context = "\n".join([
@@ -36,9 +59,6 @@ def generate_followup_questions(question_data, answer, all_responses):
         for r in all_responses
     ])
     
-    # Analyze the answer to determine what kind of follow-up is needed
-    answer_lower = str(answer).lower()
-    
     prompt = f"""
 You are an expert at creating contextual follow-up questions for feedback forms. Analyze the user's EXACT answer and generate 1-2 highly relevant follow-up questions that directly address what they said.
 
@@ -50,14 +70,7 @@ Previous responses for context:
 
 CRITICAL: Generate follow-up questions that are SPECIFICALLY tailored to the EXACT answer given. The follow-up must directly relate to what the user said:
 
-EXAMPLES:
-- If answer is "Too High" or "price was high" or "expensive" → Generate: "What price range do you think it should fall in?" with radio options ["$50-75", "$75-100", "$100-150", "Above $150"]
-- If answer is "Too Low" → Generate: "What price range would be more appropriate?"
-- If answer is "Just Right" → Generate: "Would you recommend this product to others at this price?"
-- If answer mentions "poor" or "bad" or "uncomfortable" → Generate: "What specific aspects need improvement?" with relevant options
-- If answer mentions "excellent" or "great" or "good" → Generate: "What did you like most about it?" with specific options
-- If answer is negative → Generate questions to understand WHY and WHAT should be changed
-- If answer is positive → Generate questions to understand WHAT specifically they liked
+{FOLLOWUP_EXAMPLES}
 
 Generate 1-2 follow-up questions that:
 1. DIRECTLY address what the user said in their answer (not generic questions)
@@ -94,49 +107,202 @@ CRITICAL RULES:
     if not api_key:
         return {"error": "Missing GROQ_API key"}
     
-    client = Groq(api_key=api_key)
-
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are an expert at creating contextual follow-up questions. Always return valid JSON only. Generate questions that directly address what the user said in their answer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5
-        )
-        
-        result_text = response.choices[0].message.content
-        
-        # Clean the response
-        result_text = re.sub(r'```json\s*', '', result_text)
-        result_text = re.sub(r'```\s*', '', result_text)
-        result_text = result_text.strip()
-        
-        json_data = extract_json(result_text)
+        messages = [
+            {"role": "system", "content": "You are an expert at creating contextual follow-up questions. Always return valid JSON only. Generate questions that directly address what the user said in their answer."},
+            {"role": "user", "content": prompt}
+        ]
+        required = ("followUpQuestions",)
+        if on_item:
+            json_data, result_text = stream_json(
+                "followup", messages, 0.5, ("followUpQuestions",), on_item, required=required, on_reset=on_reset
+            )
+        else:
+            json_data, result_text = complete_json("followup", messages, temperature=0.5, required=required)
+        if result_text is None:
+            return {"error": "No valid response from AI"}
         
-        if json_data:
+        if json_data is not None:
+            store_followups(form_id, question_data, answer, json_data, all_responses, cache_policy)
             return json_data
         else:
-            return {"error": "Failed to parse AI response", "raw_response": result_text}
+            return {"error": "Failed to parse AI response", "raw_response": result_text.strip()}
 
     except Exception as e:
         return {"error": str(e)}
 
+def _generate_combined_followups(answers, all_responses):
+    """One prompt for every answer on the page; returns {questionId: followUpQuestions}."""
+    context = "\n".join([
+        f"Q: {r.get('question', '')}\nA: {r.get('answer', '')}"
+        for r in all_responses
+    ])
+    answered = "\n".join([
+        f"- questionId \"{item['question'].get('questionId', '')}\": \"{item['question'].get('question', '')}\" → User's Answer: \"{item.get('answer')}\""
+        for item in answers
+    ])
+
+    prompt = f"""
+You are an expert at creating contextual follow-up questions for feedback forms. A user just answered several questions on one page. For EACH answered question, analyze the user's EXACT answer and generate 1-2 highly relevant follow-up questions that directly address what they said.
+
+Answered Questions:
+{answered}
+
+Previous responses for context:
+{context}
+
+{FOLLOWUP_EXAMPLES}
+
+Return ONLY a valid JSON object keyed by the questionId of each answered question (no markdown, just pure JSON):
+
+    {{
+        "followUps": {{
+            "q1": [
+                {{
+                    "question": "What price range do you think it should fall in?",
+                    "inputType": "radio",
+                    "options": ["$50-75", "$75-100", "$100-150", "Above $150"],
+                    "required": true,
+                    "order": 1
+                }}
+            ]
+        }}
+    }}
+
+CRITICAL RULES:
+- Include every answered questionId exactly once
+- Generate 1-2 follow-up questions MAXIMUM per answered question
+- Questions MUST directly address what the user said in that answer
+- Keep questions concise, specific, and actionable
+- Return ONLY the JSON, no explanations, no markdown formatting
+"""
+
+    json_data, _ = complete_json(
+        "followup_batch",
+        [
+            {"role": "system", "content": "You are an expert at creating contextual follow-up questions. Always return valid JSON only. Generate questions that directly address what the user said in their answer."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        required=("followUps",)
+    )
+    if json_data is None or not isinstance(json_data.get("followUps"), dict):
+        return {}
+    return {
+        question_id: questions
+        for question_id, questions in json_data["followUps"].items()
+        if isinstance(questions, list) and questions
+    }
+
+def generate_followup_batch(answers, all_responses, combined=True, form_id=None, template=None, cache_policy=None):
+    """
+    Generate follow-up questions for every answered question on a page.
+
+    Args:
+        answers: List of {"question": question_data, "answer": answer}
+        all_responses: All previous responses to understand context
+        combined: Ask for all follow-ups in one prompt first; any question
+            the combined answer misses is retried with its own prompt, at
+            most FOLLOWUP_BATCH_CONCURRENCY at a time
+
+    Returns {"followUps": {questionId: {"followUpQuestions": [...]} or {"error": ...}}}
+    Malformed items (not {"question": {...}, ...}) are skipped.
+    """
+    answers = [item for item in answers if isinstance(item, dict) and isinstance(item.get("question"), dict)]
+    results = {}
+
+    # Rule and cache hits never reach the model
+    for item in answers:
+        question_data, answer = item["question"], item.get("answer")
+        result = (
+            match_followup_rules(question_data, answer, form_id=form_id, template=template)
+            or get_cached_followups(form_id, question_data, answer, all_responses, cache_policy)
+        )
+        if result:
+            results[question_data.get("questionId")] = result
+    answers = [item for item in answers if item["question"].get("questionId") not in results]
+    if not answers:
+        return {"followUps": results}
+
+    api_key = os.getenv("GROQ_API")
+    if not api_key:
+        return {"error": "Missing GROQ_API key"}
+
+    if combined and len(answers) > 1:
+        try:
+            requested = {item["question"].get("questionId"): item for item in answers}
+            for question_id, questions in _generate_combined_followups(answers, all_responses).items():
+                if question_id in requested:
+                    results[question_id] = {"followUpQuestions": questions}
+                    item = requested[question_id]
+                    store_followups(form_id, item["question"], item.get("answer"), results[question_id], all_responses, cache_policy)
+        except Exception:
+            # Fall back to one prompt per answer below
+            pass
+
+    remaining = [item for item in answers if item["question"].get("questionId") not in results]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=max(1, min(FOLLOWUP_BATCH_CONCURRENCY, len(remaining)))) as executor:
+            outputs = executor.map(
+                propagate(lambda item: generate_followup_questions(
+                    item["question"], item.get("answer"), all_responses, form_id, template, cache_policy
+                )),
+                remaining
+            )
+            for item, output in zip(remaining, outputs):
+                results[item["question"].get("questionId")] = output
+
+    return {"followUps": results}
+
 if __name__ == "__main__":
+    metrics = start_call("generate_followup_questions")
     try:
-        if len(sys.argv) < 2:
+        # Input is a JSON argument or, without one, JSON on stdin
+        args = sys.argv[1:]
+        stream = bool(args) and args[0] == "--stream"
+        if stream:
+            args = args[1:]
+        with timed("parse"):
+            raw_input = args[0] if args else sys.stdin.read()
+        if not raw_input.strip():
             print(json.dumps({"error": "Missing input data"}))
             sys.exit(1)
+        with timed("parse"):
+            input_data = json.loads(raw_input)
 
-        input_data = json.loads(sys.argv[1])
-        
-        question_data = input_data.get("question")
-        answer = input_data.get("answer")
-        all_responses = input_data.get("allResponses", [])
-        
-        result = generate_followup_questions(question_data, answer, all_responses)
-        print(json.dumps(result, indent=2))
+        if "answers" in input_data:
+            # Batch mode: every answered question on a page at once
+            result = generate_followup_batch(
+                input_data["answers"],
+                input_data.get("allResponses", []),
+                form_id=input_data.get("formId"),
+                template=input_data.get("template"),
+                cache_policy=input_data.get("cachePolicy")
+            )
+        else:
+            question_data = input_data.get("question")
+            answer = input_data.get("answer")
+            all_responses = input_data.get("allResponses", [])
+
+            result = generate_followup_questions(
+                question_data,
+                answer,
+                all_responses,
+                form_id=input_data.get("formId"),
+                template=input_data.get("template"),
+                cache_policy=input_data.get("cachePolicy"),
+                # --stream: one {"type": "item"} line per question as it completes
+                on_item=ndjson_emitter(sys.stdout) if stream else None,
+                on_reset=ndjson_reset(sys.stdout) if stream else None
+            )
+
+        if metrics and "answers" in input_data:
+            metrics.task = "generate_followup_batch"
+        result = finish_call(metrics, result)
+        if stream:
+            print(json.dumps({"type": "result", "result": result}))
+        else:
+            print(json.dumps(result, indent=2))
 
     except json.JSONDecodeError:
         print(json.dumps({"error": "Invalid JSON input"}))
@@ -1,33 +1,74 @@
 import sys
 import json
 import os
-import re
-from groq import Groq
-
-def extract_json(text):
-    """Extracts valid JSON from a response string."""
-    # Try to find JSON object in the response
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            # Try to extract just the JSON part
-            json_start = text.find('{')
-            json_end = text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                try:
-                    return json.loads(text[json_start:json_end])
-                except:
-                    pass
-    return None
-
-def generate_form_from_description(business_description):
+import time
+import subprocess
+from modelRouter import complete_json, stream_json
+from streamJson import ndjson_emitter, ndjson_reset
+from aiMetrics import count, finish_call, start_call
+from aiCounters import increment
+from formIndex import find_similar_form, get_index, store_generated_form
+
+# With FORM_INDEX_REFRESH=1, a form served from the similarity index that is
+# older than FORM_INDEX_REFRESH_AFTER seconds is regenerated in the background
+# for the next caller
+REFRESH_ENABLED = os.getenv("FORM_INDEX_REFRESH", "0") == "1"
+REFRESH_AFTER_SECONDS = int(os.getenv("FORM_INDEX_REFRESH_AFTER", 24 * 60 * 60))
+
+def indexed_form(match, on_item=None):
+    """Returns a form from the similarity index, passing its questions to `on_item` like a stream would."""
+    form = dict(match["form"])
+    if on_item:
+        for index, question in enumerate(form.get("questions") or []):
+            on_item("questions", index, question)
+    form["source"] = "index"
+    form["similarity"] = match["similarity"]
+    form["matchedDescription"] = match["text"]
+    return form
+
+def refresh_in_background(match):
+    """
+    Regenerates an indexed form in a detached process, so neither this
+    script nor the route waiting on its output has to wait for the model.
+    """
+    if not REFRESH_ENABLED or match["source"] != "generated":
+        return
+    if time.time() - match["updatedAt"] < REFRESH_AFTER_SECONDS:
+        return
+    # Reset the entry's age first so concurrent hits don't all start a refresh
+    get_index().touch(match["key"])
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--refresh-index", match["text"]],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        start_new_session=True
+    )
+
+def generate_form_from_description(business_description, on_item=None, use_index=True, on_reset=None):
     """
     Generate a form structure from business description using AI.
     Example: "Nike wants feedback on their new shoe line"
+
+    If `on_item(key, index, question)` is given, the response is streamed
+    and each question is passed to it as soon as the model finishes it.
+    `on_reset()` is called if those questions are superseded by a larger
+    model's (see modelRouter.stream_json).
+
+    A description similar enough to an earlier one or to a form template
+    (see formIndex.py) gets that form back without a model call, marked
+    with "source": "index". `use_index=False` always asks the model.
     """
-    
+    if use_index:
+        match = find_similar_form(business_description)
+        if match:
+            increment("form_index.hits")
+            count("cacheHits")
+            refresh_in_background(match)
+            return indexed_form(match, on_item)
+        increment("form_index.misses")
+
     prompt = f"""
 You are an expert form builder. A business wants to create a feedback form based on this description:
 
@@ -91,44 +132,52 @@ Important:
     if not api_key:
         return {"error": "Missing GROQ_API key. Set the environment variable."}
     
-    client = Groq(api_key=api_key)
-
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are an expert form builder. Always return valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        
-        result_text = response.choices[0].message.content
-        
-        # Clean the response - remove markdown code blocks if present
-        result_text = re.sub(r'```json\s*', '', result_text)
-        result_text = re.sub(r'```\s*', '', result_text)
-        result_text = result_text.strip()
-        
-        json_data = extract_json(result_text)
+        messages = [
+            {"role": "system", "content": "You are an expert form builder. Always return valid JSON only."},
+            {"role": "user", "content": prompt}
+        ]
+        if on_item:
+            json_data, result_text = stream_json(
+                "form", messages, 0.3, ("questions",), on_item, required=("questions",), on_reset=on_reset
+            )
+        else:
+            json_data, result_text = complete_json("form", messages, temperature=0.3, required=("questions",))
+        if result_text is None:
+            return {"error": "No valid response from AI"}
         
-        if json_data:
+        if json_data is not None:
+            store_generated_form(business_description, json_data)
             return json_data
         else:
-            return {"error": "Failed to parse AI response as JSON", "raw_response": result_text}
+            return {"error": "Failed to parse AI response as JSON", "raw_response": result_text.strip()}
 
     except Exception as e:
         return {"error": str(e)}
 
 if __name__ == "__main__":
+    metrics = start_call("generate_form_from_description")
     try:
         if len(sys.argv) < 2:
             print(json.dumps({"error": "Missing business description"}))
             sys.exit(1)
 
-        business_description = sys.argv[1]
-        result = generate_form_from_description(business_description)
-        print(json.dumps(result, indent=2))
+        if sys.argv[1] == "--refresh-index":
+            # Started by refresh_in_background; the regenerated form replaces the indexed one
+            business_description = sys.argv[2] if len(sys.argv) > 2 else ""
+            result = generate_form_from_description(business_description, use_index=False)
+            print(json.dumps(finish_call(metrics, result)))
+        elif sys.argv[1] == "--stream":
+            # One {"type": "item"} line per question as it completes, then {"type": "result"}
+            business_description = sys.argv[2] if len(sys.argv) > 2 else ""
+            result = generate_form_from_description(
+                business_description, on_item=ndjson_emitter(sys.stdout), on_reset=ndjson_reset(sys.stdout)
+            )
+            print(json.dumps({"type": "result", "result": finish_call(metrics, result)}))
+        else:
+            business_description = sys.argv[1]
+            result = generate_form_from_description(business_description)
+            print(json.dumps(finish_call(metrics, result), indent=2))
 
     except Exception as e:
         print(json.dumps({"error": str(e)}))
@@ -1,66 +1,54 @@
-import sys
 import json
 import os
-import re
-from groq import Groq
-
-def extract_json(text):
-    """Extracts valid JSON from a response string."""
-    # Try to find JSON object
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-    
-    # Try to find JSON array
-    match = re.search(r'\[.*\]', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-    
-    return {"error": "AI response did not contain valid JSON", "raw_response": text[:500]}
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from modelRouter import complete_json
+from ndjsonInput import iter_ndjson, split_header
+from reportStats import ReportStatistics, answer_polarities, apply_statistics, merge_totals, statistics_from_totals
+from formAnalytics import SubmissionColumns
+from reportStore import load_report_state, save_report_state
+from singleFlight import flight_key, single_flight, spool_input
+from promptBudget import PromptPacker, count_tokens
+from promptBatches import batch_collapsed_submissions, batch_submissions, group_partials
+from lexiconSentiment import PROMPT_LABELS, label_scores, with_label
+from aiMetrics import finish_call, propagate, start_call, timed
 
-def generate_ai_report(form_data, submissions_data):
-    """Generate AI-powered report from form submissions."""
-    
-    api_key = os.getenv("GROQ_API")
-    if not api_key:
-        return {"error": "GROQ_API key not found"}
-
-    # Format submissions for analysis
-    submissions_text = ""
-    for idx, submission in enumerate(submissions_data, 1):
-        submissions_text += f"\n\nSubmission #{idx}:\n"
-        for response in submission.get('responses', []):
-            question = response.get('question', '')
-            answer = response.get('answer', '')
-            submissions_text += f"  Q: {question}\n  A: {answer}\n"
+# Token budget for the submissions in one prompt, and how many batch prompts
+# may be in flight at once when a large form is summarized in chunks
+REPORT_BATCH_TOKENS = int(os.getenv("REPORT_BATCH_TOKENS", 6000))
+REPORT_MAP_CONCURRENCY = int(os.getenv("REPORT_MAP_CONCURRENCY", 4))
+# Collapse near-duplicate answers into one line with a count (REPORT_DEDUP=0 to send every answer)
+REPORT_DEDUP = os.getenv("REPORT_DEDUP", "1") != "0"
 
-    prompt = f"""
-You are an expert data analyst specializing in customer feedback analysis. Analyze the following product review form submissions and generate a comprehensive AI-powered report.
-
-Form Title: {form_data.get('title', 'Product Review Form')}
-Form Description: {form_data.get('description', '')}
-Total Submissions: {len(submissions_data)}
-
-Submissions Data:
-{submissions_text}
+SYSTEM_PROMPT = "You are an expert data analyst. Always return valid JSON only, no markdown."
 
-Generate a detailed report in the following JSON format. Focus on:
-1. Key insights and trends from customer responses
-2. Sentiment analysis (positive, negative, neutral)
-3. Common themes and patterns
-4. Areas of strength and improvement
-5. Actionable recommendations
-6. Statistical summaries
+SENTIMENTS = ("positive", "negative", "neutral")
+DISTRIBUTION_KEYS = ("excellent", "good", "average", "poor")
 
-Return ONLY valid JSON (no markdown, no explanations):
+def format_submissions(submissions_data, packer):
+    """
+    Yields the prompt text for one submission at a time, with answers longer
+    than PROMPT_MAX_ANSWER_TOKENS truncated (counted on `packer`) and, with
+    PROMPT_SENTIMENT_LABELS=1, tagged with their lexicon sentiment.
+    """
+    for idx, submission in enumerate(submissions_data, 1):
+        responses = submission.get('responses', [])
+        if PROMPT_LABELS:
+            labels = label_scores(answer_polarities([str(r.get('answer', '')) for r in responses])).tolist()
+        else:
+            labels = ["neutral"] * len(responses)
+        lines = [f"\n\nSubmission #{idx}:\n"]
+        for response, label in zip(responses, labels):
+            question = response.get('question', '')
+            answer = with_label(packer.truncate_answer(response.get('answer', '')), label)
+            lines.append(f"  Q: {question}\n  A: {answer}\n")
+        yield "".join(lines)
 
-{{
+def report_json_format(total_submissions):
+    """The JSON structure every report (single-pass or merged) must follow."""
+    return f"""{{
     "executiveSummary": {{
         "overallSentiment": "positive/negative/neutral",
         "keyFindings": [
@@ -68,7 +56,7 @@ Return ONLY valid JSON (no markdown, no explanations):
             "Finding 2",
             "Finding 3"
         ],
-        "totalSubmissions": {len(submissions_data)},
+        "totalSubmissions": {total_submissions},
         "responseRate": "high/medium/low"
     }},
     "sentimentAnalysis": {{
@@ -128,53 +116,501 @@ Return ONLY valid JSON (no markdown, no explanations):
         "averageRating": 0,
         "satisfactionScore": 0,
         "responseDistribution": {{
-            "excellent": 0,
-            "good": 0,
-            "average": 0,
-            "poor": 0
+            "Question text": {{
+                "excellent": 0,
+                "good": 0,
+                "average": 0,
+                "poor": 0
+            }}
         }}
     }}
-}}
+}}"""
+
+def qualitative_json_format():
+    """report_json_format without the numeric fields computed locally by reportStats."""
+    text = report_json_format(0)
+    text = text[:text.index(',\n    "statistics"')] + "\n}"
+    numeric = ('"count": 0,', '"percentage": 0,', '"totalSubmissions":')
+    return "\n".join(line for line in text.splitlines() if not line.strip().startswith(numeric))
+
+def request_json(prompt, temperature=0.3, task="report", required=("executiveSummary",)):
+    """
+    Sends one report prompt through the task's model cascade (modelRouter)
+    and returns the parsed JSON.
+    """
+    json_data, raw_response = complete_json(
+        task,
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=temperature,
+        required=required
+    )
+
+    if raw_response is None:
+        return {"error": "No valid response from AI"}
+    if json_data is None:
+        return {"error": "AI response did not contain valid JSON", "raw_response": raw_response[:500]}
+    return json_data
+
+def partial_json_format():
+    """Compact per-batch structure used by the map and intermediate merge passes."""
+    return """{
+    "submissionCount": 0,
+    "sentimentCounts": {"positive": 0, "negative": 0, "neutral": 0},
+    "sentimentExamples": {"positive": ["quote"], "negative": ["quote"], "neutral": ["quote"]},
+    "keyFindings": ["Finding"],
+    "themes": [
+        {"theme": "Theme description", "category": "price/quality/design/service/etc", "mentions": 0, "evidence": "Short quote"}
+    ],
+    "strengths": ["Strength"],
+    "improvements": [
+        {"area": "Area needing improvement", "priority": "high/medium/low", "recommendation": "Specific recommendation"}
+    ],
+    "ratingSum": 0,
+    "ratingCount": 0,
+    "responseDistribution": {"Question text": {"excellent": 0, "good": 0, "average": 0, "poor": 0}}
+}"""
+
+def summarize_batch(form_data, batch_text, submission_count):
+    """Map step: condenses one batch of submissions into a partial report."""
+    prompt = f"""
+You are an expert data analyst. Below is one batch of {submission_count} submissions from the product review form "{form_data.get('title', 'Product Review Form')}". Other batches are analyzed separately and merged later, so only describe THIS batch.
+
+Submissions Data:
+{batch_text}
+
+Return ONLY valid JSON in this format (counts must cover exactly these {submission_count} submissions; keep at most 3 examples, 5 findings and 5 themes):
+
+{partial_json_format()}
+"""
+    return request_json(prompt, temperature=0.2, task="report_batch", required=("sentimentCounts",))
+
+def merge_partials_with_ai(partials):
+    """Intermediate reduce step: folds several partial reports into one."""
+    prompt = f"""
+You are an expert data analyst. Merge the following partial analyses of one feedback form into a single partial analysis. Combine duplicate themes and findings, keep the most representative examples, and add up counts.
+
+Partial analyses:
+{json.dumps(partials)}
+
+Return ONLY valid JSON in this format:
+
+{partial_json_format()}
+"""
+    merged = request_json(prompt, temperature=0.2, task="report_merge", required=("sentimentCounts",))
+    if not isinstance(merged, dict) or "error" in merged:
+        return merged
+    # Counts are summed locally rather than trusted to the model
+    merged.update(sum_partial_counts(partials))
+    return merged
+
+def _merged_or_original(group):
+    merged = merge_partials_with_ai(group)
+    if isinstance(merged, dict) and "error" not in merged:
+        return [merged]
+    return group
+
+def sum_partial_counts(partials):
+    """Adds up the numeric fields of partial reports."""
+    totals = {
+        "submissionCount": 0,
+        "sentimentCounts": {key: 0 for key in SENTIMENTS},
+        "ratingSum": 0,
+        "ratingCount": 0,
+        "responseDistribution": {}
+    }
+    for partial in partials:
+        totals["submissionCount"] += _as_number(partial.get("submissionCount"))
+        totals["ratingSum"] += _as_number(partial.get("ratingSum"))
+        totals["ratingCount"] += _as_number(partial.get("ratingCount"))
+        for key in SENTIMENTS:
+            totals["sentimentCounts"][key] += _as_number((partial.get("sentimentCounts") or {}).get(key))
+        distribution = partial.get("responseDistribution")
+        for question, counts in (distribution.items() if isinstance(distribution, dict) else ()):
+            if not isinstance(counts, dict):
+                continue
+            summed = totals["responseDistribution"].setdefault(question, {key: 0 for key in DISTRIBUTION_KEYS})
+            for key in DISTRIBUTION_KEYS:
+                summed[key] += _as_number(counts.get(key))
+    return totals
+
+def _as_number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+def apply_partial_counts(report, totals, total_submissions):
+    """Overwrites the report's numeric sections with the summed batch counts."""
+    report.setdefault("executiveSummary", {})["totalSubmissions"] = total_submissions
+
+    sentiment = report.setdefault("sentimentAnalysis", {})
+    counted = sum(totals["sentimentCounts"].values())
+    for key in SENTIMENTS:
+        count = totals["sentimentCounts"][key]
+        section = sentiment.setdefault(key, {})
+        section["count"] = count
+        section["percentage"] = round(100 * count / counted, 1) if counted else 0
+
+    statistics = report.setdefault("statistics", {})
+    statistics["responseDistribution"] = totals["responseDistribution"]
+    if totals["ratingCount"]:
+        statistics["averageRating"] = round(totals["ratingSum"] / totals["ratingCount"], 2)
+    return report
+
+def reduce_partials(form_data, partials, total_submissions, computed_text=""):
+    """
+    Reduce step: merges partial reports into the full report structure.
+    `computed_text` adds exact per-question counts as context.
+    """
+    # Fold partials in groups until they fit in one prompt
+    while len(partials) > 1 and count_tokens(json.dumps(partials)) > REPORT_BATCH_TOKENS:
+        groups = group_partials(partials, REPORT_BATCH_TOKENS)
+        if len(groups) == len(partials):
+            break
+        with ThreadPoolExecutor(max_workers=REPORT_MAP_CONCURRENCY) as executor:
+            results = list(executor.map(
+                propagate(lambda group: [group[0]] if len(group) == 1 else _merged_or_original(group)),
+                groups
+            ))
+        merged = [partial for result in results for partial in result]
+        if len(merged) >= len(partials):
+            break
+        partials = merged
+
+    prompt = f"""
+You are an expert data analyst specializing in customer feedback analysis. The {total_submissions} submissions of a product review form were analyzed in batches. Merge the batch analyses below into one comprehensive AI-powered report.
+
+Form Title: {form_data.get('title', 'Product Review Form')}
+Form Description: {form_data.get('description', '')}
+Total Submissions: {total_submissions}
+
+Batch Analyses:
+{json.dumps(partials)}
+{computed_text}
+Combine duplicate findings and themes, weigh them by how often they were mentioned, and pick the most representative examples.
+
+Return ONLY valid JSON (no markdown, no explanations):
+
+{report_json_format(total_submissions)}
+
+Important: Return ONLY the JSON object, no markdown formatting, no code blocks, no explanations.
+"""
+    report = request_json(prompt)
+    if not isinstance(report, dict) or "error" in report:
+        return report
+    return apply_partial_counts(report, sum_partial_counts(partials), total_submissions)
+
+def generate_chunked_report(form_data, batches, computed_text=None):
+    """
+    Map-reduce report for forms too large for a single prompt.
+
+    Batches are summarized concurrently (at most REPORT_MAP_CONCURRENCY in
+    flight, so only that many batch texts are held in memory), then merged.
+    `computed_text` is called once every batch has been read and returns
+    context for the reduce prompt.
+    """
+    partials = []
+    failed_batches = 0
+    total_submissions = 0
+
+    def collect(future):
+        nonlocal failed_batches
+        partial = future.result()
+        if isinstance(partial, dict) and "error" not in partial:
+            partials.append(partial)
+        else:
+            failed_batches += 1
+
+    summarize = propagate(summarize_batch)
+    with ThreadPoolExecutor(max_workers=REPORT_MAP_CONCURRENCY) as executor:
+        in_flight = deque()
+        for batch_text, submission_count in batches:
+            total_submissions += submission_count
+            if len(in_flight) >= REPORT_MAP_CONCURRENCY:
+                collect(in_flight.popleft())
+            in_flight.append(executor.submit(summarize, form_data, batch_text, submission_count))
+        while in_flight:
+            collect(in_flight.popleft())
+
+    if not partials:
+        return {"error": "AI failed to analyze any submission batch"}
+
+    report = reduce_partials(form_data, partials, total_submissions, computed_text() if computed_text else "")
+    if isinstance(report, dict) and "error" not in report and failed_batches:
+        report["failedBatches"] = failed_batches
+    return report
+
+def computed_statistics_text(known):
+    """Prompt block with exact values computed locally; empty when there are none."""
+    known = {key: value for key, value in known.items() if value}
+    if not known:
+        return ""
+    return f"""
+Computed Statistics (exact values over every submission; sentiment and statistics are merged into the report separately. Use them as context and do not recount):
+{json.dumps(known)}
+"""
+
+def generate_ai_report(form_data, submissions_data, chunked=None, stats=None):
+    """
+    Generate AI-powered report from form submissions.
+
+    `submissions_data` may be a list or any iterable (e.g. an NDJSON stream);
+    it is consumed once, so parsed submissions can be dropped as soon as
+    their prompt text has been written.
+
+    With chunked=None the map-reduce path is used only when the submissions
+    don't fit in REPORT_BATCH_TOKENS; True forces it, False disables it.
+    Pass a ReportStatistics as `stats` to read its totals afterwards.
+
+    The report's "promptUsage" says how many submissions and tokens went to
+    the model, and how many were truncated or (with chunked=False, when the
+    submissions exceed one REPORT_BATCH_TOKENS prompt) dropped. Statistics
+    always cover every submission.
+    """
+    
+    api_key = os.getenv("GROQ_API")
+    if not api_key:
+        return {"error": "GROQ_API key not found"}
+
+    # Counts, distributions and ratings are computed exactly as submissions stream past
+    stats = stats or ReportStatistics(form_data)
+    columns = SubmissionColumns(form_data, stats=stats)
+    submissions_data = columns.observe_all(stats.observe_all(submissions_data))
+    packer = PromptPacker(REPORT_BATCH_TOKENS)
+
+    if chunked is not False:
+        if REPORT_DEDUP:
+            batches = batch_collapsed_submissions(submissions_data, REPORT_BATCH_TOKENS, packer)
+        else:
+            batches = batch_submissions(format_submissions(submissions_data, packer), REPORT_BATCH_TOKENS, packer)
+        first = next(batches, None)
+        second = next(batches, None)
+        if second is not None or (chunked and first is not None):
+            try:
+                report = generate_chunked_report(
+                    form_data,
+                    chain([b for b in (first, second) if b], batches),
+                    computed_text=lambda: computed_statistics_text({"answers": columns.prompt_context()})
+                )
+            except Exception as e:
+                return {"error": f"AI API error: {str(e)}"}
+            if isinstance(report, dict) and "error" not in report:
+                apply_statistics(report, stats.result())
+                report["promptUsage"] = packer.usage()
+            return report
+        submissions_text, total_submissions = first if first else ("", 0)
+    else:
+        # One prompt only: keep the submissions that fit in the budget
+        for chunk in format_submissions(submissions_data, packer):
+            packer.add(chunk)
+        submissions_text = packer.text()
+        total_submissions = packer.included
+
+    computed = stats.result()
+    # Only ask the model for the qualitative sections when the numbers are known
+    json_format = qualitative_json_format() if computed["statistics"] else report_json_format(total_submissions)
+    known = {key: computed[key] for key in ("sentiment", "statistics") if computed[key]}
+    known["answers"] = columns.prompt_context()
+    computed_text = computed_statistics_text(known)
+
+    prompt = f"""
+You are an expert data analyst specializing in customer feedback analysis. Analyze the following product review form submissions and generate a comprehensive AI-powered report.
+
+Form Title: {form_data.get('title', 'Product Review Form')}
+Form Description: {form_data.get('description', '')}
+Total Submissions: {total_submissions}
+
+Submissions Data:
+{submissions_text}
+{computed_text}
+Generate a detailed report in the following JSON format. Focus on:
+1. Key insights and trends from customer responses
+2. Sentiment analysis (positive, negative, neutral)
+3. Common themes and patterns
+4. Areas of strength and improvement
+5. Actionable recommendations
+6. Statistical summaries
+
+Return ONLY valid JSON (no markdown, no explanations):
+
+{json_format}
 
 Important: Return ONLY the JSON object, no markdown formatting, no code blocks, no explanations.
 """
 
     try:
-        client = Groq(api_key=api_key)
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an expert data analyst. Always return valid JSON only, no markdown."},
-                {"role": "user", "content": prompt}
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0.3
-        )
+        report = request_json(prompt)
+    except Exception as e:
+        return {"error": f"AI API error: {str(e)}"}
 
-        if not chat_completion.choices or len(chat_completion.choices) == 0:
-            return {"error": "No valid response from AI"}
+    if isinstance(report, dict) and "error" not in report:
+        apply_statistics(report, computed)
+        report["promptUsage"] = packer.usage()
+    return report
 
-        raw_response = chat_completion.choices[0].message.content
-        json_response = extract_json(raw_response)
+def _track_new_submissions(submissions_data, state, progress):
+    """
+    Yields only the submissions the stored report doesn't cover yet and
+    collects their "_id"s in progress["submissionIds"].
 
-        if "error" in json_response:
-            return json_response
+    A submission with an "_id" is new unless the stored state lists it.
+    Without IDs, one whose `completedAt` is after the stored latest timestamp
+    is new (ISO-8601 strings sort chronologically). Without either, the
+    submissions are taken to be newest first, as route.js sorts them, so all
+    but the last `submissionCount` are new.
+    """
+    last_completed_at = state["lastCompletedAt"] if state else None
+    seen_ids = state["submissionIds"] if state else set()
+    seen_before = state["submissionCount"] if state else 0
+    # Held back until `seen_before` later submissions show they aren't among the covered ones
+    trailing = deque()
+    for submission in submissions_data:
+        completed_at = submission.get("completedAt")
+        if completed_at and (progress["lastCompletedAt"] is None or completed_at > progress["lastCompletedAt"]):
+            progress["lastCompletedAt"] = completed_at
+        submission_id = submission.get("_id")
+        if submission_id and seen_ids:
+            is_new = str(submission_id) not in seen_ids
+        elif completed_at and last_completed_at:
+            is_new = completed_at > last_completed_at
+        else:
+            trailing.append(submission)
+            if len(trailing) <= seen_before:
+                continue
+            submission = trailing.popleft()
+            is_new = True
+        if is_new:
+            progress["newSubmissions"] += 1
+            if submission.get("_id"):
+                progress["submissionIds"].append(submission["_id"])
+            yield submission
 
-        return json_response
+def merge_reports(form_data, stored_report, new_report, stored_total, new_count, graded):
+    """Asks the model to fold a report on new submissions into the stored report."""
+    total_submissions = stored_total + new_count
+    json_format = qualitative_json_format() if graded else report_json_format(total_submissions)
+    prompt = f"""
+You are an expert data analyst specializing in customer feedback analysis. Below is the existing report for the first {stored_total} submissions of the product review form "{form_data.get('title', 'Product Review Form')}", followed by a report on {new_count} newer submissions.
 
+Update the existing report so it reflects all {total_submissions} submissions: keep findings that still hold, add new ones, re-rank insights by importance and call out anything that is changing in the newer submissions as a trend.
+
+Existing Report:
+{json.dumps(stored_report)}
+
+New Submissions Report:
+{json.dumps(new_report)}
+
+Return ONLY valid JSON (no markdown, no explanations):
+
+{json_format}
+
+Important: Return ONLY the JSON object, no markdown formatting, no code blocks, no explanations.
+"""
+    return request_json(prompt)
+
+def generate_incremental_report(form_id, form_data, submissions_data, chunked=None):
+    """
+    Report that only analyzes submissions added since the last run for this form.
+
+    The first run builds a full report and stores it together with its
+    totals and a high-water mark (reportStore). Later runs report on the new
+    submissions only, merge that into the stored report through a merge
+    prompt, and update the counts by adding totals rather than recounting.
+    """
+    state = load_report_state(form_id)
+    progress = {"lastCompletedAt": None, "newSubmissions": 0, "submissionIds": []}
+    new_submissions = _track_new_submissions(submissions_data, state, progress)
+    stats = ReportStatistics(form_data)
+
+    if state is None:
+        report = generate_ai_report(form_data, new_submissions, chunked=chunked, stats=stats)
+        if isinstance(report, dict) and "error" not in report and stats.total:
+            save_report_state(
+                form_id, report, stats.totals(), stats.total, progress["lastCompletedAt"], progress["submissionIds"]
+            )
+        return report
+
+    first_new = next(new_submissions, None)
+    if first_new is None:
+        # Nothing new since the last run
+        return state["report"]
+
+    new_report = generate_ai_report(form_data, chain([first_new], new_submissions), chunked=chunked, stats=stats)
+    if not isinstance(new_report, dict) or "error" in new_report:
+        # Serve the last good report rather than failing the request
+        return state["report"]
+
+    totals = merge_totals(state["totals"], stats.totals())
+    graded = totals["gradedAnswers"] > 0
+    prompt_usage = new_report.pop("promptUsage", None)
+    stored_report = {key: value for key, value in state["report"].items() if key != "promptUsage"}
+    try:
+        report = merge_reports(form_data, stored_report, new_report, state["submissionCount"], stats.total, graded)
     except Exception as e:
         return {"error": f"AI API error: {str(e)}"}
+    if not isinstance(report, dict) or "error" in report:
+        return state["report"]
+
+    apply_statistics(report, statistics_from_totals(totals))
+
+    if prompt_usage:
+        report["promptUsage"] = prompt_usage
+    last_completed_at = max(filter(None, [state["lastCompletedAt"], progress["lastCompletedAt"]]), default=None)
+    save_report_state(form_id, report, totals, totals["totalSubmissions"], last_completed_at, progress["submissionIds"])
+    return report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an AI report from form submissions")
+    parser.add_argument("input", nargs="?", help="JSON object with 'form' and 'submissions'")
+    parser.add_argument("--ndjson", nargs="?", const="-", metavar="PATH",
+                        help="Read submissions as NDJSON from PATH (default: stdin)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Always use map-reduce batches, even for small forms")
+    parser.add_argument("--form-id",
+                        help="Incremental mode: only analyze submissions added since the stored report for this form")
+    args = parser.parse_args()
+
+    metrics = start_call("generate_ai_report")
     try:
-        input_data = json.loads(sys.argv[1])
-        form_data = input_data.get('form', {})
-        submissions_data = input_data.get('submissions', [])
-        
-        result = generate_ai_report(form_data, submissions_data)
-        print(json.dumps(result))
+        spool = None
+        if args.ndjson:
+            # Hashed (and spooled, from stdin) up front so identical concurrent runs share one
+            with timed("parse"):
+                digest, spool = spool_input(args.ndjson)
+        else:
+            digest = args.input or ""
+        chunked = True if args.chunked else None
+
+        def run():
+            if spool:
+                # Streaming mode: optional {"form": {...}} header line, then one submission per line
+                form_data, submissions_data = split_header(iter_ndjson(spool), "form")
+                form_data = form_data or {}
+            else:
+                with timed("parse"):
+                    input_data = json.loads(args.input)
+                form_data = input_data.get('form', {})
+                submissions_data = input_data.get('submissions', [])
+
+            if args.form_id:
+                return generate_incremental_report(args.form_id, form_data, submissions_data, chunked=chunked)
+            return generate_ai_report(form_data, submissions_data, chunked=chunked)
+
+        refresh_argv = None
+        if spool and args.form_id:
+            refresh_argv = [os.path.abspath(__file__), "--ndjson", spool, "--form-id", args.form_id]
+            if args.chunked:
+                refresh_argv.append("--chunked")
+        result = single_flight(
+            flight_key("generate_ai_report", digest, args.form_id or "", bool(args.chunked)),
+            run,
+            scope=f"generate_ai_report:{args.form_id}" if args.form_id else None,
+            refresh_argv=refresh_argv,
+            spool=spool
+        )
+        print(json.dumps(finish_call(metrics, result)))
         
     except json.JSONDecodeError as e:
         print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}))
     except Exception as e:
         print(json.dumps({"error": f"Error: {str(e)}"}))
-
@@ -0,0 +1,264 @@
+import os
+import time
+import random
+import threading
+import httpx
+from groq import Groq, DefaultHttpxClient, APIStatusError, APIConnectionError
+from llmCache import get_cache, cache_key
+from aiCounters import increment
+from rateLimiter import TokenBucket, parse_duration, parse_int
+from promptBudget import count_tokens
+from aiMetrics import count, current, timed
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+# Client-side budgets, kept below Groq's limits so bursts queue here instead
+# of failing with 429s. 0 disables a bucket. The token budget is resized to
+# the limit Groq reports in its response headers.
+REQUESTS_PER_MINUTE = int(os.getenv("GROQ_RPM", 30))
+TOKENS_PER_MINUTE = int(os.getenv("GROQ_TPM", 6000))
+# Completion tokens reserved per call until the real usage is known
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("GROQ_COMPLETION_TOKENS", 500))
+
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 4))
+BACKOFF_BASE_SECONDS = float(os.getenv("GROQ_BACKOFF_BASE", 0.5))
+BACKOFF_MAX_SECONDS = float(os.getenv("GROQ_BACKOFF_MAX", 30))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT", 60))
+POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", 10))
+
+RETRY_STATUSES = {408, 409, 429}
+
+_client = None
+_client_lock = threading.Lock()
+
+_request_bucket = TokenBucket(REQUESTS_PER_MINUTE) if REQUESTS_PER_MINUTE > 0 else None
+_token_bucket = TokenBucket(TOKENS_PER_MINUTE) if TOKENS_PER_MINUTE > 0 else None
+
+def get_client():
+    """
+    Returns the process-wide Groq client, creating it on first use.
+
+    The client owns a keep-alive HTTP connection pool, so sharing it keeps
+    TLS connections warm across calls in the long-running worker
+    (aiWorker.py). Retries are done here rather than by the SDK so they can
+    share the rate-limit budget. Returns None if the GROQ_API key is not set.
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+
+    api_key = os.getenv("GROQ_API")
+    if not api_key:
+        return None
+
+    with _client_lock:
+        if _client is None:
+            _client = Groq(
+                api_key=api_key,
+                max_retries=0,
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                http_client=DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=POOL_SIZE,
+                        max_keepalive_connections=POOL_SIZE,
+                        keepalive_expiry=30
+                    )
+                )
+            )
+    return _client
+
+def estimate_request_tokens(messages):
+    """Estimated tokens of a request: the prompt plus the completion allowance."""
+    return sum(count_tokens(message.get("content") or "") for message in messages) + COMPLETION_TOKEN_ESTIMATE
+
+def _wait_for_budget(tokens):
+    waited = 0.0
+    if _request_bucket:
+        waited += _request_bucket.acquire(1)
+    if _token_bucket:
+        waited += _token_bucket.acquire(tokens)
+    if waited:
+        increment("groq.throttled")
+        metrics = current()
+        if metrics is not None:
+            metrics.record_rate_limit_wait(waited)
+
+def _sync_limits(headers):
+    """Feeds Groq's x-ratelimit-* headers back into the buckets."""
+    if _request_bucket:
+        _request_bucket.sync(
+            remaining=parse_int(headers.get("x-ratelimit-remaining-requests")),
+            reset_seconds=parse_duration(headers.get("x-ratelimit-reset-requests"))
+        )
+    if _token_bucket:
+        _token_bucket.sync(
+            remaining=parse_int(headers.get("x-ratelimit-remaining-tokens")),
+            reset_seconds=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            limit=parse_int(headers.get("x-ratelimit-limit-tokens"))
+        )
+
+def _settle_tokens(reserved, used):
+    if _token_bucket and used is not None:
+        _token_bucket.refund(reserved - used)
+
+def _retry_delay(error, attempt):
+    """
+    Seconds to wait before retrying `error`, or None if it is not retryable.
+
+    A retry-after header is honored as given; otherwise the delay is
+    exponential backoff with full jitter, so concurrent callers that failed
+    together do not retry together.
+    """
+    if isinstance(error, APIStatusError):
+        status = error.status_code
+        if status not in RETRY_STATUSES and status < 500:
+            return None
+        retry_after = parse_duration(error.response.headers.get("retry-after"))
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_MAX_SECONDS)
+    elif not isinstance(error, APIConnectionError):
+        return None
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def _create(client, request):
+    """
+    Sends one chat completion request within the rate-limit budget, retrying
+    429s, 5xx responses and connection errors up to GROQ_MAX_RETRIES times.
+
+    Returns the parsed response (a stream when request has stream=True) and
+    the number of tokens reserved for it.
+    """
+    tokens = estimate_request_tokens(request["messages"])
+    for attempt in range(MAX_RETRIES + 1):
+        _wait_for_budget(tokens)
+        try:
+            raw = client.chat.completions.with_raw_response.create(**request)
+        except (APIStatusError, APIConnectionError) as error:
+            _settle_tokens(tokens, 0)
+            delay = _retry_delay(error, attempt)
+            if delay is None or attempt == MAX_RETRIES:
+                raise
+            if isinstance(error, APIStatusError) and error.status_code == 429:
+                increment("groq.rate_limited")
+                # Everyone sharing this client backs off, not just this caller
+                for bucket in (_request_bucket, _token_bucket):
+                    if bucket:
+                        bucket.pause(delay)
+            increment("groq.retries")
+            count("retries")
+            time.sleep(delay)
+            continue
+        _sync_limits(raw.headers)
+        return raw.parse(), tokens
+
+def _record_usage(usage):
+    """Adds a response's token usage to the current call's metrics."""
+    count("llmCalls")
+    if usage is not None:
+        count("promptTokens", getattr(usage, "prompt_tokens", 0) or 0)
+        count("completionTokens", getattr(usage, "completion_tokens", 0) or 0)
+
+def complete(messages, model=DEFAULT_MODEL, temperature=0.3, response_format=None):
+    """
+    Runs one chat completion and returns the message text (None if the
+    model returned no choices).
+
+    Responses are served from the shared LLM cache when the same model,
+    messages and temperature were seen before. `response_format` is passed
+    through to the API ({"type": "json_object"} for JSON mode).
+    """
+    return complete_with_source(messages, model, temperature, response_format)[0]
+
+def complete_with_source(messages, model=DEFAULT_MODEL, temperature=0.3, response_format=None, accept=None):
+    """
+    Like complete(), but returns (text, cached) so callers can tell cache
+    hits from model calls. If given, `accept(text)` decides whether a
+    response is good enough to cache; rejected responses are returned but
+    not stored, and a cached one it rejects is treated as a miss.
+    """
+    cache = get_cache()
+    key = cache_key(model, messages, temperature, response_format) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None and (accept is None or accept(cached)):
+            count("cacheHits")
+            return cached, True
+
+    request = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature
+    }
+    if response_format:
+        request["response_format"] = response_format
+    with timed("llm"):
+        # Creating the client (first call only) counts as waiting on the model
+        client = get_client()
+        if client is None:
+            raise RuntimeError("Missing GROQ_API key")
+        response, tokens = _create(client, request)
+    _record_usage(response.usage)
+    _settle_tokens(tokens, response.usage.total_tokens if response.usage else None)
+    if not response.choices:
+        return None, False
+
+    content = response.choices[0].message.content
+    if cache and content and (accept is None or accept(content)):
+        cache.set(key, content)
+    return content, False
+
+def stream_complete(messages, model=DEFAULT_MODEL, temperature=0.3, accept=None):
+    """
+    Like complete(), but yields the message text in chunks as the model
+    produces them (stream=True). A cached response is yielded in one chunk.
+    Only opening the stream is retried; a stream that fails midway raises.
+    `accept` works as in complete_with_source().
+    """
+    cache = get_cache()
+    key = cache_key(model, messages, temperature) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None and (accept is None or accept(cached)):
+            count("cacheHits")
+            yield cached
+            return
+
+    metrics = current()
+    started = time.perf_counter()
+    parts = []
+    usage = None
+    try:
+        client = get_client()
+        if client is None:
+            raise RuntimeError("Missing GROQ_API key")
+        stream, tokens = _create(client, {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True
+        })
+        for chunk in stream:
+            # Groq reports usage on the last chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts and metrics is not None:
+                    metrics.record_first_token(time.perf_counter() - started)
+                parts.append(delta)
+                yield delta
+    finally:
+        if metrics is not None:
+            metrics.add_interval("llm", started, time.perf_counter())
+
+    _record_usage(usage)
+    text = "".join(parts)
+    used = getattr(usage, "total_tokens", None)
+    if used is None:
+        # No usage reported: estimate the completion at ~4 characters per token
+        used = tokens - COMPLETION_TOKEN_ESTIMATE + len(text) // 4 + 1
+    _settle_tokens(tokens, used)
+    if cache and parts and (accept is None or accept(text)):
+        cache.set(key, text)
@@ -0,0 +1,282 @@
+"""
+Durable priority queue for AI jobs, shared by every worker process.
+
+Jobs are rows in AI_DATA_DIR/jobs.sqlite3. Each task belongs to a class
+with a priority, a concurrency limit and a deadline; the only class is
+
+    batch        reports, cross-form strategy and follow-up precomputation:
+                 claimed only while the class is under its concurrency
+                 limit, long deadline
+
+Interactive work (follow-ups, form generation) doesn't go through the
+queue: it runs on the persistent worker the Node server keeps for it (see
+utils/aiWorkerClient.js). The per-class limits are counted across all
+workers. A job still queued when its deadline passes is marked "expired"
+instead of run; a job whose worker died is re-queued once its lease runs
+out. Both happen in recover_jobs(), which the queue workers run on a timer.
+
+    python3 jobQueue.py enqueue generate_ai_report < payload.json
+    python3 jobQueue.py status JOB_ID
+    python3 jobQueue.py wait JOB_ID --timeout 30
+
+Jobs are consumed by `python3 aiWorker.py --queue`.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from aiSettings import data_path
+
+JOB_CLASSES = {
+    "batch": {
+        "priority": 0,
+        "concurrency": int(os.getenv("AI_QUEUE_BATCH_CONCURRENCY", 1)),
+        "deadline": int(os.getenv("AI_QUEUE_BATCH_DEADLINE", 15 * 60))
+    }
+}
+
+TASK_CLASSES = {
+    "analyze_feedback": "batch",
+    "analyze_cross_feedback": "batch",
+    "generate_ai_report": "batch",
+    "precompute_followups": "batch"
+}
+
+# How long a running job may go without its worker renewing the lease before
+# another worker may take it over (workers renew it every third of that),
+# and how many times a job is tried before it is failed
+LEASE_SECONDS = int(os.getenv("AI_QUEUE_LEASE", 15 * 60))
+MAX_ATTEMPTS = 2
+KEEP_FINISHED_SECONDS = 24 * 60 * 60
+
+FINISHED_STATUSES = ("done", "failed", "expired")
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("jobs.sqlite3"), timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, task TEXT NOT NULL, payload TEXT NOT NULL, "
+                "job_class TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+                "created_at REAL NOT NULL, deadline REAL NOT NULL, started_at REAL, "
+                "lease_until REAL, finished_at REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, priority, created_at)")
+            yield db
+    finally:
+        db.close()
+
+def job_class_for(task):
+    return TASK_CLASSES.get(task, "batch")
+
+def enqueue_job(task, payload, job_class=None, deadline_seconds=None, job_id=None):
+    """Queues a job and returns its id."""
+    job_class = job_class or job_class_for(task)
+    if job_class not in JOB_CLASSES:
+        raise ValueError(f"Unknown job class: {job_class}")
+    settings = JOB_CLASSES[job_class]
+    now = time.time()
+    job_id = job_id or uuid.uuid4().hex
+    with _connect() as db:
+        db.execute(
+            "INSERT INTO jobs (id, task, payload, job_class, priority, status, created_at, deadline) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, task, json.dumps(payload), job_class, settings["priority"], now,
+             now + (deadline_seconds or settings["deadline"]))
+        )
+    return job_id
+
+def recover_jobs():
+    """Expires overdue queued jobs and re-queues (or fails) jobs whose lease ran out."""
+    now = time.time()
+    with _connect() as db:
+        _recover(db, now)
+
+def _recover(db, now):
+    db.execute(
+        "UPDATE jobs SET status = 'expired', error = 'Deadline passed before the job started', finished_at = ? "
+        "WHERE status = 'queued' AND deadline < ?",
+        (now, now)
+    )
+    db.execute(
+        "UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished_at = ? "
+        "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+        (now, now, MAX_ATTEMPTS)
+    )
+    db.execute(
+        "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND lease_until < ?",
+        (now,)
+    )
+
+def claim_job(worker_id):
+    """
+    Takes the highest-priority queued job whose class is under its
+    concurrency limit and deadline and marks it running. Returns the job or
+    None.
+    """
+    now = time.time()
+    with _connect() as db:
+        # Idle workers poll; only take the write lock when there is work
+        if db.execute("SELECT 1 FROM jobs WHERE status = 'queued' AND deadline >= ? LIMIT 1", (now,)).fetchone() is None:
+            return None
+        # Take the write lock up front so two workers can't claim the same slot
+        db.execute("BEGIN IMMEDIATE")
+        running = dict(db.execute(
+            "SELECT job_class, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY job_class"
+        ).fetchall())
+        open_classes = [
+            name for name, settings in JOB_CLASSES.items()
+            if running.get(name, 0) < settings["concurrency"]
+        ]
+        if not open_classes:
+            return None
+
+        row = db.execute(
+            "SELECT id, task, payload, job_class, deadline FROM jobs "
+            f"WHERE status = 'queued' AND deadline >= ? AND job_class IN ({', '.join('?' * len(open_classes))}) "
+            "ORDER BY priority, created_at LIMIT 1",
+            (now, *open_classes)
+        ).fetchone()
+        if row is None:
+            return None
+
+        db.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, lease_until = ?, "
+            "attempts = attempts + 1 WHERE id = ?",
+            (worker_id, now, now + LEASE_SECONDS, row[0])
+        )
+    return {"id": row[0], "task": row[1], "payload": json.loads(row[2]), "jobClass": row[3], "deadline": row[4]}
+
+def renew_lease(job_id, worker_id):
+    """Extends a running job's lease; False if the job is no longer this worker's."""
+    with _connect() as db:
+        return db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND worker = ?",
+            (time.time() + LEASE_SECONDS, job_id, worker_id)
+        ).rowcount > 0
+
+def finish_job(job_id, result=None, error=None):
+    """
+    Records a job's result (status "done") or error (status "failed").
+    Task functions report most failures as an {"error": ...} result, so
+    such a result fails the job too (and is kept alongside the error).
+    """
+    if error is None and isinstance(result, dict) and "error" in result:
+        error = str(result["error"])
+    with _connect() as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE id = ? AND status = 'running'",
+            ("failed" if error else "done", None if result is None else json.dumps(result), error, time.time(), job_id)
+        )
+
+def get_job(job_id):
+    """
+    Returns a job's status for polling: status, timings, its place in line
+    while queued, and the result or error once finished. None if unknown.
+    """
+    with _connect() as db:
+        row = db.execute(
+            "SELECT id, task, job_class, priority, status, result, error, created_at, started_at, "
+            "finished_at, deadline FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "jobId": row[0],
+            "task": row[1],
+            "jobClass": row[2],
+            "status": row[4],
+            "createdAt": row[7],
+            "startedAt": row[8],
+            "finishedAt": row[9],
+            "deadline": row[10]
+        }
+        if row[4] == "queued":
+            job["queuePosition"] = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority < ? OR (priority = ? AND created_at < ?))",
+                (row[3], row[3], row[7])
+            ).fetchone()[0]
+    if row[5] is not None:
+        job["result"] = json.loads(row[5])
+    if row[6] is not None:
+        job["error"] = row[6]
+    return job
+
+def wait_for_job(job_id, timeout=None, poll_seconds=0.2):
+    """Polls until the job finishes (or `timeout` passes) and returns its status."""
+    started = time.monotonic()
+    while True:
+        job = get_job(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return job
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return job
+        time.sleep(poll_seconds)
+
+def purge_finished(older_than=KEEP_FINISHED_SECONDS):
+    """Deletes finished jobs older than `older_than` seconds; returns how many."""
+    with _connect() as db:
+        return db.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND finished_at < ?",
+            (*FINISHED_STATUSES, time.time() - older_than)
+        ).rowcount
+
+def queue_stats():
+    """Job counts by class and status."""
+    with _connect() as db:
+        rows = db.execute("SELECT job_class, status, COUNT(*) FROM jobs GROUP BY job_class, status").fetchall()
+    stats = {name: {} for name in JOB_CLASSES}
+    for job_class, status, count in rows:
+        stats.setdefault(job_class, {})[status] = count
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formora AI job queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue a job; prints its id")
+    enqueue.add_argument("task")
+    enqueue.add_argument("payload", nargs="?", help="JSON payload (default: read from stdin)")
+    enqueue.add_argument("--class", dest="job_class", choices=list(JOB_CLASSES))
+    enqueue.add_argument("--deadline", type=int, help="Seconds the job may wait in the queue")
+
+    status = commands.add_parser("status", help="Print a job's status")
+    status.add_argument("job_id")
+
+    wait = commands.add_parser("wait", help="Wait for a job to finish and print its status")
+    wait.add_argument("job_id")
+    wait.add_argument("--timeout", type=float)
+
+    commands.add_parser("stats", help="Print job counts by class and status")
+    commands.add_parser("purge", help="Delete finished jobs older than a day")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "enqueue":
+            payload = json.loads(args.payload if args.payload is not None else sys.stdin.read())
+            job_id = enqueue_job(args.task, payload, job_class=args.job_class, deadline_seconds=args.deadline)
+            output = {"jobId": job_id, "status": "queued", "jobClass": args.job_class or job_class_for(args.task)}
+        elif args.command in ("status", "wait"):
+            job = get_job(args.job_id) if args.command == "status" else wait_for_job(args.job_id, args.timeout)
+            output = job if job is not None else {"error": "Job not found"}
+        elif args.command == "stats":
+            output = queue_stats()
+        else:
+            output = {"purged": purge_finished()}
+        print(json.dumps(output))
+
+    except json.JSONDecodeError as e:
+        print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}))
+    except Exception as e:
+        print(json.dumps({"error": f"Error: {str(e)}"}))
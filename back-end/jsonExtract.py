@@ -0,0 +1,67 @@
+import re
+import json
+from aiMetrics import timed
+
+_decoder = json.JSONDecoder()
+
+# Where a JSON value can start, and the tokens the bracket scanner has to
+# look at: whole string literals (so brackets inside them are skipped at
+# regex speed), brackets, and a lone quote that starts an unterminated string
+_VALUE_START = re.compile(r"[{\[]")
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]|"', re.DOTALL)
+
+def extract_json(text):
+    """
+    Returns the first valid top-level JSON object or array in a model
+    response, or None if there is none.
+
+    Prose, ```json fences and other text around the JSON are skipped as
+    part of the scan, so no separate cleanup passes are needed. Each
+    candidate is decoded in place with JSONDecoder.raw_decode; when one
+    isn't valid JSON, a balanced-bracket scan (aware of strings and escapes)
+    finds where it ends and the search resumes after it, so well-formed and
+    malformed responses both take a single pass over the text. A truncated
+    response returns None rather than one of its nested fragments.
+    """
+    if not text:
+        return None
+    with timed("extract"):
+        return _scan(text)
+
+def _scan(text):
+    position = 0
+    while True:
+        match = _VALUE_START.search(text, position)
+        if match is None:
+            return None
+        start = match.start()
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            return value
+        except json.JSONDecodeError as error:
+            if _is_truncated(text, error):
+                return None
+        position = _balanced_end(text, start)
+        if position is None:
+            # Unclosed (e.g. a truncated response): anything after it is
+            # nested inside it, not a top-level value
+            return None
+
+def _is_truncated(text, error):
+    """True when decoding ran off the end of the text rather than hitting bad JSON."""
+    return error.pos >= len(text.rstrip()) or error.msg.startswith("Unterminated string")
+
+def _balanced_end(text, start):
+    """Index just past the bracket that closes the one at `start`, or None."""
+    depth = 0
+    for match in _TOKEN.finditer(text, start):
+        token = match.group()
+        if token in "{[":
+            depth += 1
+        elif token in "}]":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+        elif token == '"':
+            return None
+    return None
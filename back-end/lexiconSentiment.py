@@ -0,0 +1,168 @@
+"""
+Local lexicon-based sentiment for free-text answers.
+
+Every answer is scored in bulk without a model call: words are looked up in
+a product-review lexicon (valence -3..+3), flipped when a negator ("not",
+"never", "don't", ...) appears shortly before them in the same clause,
+scaled by intensifiers ("very", "a bit") and emphasized after "but". "too"
+turns an otherwise neutral word negative ("too small"). The summed valence
+is squashed to a compound score in [-1, 1]:
+
+    score_texts(["Great product!", "not comfortable", "a bit too tight"])
+    -> array([ 0.62, -0.36, -0.26])
+
+Tokenization is per answer, but negation windows, modifiers and the
+per-answer sums are computed with NumPy over all answers at once.
+
+The labels drive the exact sentiment counts in reports and feedback
+analysis. With PROMPT_SENTIMENT_LABELS=1 they are also shown to the model,
+as "[positive]" / "[negative]" after each answer in the prompt.
+"""
+import os
+import re
+import numpy as np
+
+LEXICON = {
+    # Positive
+    "good": 1.9, "great": 3.1, "excellent": 3.2, "amazing": 2.8, "awesome": 3.1, "love": 3.2,
+    "loved": 2.9, "loves": 2.7, "like": 1.5, "liked": 1.8, "nice": 1.8, "perfect": 2.7,
+    "perfectly": 2.5, "best": 3.2, "better": 1.9, "comfortable": 2.0, "comfy": 2.0, "happy": 2.7,
+    "satisfied": 1.8, "recommend": 1.5, "recommended": 1.5, "fantastic": 2.6, "wonderful": 2.7,
+    "beautiful": 2.9, "cool": 1.3, "fast": 1.2, "quick": 1.2, "easy": 1.9, "helpful": 1.9,
+    "friendly": 2.2, "worth": 1.5, "durable": 1.8, "sturdy": 1.6, "reliable": 1.8, "stylish": 1.8,
+    "cute": 2.0, "soft": 1.0, "fine": 0.8, "ok": 0.9, "okay": 0.9, "decent": 1.2, "solid": 1.2,
+    "impressed": 2.2, "impressive": 2.3, "smooth": 1.4, "glad": 2.0, "pleased": 1.9, "enjoy": 2.2,
+    "enjoyed": 2.3, "superb": 3.1, "outstanding": 3.0, "brilliant": 2.8, "affordable": 1.5,
+    "bargain": 1.5, "exceeded": 1.8, "fresh": 1.3, "clean": 1.7, "works": 1.0, "worked": 1.0,
+    "lightweight": 1.2, "fun": 2.3, "thanks": 1.9, "thank": 1.5, "favorite": 2.4, "satisfying": 2.0,
+    "convenient": 1.7, "elegant": 2.1, "gorgeous": 2.9, "incredible": 2.7, "quality": 0.5,
+    "yes": 1.2, "likely": 1.0,
+    # Negative
+    "bad": -2.5, "terrible": -2.9, "awful": -3.0, "horrible": -3.0, "poor": -2.1, "poorly": -2.0,
+    "worst": -3.1, "worse": -2.1, "hate": -2.7, "hated": -2.9, "disappointed": -2.2,
+    "disappointing": -2.2, "disappointment": -2.3, "broken": -2.0, "broke": -1.8, "damaged": -2.1,
+    "defective": -2.3, "uncomfortable": -2.0, "expensive": -1.0, "overpriced": -2.0, "pricey": -1.0,
+    "cheap": -0.5, "cheaply": -1.4, "slow": -1.4, "late": -1.2, "delayed": -1.4, "useless": -2.5,
+    "waste": -2.2, "flimsy": -1.9, "fake": -2.0, "wrong": -1.9, "problem": -1.7, "problems": -1.7,
+    "issue": -1.2, "issues": -1.2, "fail": -2.2, "failed": -2.2, "fails": -2.1, "refund": -1.2,
+    "returned": -1.0, "annoying": -2.0, "angry": -2.3, "unhappy": -2.4, "dissatisfied": -2.0,
+    "rude": -2.3, "dirty": -1.9, "smells": -1.0, "ugly": -2.3, "tight": -0.7, "loose": -0.7,
+    "hurt": -2.0, "hurts": -2.0, "painful": -2.3, "pain": -1.8, "scratched": -1.5, "ripped": -1.8,
+    "torn": -1.7, "leak": -1.6, "leaks": -1.6, "missing": -1.5, "lost": -1.3, "confusing": -1.6,
+    "difficult": -1.5, "complicated": -1.4, "mediocre": -1.5, "meh": -1.0, "boring": -1.8,
+    "junk": -2.4, "garbage": -2.7, "scam": -2.9, "avoid": -1.8, "regret": -2.0, "unreliable": -2.0,
+    "fragile": -1.2, "faded": -1.3, "shrunk": -1.6, "lacking": -1.5, "lacks": -1.4, "unusable": -2.5,
+    "unlikely": -1.5,
+}
+
+NEGATORS = {
+    "not", "no", "never", "none", "nothing", "neither", "nor", "without", "hardly", "barely",
+    "cannot", "cant", "dont", "didnt", "doesnt", "isnt", "wasnt", "wont", "wouldnt", "shouldnt",
+    "arent", "werent", "havent", "hasnt", "couldnt", "aint",
+}
+
+MODIFIERS = {
+    "very": 1.5, "really": 1.4, "extremely": 1.8, "super": 1.5, "so": 1.3, "quite": 1.2,
+    "incredibly": 1.8, "absolutely": 1.6, "highly": 1.5, "totally": 1.4, "truly": 1.4, "definitely": 1.5,
+    "slightly": 0.5, "somewhat": 0.6, "bit": 0.6, "little": 0.7, "kinda": 0.6, "fairly": 0.8,
+}
+
+# Scale for a negated word (negation rarely fully inverts: "not bad" is mildly positive)
+NEGATION_SCALE = -0.74
+NEGATION_WINDOW = 3
+BUT_SCALE = 1.5
+TOO_VALENCE = -1.0
+TOO_SCALE = 1.5
+# Compound score at which an answer counts as positive/negative; matches a
+# graded answer of 3.5/2.5 on the 1-5 scale once mapped to polarity
+POLARITY_THRESHOLD = 0.25
+
+PROMPT_LABELS = os.getenv("PROMPT_SENTIMENT_LABELS", "0") == "1"
+PROMPT_LABELS_NOTE = (
+    "(Answers tagged [positive] or [negative] were labelled by a sentiment lexicon; "
+    "untagged answers are neutral. Treat the tags as hints, not ground truth.)\n"
+)
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|[.!?;]")
+_BOUNDARIES = {".", "!", "?", ";", "but"}
+
+def _tokenize(text):
+    return [token.replace("'", "") for token in _TOKEN.findall(str(text).lower())]
+
+def negators(text):
+    """The negator tokens in `text`, sorted ("I don't not like it" -> ("dont", "not"))."""
+    return tuple(sorted(token for token in _tokenize(text) if token in NEGATORS))
+
+def score_texts(texts):
+    """Compound sentiment in [-1, 1] for each text, as a NumPy array."""
+    texts = list(texts)
+    if not texts:
+        return np.zeros(0)
+
+    # Map tokens to ids so each distinct word is looked up once
+    ids = {}
+    token_ids = []
+    lengths = np.zeros(len(texts), dtype=np.int64)
+    for index, text in enumerate(texts):
+        tokens = _tokenize(text)
+        lengths[index] = len(tokens)
+        token_ids.extend(ids.setdefault(token, len(ids)) for token in tokens)
+    if not token_ids:
+        return np.zeros(len(texts))
+
+    vocabulary = list(ids)
+    inverse = np.array(token_ids, dtype=np.int64)
+    valence = np.array([LEXICON.get(word, 0.0) for word in vocabulary])[inverse]
+    is_negator = np.array([word in NEGATORS for word in vocabulary])[inverse]
+    is_boundary = np.array([word in _BOUNDARIES for word in vocabulary])[inverse]
+    is_but = np.array([word == "but" for word in vocabulary])[inverse]
+    is_too = np.array([word == "too" for word in vocabulary])[inverse]
+    modifier = np.array([MODIFIERS.get(word, 1.0) for word in vocabulary])[inverse]
+
+    position = np.arange(len(token_ids))
+    owner = np.repeat(np.arange(len(texts)), lengths)
+    start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    def last_before(mask):
+        # Position of the latest marked token at or before each position (-1 if none)
+        return np.maximum.accumulate(np.where(mask, position, -1))
+
+    last_negator = last_before(is_negator)
+    last_boundary = last_before(is_boundary)
+    last_but = last_before(is_but)
+
+    negated = (
+        (last_negator >= start)
+        & (last_negator > last_boundary)
+        & (position - last_negator <= NEGATION_WINDOW)
+    )
+    previous = np.concatenate(([False], is_too[:-1])) & (position > start)
+    # "too small" is a complaint; "too tight" is a stronger one
+    valence = np.where(previous & (valence == 0) & ~is_boundary & ~is_negator, TOO_VALENCE, valence)
+    valence = np.where(previous & (valence < 0), valence * TOO_SCALE, valence)
+
+    previous_modifier = np.concatenate(([1.0], modifier[:-1]))
+    previous_modifier = np.where(position > start, previous_modifier, 1.0)
+    weights = previous_modifier * np.where(negated, NEGATION_SCALE, 1.0) * np.where(last_but >= start, BUT_SCALE, 1.0)
+
+    sums = np.bincount(owner, weights=valence * weights, minlength=len(texts))
+    return sums / np.sqrt(sums * sums + 15)
+
+def label_scores(scores):
+    """Maps compound (or polarity) scores to "positive" / "negative" / "neutral"."""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.where(
+        scores >= POLARITY_THRESHOLD, "positive",
+        np.where(scores <= -POLARITY_THRESHOLD, "negative", "neutral")
+    )
+
+def label_texts(texts):
+    return label_scores(score_texts(texts)).tolist()
+
+def count_labels(labels):
+    labels = np.asarray(labels)
+    return {key: int((labels == key).sum()) for key in ("positive", "negative", "neutral")}
+
+def with_label(text, label):
+    """Appends a " [label]" tag for prompts; neutral answers stay untagged."""
+    return text if label == "neutral" else f"{text} [{label}]"
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from aiSettings import data_path
+
+CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL", 24 * 60 * 60))
+CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+MEMORY_CACHE_ENTRIES = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", 256))
+
+def cache_key(model, messages, temperature, response_format=None):
+    """Content address of one chat completion request."""
+    request = {"model": model, "messages": messages, "temperature": temperature}
+    if response_format:
+        # Only when set, so keys of plain requests stay the same
+        request["response_format"] = response_format
+    payload = json.dumps(
+        request,
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    Two-level cache of LLM responses: an in-process LRU in front of a SQLite
+    file shared by every script and worker process.
+
+    Entries expire after `ttl` seconds; once the file holds more than
+    `max_bytes` of responses, the least recently used entries are evicted.
+    Hit/miss counters are kept per process and persisted in the database.
+    """
+
+    def __init__(self, path=None, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES,
+                 memory_entries=MEMORY_CACHE_ENTRIES):
+        self.path = path or data_path("llm_cache.sqlite3")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memoryHits": 0, "diskHits": 0, "misses": 0, "evictions": 0}
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, name, db=None):
+        with self._lock:
+            self.counters[name] += 1
+        if db is not None:
+            db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                (name,)
+            )
+
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["memoryHits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("misses", db)
+                return None
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count("diskHits", db)
+
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        self._remember(key, value, now)
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict(db, now)
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we're back under the limit
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            with self._lock:
+                self._memory.pop(key, None)
+            self._count("evictions", db)
+            total -= size
+
+    def stats(self):
+        """Counters for this process plus the totals persisted across processes."""
+        with self._connect() as db:
+            persisted = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            process = dict(self.counters)
+        return {"process": process, "total": persisted, "entries": entries, "bytes": size}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the process-wide cache, or None if caching is disabled (AI_CACHE=0)."""
+    global _cache
+    if os.getenv("AI_CACHE", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -0,0 +1,198 @@
+"""
+Per-task model routing for the JSON-producing AI calls.
+
+Every task has a cascade of models, smallest first. A call goes to the
+first model in JSON mode (response_format json_object, so the model can
+only emit a JSON object) and moves on to the next model only when the
+response can't be used: Groq rejected the generation as invalid JSON
+(400 json_validate_failed), no JSON could be extracted, or a required key
+is missing. Rate limits, timeouts and other API errors are not model
+failures and are raised as before (groqClient already retries them).
+
+    json_data, raw = complete_json("form", messages, temperature=0.3, required=("questions",))
+
+Each attempt is counted per task and model in the shared counters
+(aiCounters), so the routes can be tuned from real traffic:
+
+    python modelRouter.py stats
+    {"routes": {...}, "jsonMode": true, "tasks": {"form": {"escalations": 3,
+     "models": {"llama-3.1-8b-instant": {"calls": 120, "successes": 117,
+                "successRate": 0.975, "avgLatencyMs": 640.2, ...}, ...}}}}
+
+AI_MODEL_ROUTES overrides the cascades as JSON, per task or for all tasks
+under "default":
+
+    AI_MODEL_ROUTES='{"default": ["llama-3.1-8b-instant"], "report": ["llama-3.3-70b-versatile"]}'
+
+AI_JSON_MODE=0 turns JSON mode off (for models or proxies that reject it).
+"""
+import os
+import sys
+import json
+import time
+from groq import APIStatusError
+from groqClient import complete_with_source, stream_complete
+from streamJson import collect_stream
+from jsonExtract import extract_json
+from aiCounters import add, increment, read_counters
+
+DEFAULT_ROUTE = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"]
+JSON_MODE = os.getenv("AI_JSON_MODE", "1") != "0"
+JSON_FORMAT = {"type": "json_object"}
+
+COUNTER_PREFIX = "model_router."
+
+def _load_routes():
+    routes = {"default": DEFAULT_ROUTE}
+    try:
+        configured = json.loads(os.getenv("AI_MODEL_ROUTES") or "{}")
+    except json.JSONDecodeError:
+        # A broken override must not take every AI feature down with it
+        configured = {}
+    if isinstance(configured, dict):
+        for task, models in configured.items():
+            if isinstance(models, str):
+                models = [models]
+            if isinstance(models, list) and models:
+                routes[task] = [str(model) for model in models]
+    return routes
+
+ROUTES = _load_routes()
+
+def route(task):
+    """The models tried for `task`, in order."""
+    return ROUTES.get(task) or ROUTES["default"]
+
+def record(task, model, outcome, seconds=None):
+    """Counts one attempt of `task` on `model`; `seconds` is left out for cache hits."""
+    prefix = f"{COUNTER_PREFIX}{task}.{model}."
+    if seconds is None:
+        increment(prefix + "calls", prefix + outcome, prefix + "cacheHits")
+        return
+    increment(prefix + "calls", prefix + outcome)
+    add(prefix + "latencyMs", seconds * 1000)
+
+def usable_json(json_data, required=()):
+    """True for a non-empty JSON object that has every required key set."""
+    return isinstance(json_data, dict) and bool(json_data) and all(json_data.get(key) for key in required)
+
+def _usable_text(required):
+    """Cache filter for the completions: only texts with usable JSON are stored."""
+    return lambda text: usable_json(extract_json(text), required)
+
+def _json_rejected(error):
+    """True when Groq refused a JSON-mode generation because it wasn't valid JSON."""
+    if not isinstance(error, APIStatusError) or error.status_code != 400:
+        return False
+    body = error.body if isinstance(error.body, dict) else {}
+    details = body.get("error", body) if isinstance(body.get("error", body), dict) else {}
+    return details.get("code") == "json_validate_failed" or "json_validate_failed" in str(error)
+
+def complete_json(task, messages, temperature=0.3, required=(), models=None):
+    """
+    Runs `messages` through the task's cascade until a model returns usable
+    JSON. Returns (json_data, raw_text); json_data is None when every model
+    failed, with the last model's text (or None) as raw_text.
+    """
+    models = route(task) if models is None else models
+    raw_text = None
+    for position, model in enumerate(models):
+        if position:
+            increment(f"{COUNTER_PREFIX}{task}.escalations")
+        started = time.perf_counter()
+        try:
+            raw_text, cached = complete_with_source(
+                messages,
+                model=model,
+                temperature=temperature,
+                response_format=JSON_FORMAT if JSON_MODE else None,
+                accept=_usable_text(required)
+            )
+        except Exception as error:
+            if not _json_rejected(error):
+                record(task, model, "errors", time.perf_counter() - started)
+                raise
+            record(task, model, "parseFailures", time.perf_counter() - started)
+            raw_text = None
+            continue
+
+        json_data = extract_json(raw_text) if raw_text else None
+        ok = usable_json(json_data, required)
+        record(task, model, "successes" if ok else "parseFailures", None if cached else time.perf_counter() - started)
+        if ok:
+            return json_data, raw_text
+    return None, raw_text
+
+def stream_json(task, messages, temperature, keys, on_item, required=(), on_reset=None):
+    """
+    Streaming variant: streams from the first model, feeding array items to
+    `on_item` as they complete, and falls back to complete_json() on the
+    rest of the cascade if the streamed text isn't usable. JSON mode can't
+    be combined with streaming, so the streamed attempt relies on the prompt.
+
+    When the cascade escalates after items were streamed, `on_reset()` is
+    called so consumers drop them, and the escalated model's items are then
+    passed to `on_item` like a stream would.
+    """
+    models = route(task)
+    started = time.perf_counter()
+    streamed = []
+
+    def on_streamed(key, index, item):
+        streamed.append(key)
+        on_item(key, index, item)
+
+    try:
+        raw_text = collect_stream(
+            stream_complete(messages, model=models[0], temperature=temperature, accept=_usable_text(required)),
+            keys,
+            on_streamed
+        ) or None
+    except Exception:
+        record(task, models[0], "errors", time.perf_counter() - started)
+        raise
+    json_data = extract_json(raw_text) if raw_text else None
+    ok = usable_json(json_data, required)
+    record(task, models[0], "successes" if ok else "parseFailures", time.perf_counter() - started)
+    if ok or len(models) == 1:
+        return (json_data if ok else None), raw_text
+    increment(f"{COUNTER_PREFIX}{task}.escalations")
+    json_data, escalated_text = complete_json(task, messages, temperature, required, models=models[1:])
+    if json_data is not None:
+        if streamed and on_reset:
+            on_reset()
+        for key in keys:
+            items = json_data.get(key)
+            for index, item in enumerate(items if isinstance(items, list) else []):
+                on_item(key, index, item)
+    return json_data, escalated_text if escalated_text is not None else raw_text
+
+def model_stats():
+    """Attempts, outcomes, success rate and mean uncached latency per task and model."""
+    stats = {}
+    for name, value in read_counters(COUNTER_PREFIX).items():
+        task, rest = name[len(COUNTER_PREFIX):].split(".", 1)
+        if rest == "escalations":
+            stats.setdefault(task, {})["escalations"] = value
+            continue
+        model, field = rest.rsplit(".", 1)
+        entry = stats.setdefault(task, {}).setdefault("models", {}).setdefault(model, {
+            "calls": 0, "successes": 0, "parseFailures": 0, "errors": 0, "cacheHits": 0, "latencyMs": 0
+        })
+        entry[field] = value
+
+    for task_stats in stats.values():
+        task_stats.setdefault("escalations", 0)
+        for entry in task_stats.get("models", {}).values():
+            timed_calls = entry["calls"] - entry["cacheHits"]
+            latency = entry.pop("latencyMs")
+            entry["successRate"] = round(entry["successes"] / entry["calls"], 4) if entry["calls"] else 0
+            entry["avgLatencyMs"] = round(latency / timed_calls, 1) if timed_calls else None
+    return {"routes": ROUTES, "jsonMode": JSON_MODE, "tasks": stats}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        print(json.dumps(model_stats(), indent=2))
+    else:
+        print(json.dumps({"error": "Usage: modelRouter.py stats"}))
+        sys.exit(1)
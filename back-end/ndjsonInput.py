@@ -0,0 +1,42 @@
+import sys
+import json
+from itertools import chain
+from aiMetrics import timed
+
+def iter_ndjson(source="-"):
+    """
+    Lazily yields one parsed JSON value per non-empty line.
+
+    `source` is "-" for stdin or a file path. Only one line is held in
+    memory at a time, so large submission sets never have to fit in argv.
+    """
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                with timed("parse"):
+                    record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid NDJSON on line {line_number}: {e.msg}")
+            yield record
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def split_header(records, key):
+    """
+    Splits an optional header record off the front of an NDJSON stream.
+
+    If the first record is an object of the form {key: value}, returns
+    (value, remaining records). Otherwise returns (None, all records).
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return None, iter(())
+    if isinstance(first, dict) and list(first.keys()) == [key]:
+        return first[key], records
+    return None, chain([first], records)
@@ -0,0 +1,103 @@
+"""
+Speculative follow-up generation for a newly created AI form.
+
+Choice questions (radio/select/rating) have a small, fixed set of options,
+so their follow-ups can be generated before anyone answers: right after a
+form is saved, every (question, option) pair that the rule table doesn't
+already cover gets its follow-ups from the model, PRECOMPUTE_CONCURRENCY
+pairs at a time, and they are stored in the follow-up cache. Answering a
+choice question then becomes a cache lookup; free-text questions keep the
+live path.
+
+Precomputed entries are stored without respondent context, so they are
+served under the "choice" and "always" cache policies (see followUpCache).
+
+    echo '{"formId": "ai_...", "questions": [...]}' | python3 precomputeFollowUps.py
+"""
+import sys
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from followUpRules import match_followup_rules
+from followUpCache import CACHE_POLICY, CHOICE_INPUTS, get_cached_followups
+from generateFollowUp import generate_followup_questions
+from aiMetrics import finish_call, propagate, start_call, timed
+
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", 4))
+
+def choice_pairs(questions):
+    """(question, option) for every option of every choice question."""
+    pairs = []
+    for question in questions or []:
+        if not isinstance(question, dict) or question.get("inputType") not in CHOICE_INPUTS:
+            continue
+        if question.get("isFollowUp"):
+            continue
+        for option in question.get("options") or []:
+            if isinstance(option, str) and option.strip():
+                pairs.append((question, option))
+    return pairs
+
+def precompute_followups(form_id, questions, template=None):
+    """
+    Generates and caches the follow-ups for every option of the form's
+    choice questions.
+
+    Returns counts of the pairs considered: answered by a rule, already
+    cached, generated, and failed.
+    """
+    summary = {"formId": form_id, "pairs": 0, "ruleHits": 0, "cached": 0, "generated": 0, "failed": 0}
+    if not form_id:
+        return {"error": "Missing formId"}
+    if CACHE_POLICY == "off":
+        return summary
+
+    pending = []
+    for question, option in choice_pairs(questions):
+        summary["pairs"] += 1
+        # Pairs the live path answers without the model don't need precomputing;
+        # these lookups aren't respondent traffic, so they stay out of the hit rates
+        if match_followup_rules(question, option, form_id=form_id, template=template, record_metrics=False):
+            summary["ruleHits"] += 1
+        elif get_cached_followups(form_id, question, option, policy="choice", record_metrics=False):
+            summary["cached"] += 1
+        else:
+            pending.append((question, option))
+    if not pending:
+        return summary
+
+    if not os.getenv("GROQ_API"):
+        return {"error": "Missing GROQ_API key"}
+
+    generate = propagate(lambda question, option: generate_followup_questions(
+        question, option, [], form_id=form_id, template=template, cache_policy="choice", record_metrics=False
+    ))
+    with ThreadPoolExecutor(max_workers=max(1, min(PRECOMPUTE_CONCURRENCY, len(pending)))) as executor:
+        futures = [executor.submit(generate, question, option) for question, option in pending]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            if isinstance(result, dict) and result.get("followUpQuestions"):
+                summary["generated"] += 1
+            else:
+                summary["failed"] += 1
+    return summary
+
+if __name__ == "__main__":
+    metrics = start_call("precompute_followups")
+    try:
+        with timed("parse"):
+            input_data = json.loads(sys.argv[1] if len(sys.argv) > 1 else sys.stdin.read())
+        result = precompute_followups(
+            input_data.get("formId"),
+            input_data.get("questions", []),
+            template=input_data.get("template")
+        )
+        print(json.dumps(finish_call(metrics, result)))
+
+    except json.JSONDecodeError:
+        print(json.dumps({"error": "Invalid JSON input"}))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
@@ -0,0 +1,78 @@
+"""
+Token-bounded batching for map-reduce prompts.
+
+Large reports (generateReport) and hierarchical strategies (strategy) are
+built the same way: submissions are cut into batches that each fit in one
+prompt, every batch is summarized on its own, and the partial results are
+merged in groups small enough for one merge prompt. The batching is shared
+here; what goes into each prompt stays with the script.
+
+    for batch_text, count in batch_submissions(chunks, 6000, packer): ...
+    for group in group_partials(partials, 6000): ...
+"""
+import json
+from promptBudget import count_tokens
+from answerDedup import AnswerGroups
+from lexiconSentiment import PROMPT_LABELS
+
+def batch_submissions(chunks, max_tokens, packer=None):
+    """
+    Groups formatted submission chunks into token-bounded batches.
+
+    Yields (batch_text, submission_count). A single submission larger than
+    the budget still gets a batch of its own. Every chunk is recorded on
+    `packer`, since batching never drops submissions.
+    """
+    lines = []
+    tokens = 0
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk)
+        if packer:
+            packer.record(chunk_tokens)
+        if lines and tokens + chunk_tokens > max_tokens:
+            yield "".join(lines), len(lines)
+            lines = []
+            tokens = 0
+        lines.append(chunk)
+        tokens += chunk_tokens
+    if lines:
+        yield "".join(lines), len(lines)
+
+def batch_collapsed_submissions(submissions_data, max_tokens, packer):
+    """
+    Like batch_submissions, but each batch lists every question's answers
+    once per group of near-duplicates, with a count (answerDedup). A batch
+    closes once its collapsed text reaches `max_tokens`, so repetitive
+    forms fit many more submissions per prompt.
+    """
+    groups = AnswerGroups(packer.truncate_answer, labels=PROMPT_LABELS)
+    for submission in submissions_data:
+        groups.add_submission(submission.get('responses', []))
+        if groups.tokens >= max_tokens:
+            yield _collapsed_batch(groups, packer)
+            groups = AnswerGroups(packer.truncate_answer, labels=PROMPT_LABELS)
+    if groups.submissions:
+        yield _collapsed_batch(groups, packer)
+
+def _collapsed_batch(groups, packer):
+    text = groups.text()
+    packer.record(count_tokens(text), groups.submissions)
+    packer.collapsed_answers += groups.collapsed_answers()
+    return text, groups.submissions
+
+def group_partials(partials, max_tokens):
+    """Packs partial results into groups that each fit in one merge prompt."""
+    groups = []
+    group = []
+    tokens = 0
+    for partial in partials:
+        size = count_tokens(json.dumps(partial))
+        if group and tokens + size > max_tokens:
+            groups.append(group)
+            group = []
+            tokens = 0
+        group.append(partial)
+        tokens += size
+    if group:
+        groups.append(group)
+    return groups
@@ -0,0 +1,108 @@
+"""
+Token estimates and budget-aware packing for prompts.
+
+Prompts are built from user-supplied answers of any length, so every script
+packs them against a token budget instead of pasting everything in: long
+answers are cut down with a visible marker, and whole submissions that no
+longer fit are dropped and counted. The counts come back as a "promptUsage"
+summary so callers can see what the model actually saw.
+
+Token counts are estimated locally with a regex pre-tokenizer shaped like
+the Llama 3 one (words, numbers in groups of up to three digits,
+punctuation runs, whitespace), which stays within roughly 10% of the real
+tokenizer on English feedback text without loading a vocabulary.
+"""
+import os
+import re
+
+MAX_ANSWER_TOKENS = int(os.getenv("PROMPT_MAX_ANSWER_TOKENS", 250))
+
+_PIECE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+|_+")
+_LONG_WORD = re.compile(r"[^\W\d_]{7,}")
+
+def count_tokens(text):
+    """Estimated number of model tokens in `text`."""
+    if not text:
+        return 0
+    # One token per piece; long words split roughly every 5 characters
+    return len(_PIECE.findall(text)) + sum((len(word) - 1) // 5 for word in _LONG_WORD.findall(text))
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Shortens `text` to about `max_tokens`, keeping the beginning and the end
+    (where answers usually state their point) around a marker saying how much
+    was cut. Returns (text, truncated).
+    """
+    text = str(text)
+    # Every token covers at least one character
+    if len(text) <= max_tokens:
+        return text, False
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text, False
+
+    keep = int(len(text) * max_tokens / tokens)
+    head = text[:keep * 2 // 3].rstrip()
+    tail = text[len(text) - keep // 3:].lstrip() if keep // 3 else ""
+    cut = len(text) - len(head) - len(tail)
+    return f"{head} [...{cut} characters truncated...] {tail}".rstrip(), True
+
+class PromptPacker:
+    """
+    Accumulates prompt sections (one per submission or form) until a token
+    budget is full, and keeps count of what was included and dropped.
+    """
+
+    def __init__(self, budget_tokens):
+        self.budget = budget_tokens
+        self.parts = []
+        self.used = 0
+        self.included = 0
+        self.dropped = 0
+        self.dropped_tokens = 0
+        self.truncated_answers = 0
+        self.collapsed_answers = 0
+
+    def truncate_answer(self, answer, max_tokens=None):
+        """Cuts one answer down to `max_tokens` (default PROMPT_MAX_ANSWER_TOKENS)."""
+        answer, truncated = truncate_to_tokens(answer, max_tokens or MAX_ANSWER_TOKENS)
+        if truncated:
+            self.truncated_answers += 1
+        return answer
+
+    def add(self, text):
+        """Adds a section if it fits in the remaining budget; returns whether it did."""
+        tokens = count_tokens(text)
+        # The first section is always kept so a prompt is never empty
+        if self.parts and self.used + tokens > self.budget:
+            self.dropped += 1
+            self.dropped_tokens += tokens
+            return False
+        self.parts.append(text)
+        self.used += tokens
+        self.included += 1
+        return True
+
+    def record(self, tokens, items=1):
+        """Counts sections that were included elsewhere (e.g. in another batch)."""
+        self.used += tokens
+        self.included += items
+
+    def skip(self, tokens, items=1):
+        """Counts sections that were left out without being offered to add()."""
+        self.dropped += items
+        self.dropped_tokens += tokens
+
+    def text(self):
+        return "".join(self.parts)
+
+    def usage(self):
+        return {
+            "budgetTokens": self.budget,
+            "includedTokens": self.used,
+            "droppedTokens": self.dropped_tokens,
+            "includedItems": self.included,
+            "droppedItems": self.dropped,
+            "truncatedAnswers": self.truncated_answers,
+            "collapsedAnswers": self.collapsed_answers
+        }
@@ -0,0 +1,96 @@
+import re
+import time
+import threading
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to `capacity` units that refill
+    evenly over `period` seconds (e.g. 30 requests per 60 s).
+
+    Callers reserve units up front and sleep for the returned wait outside
+    the lock; the level may go negative, so concurrent callers queue up
+    behind each other instead of all waking at the same refill.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """Takes `amount` units and returns the seconds to wait before using them."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= amount
+            wait = -self.level / self.rate if self.level < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` units are available; returns the time waited."""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def refund(self, amount):
+        """Returns over-reserved units (a negative amount charges more)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining=None, reset_seconds=None, limit=None):
+        """
+        Aligns the bucket with the server's view of the budget: adopts its
+        `limit` per period, never holds more than `remaining`, and pauses
+        until the reset when nothing is left.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit and limit != self.capacity:
+                self.rate = limit * self.rate / self.capacity
+                self.capacity = float(limit)
+            if remaining is not None:
+                self.level = min(self.level, remaining)
+                if remaining <= 0 and reset_seconds:
+                    self.blocked_until = max(self.blocked_until, now + reset_seconds)
+
+    def pause(self, seconds):
+        """Blocks every caller for `seconds` (e.g. after a 429 with retry-after)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value):
+    """
+    Parses Groq's rate-limit durations ("7.66s", "2m59.56s", "120ms") and
+    plain retry-after seconds ("2") into seconds; None if unparseable.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,338 @@
+import re
+from array import array
+import numpy as np
+from lexiconSentiment import POLARITY_THRESHOLD, score_texts
+from answerText import normalize_answer
+
+# Scores on a 1-5 scale for the choice labels our generated forms use
+QUALITY_SCORES = {
+    "excellent": 5, "outstanding": 5, "amazing": 5, "great": 5, "very good": 5,
+    "very satisfied": 5, "love it": 5,
+    "good": 4, "satisfied": 4, "above average": 4,
+    "average": 3, "okay": 3, "ok": 3, "fair": 3, "neutral": 3, "below average": 2,
+    "poor": 2, "bad": 2, "dissatisfied": 2,
+    "very poor": 1, "terrible": 1, "awful": 1, "very bad": 1, "very dissatisfied": 1,
+}
+
+CHOICE_TYPES = {"radio", "select"}
+
+SENTIMENTS = ("positive", "negative", "neutral")
+
+# Free-text answers are scored by the lexicon in blocks of this many
+TEXT_SCORE_BLOCK = 2048
+# Distinct raw answers remembered per choice question
+ANSWER_MEMO_SIZE = 4096
+_HAS_LETTER = re.compile(r"[A-Za-z]")
+
+def _normalized_lookup(values):
+    """
+    Returns a function looking answers up in `values` (keyed by
+    normalize_answer). Choice answers repeat verbatim, so raw strings are
+    memoized instead of normalized every time.
+    """
+    memo = {}
+
+    def lookup(answer):
+        if not isinstance(answer, str):
+            return values.get(normalize_answer(answer))
+        if answer not in memo:
+            if len(memo) >= ANSWER_MEMO_SIZE:
+                memo.clear()
+            memo[answer] = values.get(normalize_answer(answer))
+        return memo[answer]
+    return lookup
+
+def _rating_scale(options):
+    values = []
+    for option in options or []:
+        try:
+            values.append(float(option))
+        except (TypeError, ValueError):
+            continue
+    if len(values) >= 2:
+        return min(values), max(values)
+    return 1.0, 5.0
+
+def build_scorer(question):
+    """
+    Returns a function mapping an answer to a 1-5 score (or None) for one
+    question, or None if the question's answers can't be graded.
+    """
+    input_type = question.get("inputType")
+    options = question.get("options") or []
+
+    if input_type == "rating":
+        low, high = _rating_scale(options)
+        span = (high - low) or 1.0
+
+        def score_rating(answer):
+            try:
+                value = float(answer)
+            except (TypeError, ValueError):
+                return None
+            if value < low or value > high:
+                return None
+            return 1 + 4 * (value - low) / span
+        return score_rating
+
+    if input_type in CHOICE_TYPES:
+        scores = {}
+        for option in options:
+            score = QUALITY_SCORES.get(normalize_answer(option))
+            if score is not None:
+                scores[normalize_answer(option)] = score
+        if not scores:
+            return None
+        return _normalized_lookup(scores)
+
+    return None
+
+def grade_polarity(score):
+    """Maps a 1-5 score to polarity in [-1, 1] (3 is neutral)."""
+    return (score - 3) / 2
+
+def build_option_polarity(question):
+    """
+    For choice questions whose options aren't quality labels ("Yes,
+    definitely" / "Not really"), returns a function mapping an answer to the
+    lexicon polarity of its option, or None.
+    """
+    options = [option for option in question.get("options") or [] if isinstance(option, str)]
+    if question.get("inputType") not in CHOICE_TYPES or not options:
+        return None
+    polarity = {
+        normalize_answer(option): float(score)
+        for option, score in zip(options, score_texts(options))
+        if score
+    }
+    if not polarity:
+        return None
+    return _normalized_lookup(polarity)
+
+def answer_polarities(answers):
+    """
+    Polarity in [-1, 1] for each answer: quality labels ("Excellent",
+    "Poor") by their grade, anything else by the lexicon, scored in bulk.
+    """
+    polarities = np.zeros(len(answers))
+    texts, positions = [], []
+    for position, answer in enumerate(answers):
+        score = QUALITY_SCORES.get(normalize_answer(answer))
+        if score is not None:
+            polarities[position] = grade_polarity(score)
+        else:
+            texts.append(answer)
+            positions.append(position)
+    if texts:
+        polarities[positions] = score_texts(texts)
+    return polarities
+
+class ReportStatistics:
+    """
+    Exact aggregates for the numeric sections of a report.
+
+    Submissions are observed one at a time (so it works on streamed input)
+    and only (submission index, score) pairs are kept; the aggregation
+    itself is done with NumPy in `result()`.
+
+    Every submission also gets a sentiment label: graded answers count by
+    their score, and free-text answers (and choice options that aren't
+    quality labels) by the local lexicon (lexiconSentiment), so the counts
+    cover free-text only forms too.
+
+    The response distribution is kept per graded question, so two graded
+    questions don't count every submission twice, and quality labels and
+    numeric ratings aren't mixed in one set of buckets.
+    """
+
+    def __init__(self, form_data):
+        self.total = 0
+        self._rows = array("I")
+        self._scores = array("d")
+        self._questions = array("I")
+        self._question_names = {}
+        self._polarity_rows = array("I")
+        self._polarities = array("d")
+        self._pending_rows = []
+        self._pending_texts = []
+        self._by_id = {}
+        self._by_text = {}
+        for question in (form_data or {}).get("questions", []):
+            scorer = build_scorer(question)
+            polarity = build_option_polarity(question) if scorer is None else None
+            if scorer is None and polarity is None:
+                continue
+            name = question.get("question") or question.get("questionId")
+            index = self._question_names.setdefault(name, len(self._question_names)) if scorer else None
+            entry = (scorer, polarity, index)
+            if question.get("questionId"):
+                self._by_id[question["questionId"]] = entry
+            if question.get("question"):
+                self._by_text[question["question"]] = entry
+
+    def _scorer_for(self, response):
+        entry = self._by_id.get(response.get("questionId"))
+        if entry is None:
+            entry = self._by_text.get(response.get("question"))
+        return entry or (None, None, None)
+
+    def observe(self, submission):
+        row = self.total
+        self.total += 1
+        for response in submission.get("responses", []):
+            answer = response.get("answer")
+            scorer, polarity, question = self._scorer_for(response)
+            if scorer is not None:
+                score = scorer(answer)
+                if score is not None:
+                    self._rows.append(row)
+                    self._scores.append(score)
+                    self._questions.append(question)
+            elif polarity is not None:
+                value = polarity(answer)
+                if value is not None:
+                    self._polarity_rows.append(row)
+                    self._polarities.append(value)
+            elif isinstance(answer, str) and _HAS_LETTER.search(answer):
+                self._pending_rows.append(row)
+                self._pending_texts.append(answer)
+                if len(self._pending_texts) >= TEXT_SCORE_BLOCK:
+                    self._score_pending()
+
+    def _score_pending(self):
+        if not self._pending_texts:
+            return
+        scores = score_texts(self._pending_texts)
+        rows = np.asarray(self._pending_rows, dtype=np.int64)
+        # Answers with no sentiment words don't pull a submission towards neutral
+        scored = scores != 0
+        self._polarity_rows.extend(rows[scored].tolist())
+        self._polarities.extend(scores[scored].tolist())
+        self._pending_rows = []
+        self._pending_texts = []
+
+    def observe_all(self, submissions):
+        """Passes submissions through unchanged while recording them."""
+        for submission in submissions:
+            self.observe(submission)
+            yield submission
+
+    def totals(self):
+        """Raw, additive aggregates (see merge_totals and statistics_from_totals)."""
+        totals = {
+            "totalSubmissions": self.total,
+            "gradedAnswers": len(self._scores),
+            "ratingSum": 0.0,
+            "satisfiedAnswers": 0,
+            "responseDistribution": {},
+            "sentimentCounts": self._sentiment_counts()
+        }
+        if not self._scores:
+            return totals
+
+        scores = np.asarray(self._scores, dtype=np.float64)
+        rows = np.asarray(self._rows, dtype=np.int64)
+
+        questions = np.asarray(self._questions, dtype=np.int64)
+        grades = np.clip(np.rint(scores), 1, 5).astype(np.int64)
+        # One row of grade counts (index 1-5) per graded question
+        buckets = np.bincount(questions * 6 + grades, minlength=6 * len(self._question_names)).reshape(-1, 6)
+        totals["ratingSum"] = float(scores.sum())
+        totals["satisfiedAnswers"] = int((scores >= 3.5).sum())
+        totals["responseDistribution"] = {
+            name: {
+                "excellent": int(buckets[index, 5]),
+                "good": int(buckets[index, 4]),
+                "average": int(buckets[index, 3]),
+                "poor": int(buckets[index, 1] + buckets[index, 2])
+            }
+            for name, index in self._question_names.items() if buckets[index].any()
+        }
+        return totals
+
+    def _sentiment_counts(self):
+        labels = self.submission_sentiments()
+        positive = int((labels == 1).sum())
+        negative = int((labels == -1).sum())
+        return {"positive": positive, "negative": negative, "neutral": self.total - positive - negative}
+
+    def submission_sentiments(self):
+        """
+        Labels every submission by the mean polarity of its graded and
+        free-text answers: 1 positive, -1 negative, 0 neutral (also for
+        submissions with neither). Returns an int8 array in observation order.
+        """
+        self._score_pending()
+        rows = np.concatenate([
+            np.asarray(self._rows, dtype=np.int64),
+            np.asarray(self._polarity_rows, dtype=np.int64)
+        ])
+        polarities = np.concatenate([
+            grade_polarity(np.asarray(self._scores, dtype=np.float64)),
+            np.asarray(self._polarities, dtype=np.float64)
+        ])
+        counts = np.bincount(rows, minlength=self.total)
+        sums = np.bincount(rows, weights=polarities, minlength=self.total)
+        means = np.divide(sums, counts, out=np.zeros(self.total), where=counts > 0)
+        labels = np.zeros(self.total, dtype=np.int8)
+        labels[means >= POLARITY_THRESHOLD] = 1
+        labels[means <= -POLARITY_THRESHOLD] = -1
+        return labels
+
+    def result(self):
+        """
+        Returns the computed statistics; the graded section is None when no
+        answer could be scored, and sentiment is None without submissions.
+        """
+        return statistics_from_totals(self.totals())
+
+def merge_totals(first, second):
+    """Adds two sets of totals, e.g. a stored report's and the new submissions'."""
+    merged = {}
+    for key in list(first) + [key for key in second if key not in first]:
+        value, other = first.get(key), second.get(key)
+        if isinstance(value, dict) or isinstance(other, dict):
+            merged[key] = merge_totals(value or {}, other or {})
+        else:
+            merged[key] = (value or 0) + (other or 0)
+    return merged
+
+def statistics_from_totals(totals):
+    """Turns raw totals into the report's numeric sections."""
+    stats = {"totalSubmissions": totals["totalSubmissions"], "statistics": None, "sentiment": None}
+    if sum(totals["sentimentCounts"].values()):
+        stats["sentiment"] = with_percentages(totals["sentimentCounts"])
+    graded = totals["gradedAnswers"]
+    if not graded:
+        return stats
+
+    stats["statistics"] = {
+        "averageRating": round(totals["ratingSum"] / graded, 2),
+        "satisfactionScore": round(100 * totals["satisfiedAnswers"] / graded, 1),
+        "responseDistribution": {question: dict(counts) for question, counts in totals["responseDistribution"].items()}
+    }
+    return stats
+
+def with_percentages(counts):
+    total = sum(counts.values())
+    return {
+        key: {"count": count, "percentage": round(100 * count / total, 1) if total else 0}
+        for key, count in counts.items()
+    }
+
+def apply_statistics(report, stats):
+    """Overwrites the report's numeric fields with the computed values."""
+    report.setdefault("executiveSummary", {})["totalSubmissions"] = stats["totalSubmissions"]
+
+    if stats["sentiment"]:
+        sentiment = report.setdefault("sentimentAnalysis", {})
+        for key in SENTIMENTS:
+            section = sentiment.get(key) if isinstance(sentiment.get(key), dict) else {}
+            section.update(stats["sentiment"][key])
+            sentiment[key] = section
+
+    if stats["statistics"]:
+        statistics = report.get("statistics") if isinstance(report.get("statistics"), dict) else {}
+        statistics.update(stats["statistics"])
+        report["statistics"] = statistics
+    return report
@@ -0,0 +1,69 @@
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from aiSettings import data_path
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("reports.sqlite3"), timeout=30)
+    try:
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "form_id TEXT PRIMARY KEY, report TEXT NOT NULL, totals TEXT NOT NULL, "
+                "submission_count INTEGER NOT NULL, last_completed_at TEXT, updated_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS report_submissions ("
+                "form_id TEXT NOT NULL, submission_id TEXT NOT NULL, PRIMARY KEY (form_id, submission_id))"
+            )
+            yield db
+    finally:
+        db.close()
+
+def load_report_state(form_id):
+    """
+    Returns the stored report for a form, or None.
+
+    The state holds the report, the additive totals it was built from and
+    the high-water mark: how many submissions were covered, the latest
+    `completedAt` among them and the "_id"s of those that had one.
+    """
+    with _connect() as db:
+        row = db.execute(
+            "SELECT report, totals, submission_count, last_completed_at FROM reports WHERE form_id = ?",
+            (form_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        submission_ids = {
+            submission_id for (submission_id,) in
+            db.execute("SELECT submission_id FROM report_submissions WHERE form_id = ?", (form_id,))
+        }
+    return {
+        "report": json.loads(row[0]),
+        "totals": json.loads(row[1]),
+        "submissionCount": row[2],
+        "lastCompletedAt": row[3],
+        "submissionIds": submission_ids
+    }
+
+def save_report_state(form_id, report, totals, submission_count, last_completed_at, submission_ids=()):
+    """Stores the report and its high-water mark; `submission_ids` are added to those already covered."""
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO reports "
+            "(form_id, report, totals, submission_count, last_completed_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (form_id, json.dumps(report), json.dumps(totals), submission_count, last_completed_at, time.time())
+        )
+        db.executemany(
+            "INSERT OR IGNORE INTO report_submissions (form_id, submission_id) VALUES (?, ?)",
+            ((form_id, str(submission_id)) for submission_id in submission_ids)
+        )
+
+def delete_report_state(form_id):
+    with _connect() as db:
+        db.execute("DELETE FROM reports WHERE form_id = ?", (form_id,))
+        db.execute("DELETE FROM report_submissions WHERE form_id = ?", (form_id,))
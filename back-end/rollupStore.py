@@ -0,0 +1,337 @@
+"""
+Incrementally maintained dashboard rollups per form.
+
+Every submission is added to its form's hourly rollups as it arrives:
+one row per (form, hour) with the submission count and sentiment tallies,
+and one per (form, hour, question, option) with the answer count. A
+submission touches a fixed handful of rows, so recording it is O(1) in
+the number of earlier submissions. Dashboard reads are range scans over
+those rows instead of a model call or a rescan of every submission:
+
+    record_submission("ai_1f3c", submission, form)
+    read_dashboard("ai_1f3c", granularity="day", start=..., end=...)
+    -> {"sentiment": ..., "positiveResponses": ..., "negativeResponses": ...,
+        "responseTrend": ..., "questions": {...}}
+
+compact() merges hourly rows older than ROLLUP_COMPACT_AFTER_DAYS into
+daily rows. Compacted ranges can only be read per day. Recording a
+submission compacts its form when that hasn't happened for a day, so no
+scheduler is needed.
+
+Submissions with an "_id" are recorded once; replays are ignored.
+
+    echo '{"formId": ..., "form": {...}, "submission": {...}}' | python3 rollupStore.py record
+    python3 rollupStore.py rebuild FORM_ID < form_and_submissions.ndjson
+    python3 rollupStore.py dashboard FORM_ID [--granularity day] [--start ISO] [--end ISO]
+    python3 rollupStore.py compact [--older-than-days 7]
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+import numpy as np
+from aiSettings import data_path
+from reportStats import ReportStatistics
+from answerText import normalize_answer
+from formAnalytics import BUCKET_UNITS, CATEGORICAL_TYPES, parse_timestamps, percentage_change
+from ndjsonInput import iter_ndjson, split_header
+from aiMetrics import finish_call, start_call, timed
+
+GRANULARITY_SECONDS = {"hour": 60 * 60, "day": 24 * 60 * 60}
+COMPACT_AFTER_DAYS = int(os.getenv("ROLLUP_COMPACT_AFTER_DAYS", 7))
+COMPACT_EVERY_SECONDS = 24 * 60 * 60
+# Longest series a dashboard read returns (most recent buckets)
+MAX_DASHBOARD_BUCKETS = 1000
+SENTIMENT_COLUMNS = {1: "positive", -1: "negative", 0: "neutral"}
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("rollups.sqlite3"), timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS submission_rollups ("
+                "form_id TEXT NOT NULL, granularity TEXT NOT NULL, bucket INTEGER NOT NULL, "
+                "submissions INTEGER NOT NULL DEFAULT 0, positive INTEGER NOT NULL DEFAULT 0, "
+                "negative INTEGER NOT NULL DEFAULT 0, neutral INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (form_id, granularity, bucket))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS option_rollups ("
+                "form_id TEXT NOT NULL, granularity TEXT NOT NULL, bucket INTEGER NOT NULL, "
+                "question_id TEXT NOT NULL, option TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (form_id, granularity, bucket, question_id, option))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS compactions (form_id TEXT PRIMARY KEY, compacted_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS recorded_submissions ("
+                "form_id TEXT NOT NULL, submission_id TEXT NOT NULL, PRIMARY KEY (form_id, submission_id))"
+            )
+            yield db
+    finally:
+        db.close()
+
+class SubmissionRollup:
+    """
+    Turns submissions of one form into rollup increments: the hour bucket,
+    sentiment label and the (question, option) of every choice answer.
+    """
+
+    def __init__(self, form_data):
+        self.form_data = form_data or {}
+        self._options = {}
+        self._by_text = {}
+        for question in self.form_data.get("questions", []):
+            question_id = question.get("questionId")
+            if not question_id or question.get("isFollowUp") or question.get("inputType") not in CATEGORICAL_TYPES:
+                continue
+            # Answers are stored under the option's own spelling
+            self._options[question_id] = {normalize_answer(option): option for option in question.get("options") or []}
+            if question.get("question"):
+                self._by_text[question["question"]] = question_id
+
+    def increments(self, submissions):
+        """[(hour bucket, sentiment column, [(question_id, option)])] for a block of submissions."""
+        stats = ReportStatistics(self.form_data)
+        for submission in submissions:
+            stats.observe(submission)
+        labels = stats.submission_sentiments()
+        seconds = parse_timestamps([submission.get("completedAt") for submission in submissions])
+        seconds[seconds < 0] = int(time.time())
+        hours = seconds - seconds % GRANULARITY_SECONDS["hour"]
+        return [
+            (int(hour), SENTIMENT_COLUMNS[int(label)], self._choice_answers(submission))
+            for submission, hour, label in zip(submissions, hours, labels)
+        ]
+
+    def _choice_answers(self, submission):
+        answers = []
+        for response in submission.get("responses", []):
+            question_id = response.get("questionId")
+            if question_id not in self._options:
+                question_id = self._by_text.get(response.get("question"))
+                if question_id is None:
+                    continue
+            values = response.get("answer")
+            for value in values if isinstance(values, list) else [values]:
+                if value is None or value == "" or isinstance(value, (list, dict)):
+                    continue
+                answers.append((question_id, self._options[question_id].get(normalize_answer(value), str(value).strip())))
+        return answers
+
+def _apply(db, form_id, increments, granularity="hour"):
+    """Adds increments to the rollup rows in an open transaction."""
+    for bucket, sentiment, answers in increments:
+        db.execute(
+            f"INSERT INTO submission_rollups (form_id, granularity, bucket, submissions, {sentiment}) "
+            f"VALUES (?, ?, ?, 1, 1) ON CONFLICT(form_id, granularity, bucket) "
+            f"DO UPDATE SET submissions = submissions + 1, {sentiment} = {sentiment} + 1",
+            (form_id, granularity, bucket)
+        )
+        db.executemany(
+            "INSERT INTO option_rollups (form_id, granularity, bucket, question_id, option, count) "
+            "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT(form_id, granularity, bucket, question_id, option) "
+            "DO UPDATE SET count = count + 1",
+            [(form_id, granularity, bucket, question_id, option) for question_id, option in answers]
+        )
+
+def record_submission(form_id, submission, form_data=None):
+    """
+    Adds one submission to its form's hourly rollups. Returns False if it
+    was already recorded (same "_id").
+    """
+    increments = SubmissionRollup(form_data).increments([submission])
+    with _connect() as db:
+        submission_id = submission.get("_id")
+        if submission_id:
+            inserted = db.execute(
+                "INSERT OR IGNORE INTO recorded_submissions (form_id, submission_id) VALUES (?, ?)",
+                (form_id, str(submission_id))
+            ).rowcount
+            if not inserted:
+                return False
+        _apply(db, form_id, increments)
+        last = db.execute("SELECT compacted_at FROM compactions WHERE form_id = ?", (form_id,)).fetchone()
+    if last is None or time.time() - last[0] >= COMPACT_EVERY_SECONDS:
+        compact(form_id=form_id)
+    return True
+
+def rebuild_form(form_id, form_data, submissions, block_size=2048):
+    """Recomputes a form's rollups from all of its submissions (e.g. to backfill)."""
+    rollup = SubmissionRollup(form_data)
+    total = 0
+    with _connect() as db:
+        for table in ("submission_rollups", "option_rollups", "recorded_submissions"):
+            db.execute(f"DELETE FROM {table} WHERE form_id = ?", (form_id,))
+        block = []
+        for submission in submissions:
+            block.append(submission)
+            if len(block) >= block_size:
+                total += _rebuild_block(db, form_id, rollup, block)
+                block = []
+        total += _rebuild_block(db, form_id, rollup, block)
+    return {"formId": form_id, "submissions": total}
+
+def _rebuild_block(db, form_id, rollup, block):
+    if not block:
+        return 0
+    _apply(db, form_id, rollup.increments(block))
+    ids = [(form_id, str(submission["_id"])) for submission in block if submission.get("_id")]
+    db.executemany("INSERT OR IGNORE INTO recorded_submissions (form_id, submission_id) VALUES (?, ?)", ids)
+    return len(block)
+
+def compact(older_than_days=COMPACT_AFTER_DAYS, form_id=None, now=None):
+    """
+    Merges hourly rows that ended more than `older_than_days` days ago into
+    daily rows, and deletes them. Returns how many hourly rows were merged.
+    """
+    day = GRANULARITY_SECONDS["day"]
+    cutoff = int((now or time.time()) - older_than_days * day)
+    cutoff -= cutoff % day
+    form_filter, form_args = ("AND form_id = ?", (form_id,)) if form_id else ("", ())
+    with _connect() as db:
+        merged = db.execute(
+            f"SELECT COUNT(*) FROM submission_rollups WHERE granularity = 'hour' AND bucket < ? {form_filter}",
+            (cutoff, *form_args)
+        ).fetchone()[0]
+        db.execute(
+            "INSERT INTO submission_rollups (form_id, granularity, bucket, submissions, positive, negative, neutral) "
+            f"SELECT form_id, 'day', bucket - bucket % {day}, SUM(submissions), SUM(positive), SUM(negative), SUM(neutral) "
+            f"FROM submission_rollups WHERE granularity = 'hour' AND bucket < ? {form_filter} "
+            f"GROUP BY form_id, bucket - bucket % {day} "
+            "ON CONFLICT(form_id, granularity, bucket) DO UPDATE SET "
+            "submissions = submissions + excluded.submissions, positive = positive + excluded.positive, "
+            "negative = negative + excluded.negative, neutral = neutral + excluded.neutral",
+            (cutoff, *form_args)
+        )
+        db.execute(
+            "INSERT INTO option_rollups (form_id, granularity, bucket, question_id, option, count) "
+            f"SELECT form_id, 'day', bucket - bucket % {day}, question_id, option, SUM(count) "
+            f"FROM option_rollups WHERE granularity = 'hour' AND bucket < ? {form_filter} "
+            f"GROUP BY form_id, bucket - bucket % {day}, question_id, option "
+            "ON CONFLICT(form_id, granularity, bucket, question_id, option) DO UPDATE SET count = count + excluded.count",
+            (cutoff, *form_args)
+        )
+        for table in ("submission_rollups", "option_rollups"):
+            db.execute(f"DELETE FROM {table} WHERE granularity = 'hour' AND bucket < ? {form_filter}", (cutoff, *form_args))
+        if form_id:
+            db.execute("INSERT OR REPLACE INTO compactions (form_id, compacted_at) VALUES (?, ?)", (form_id, time.time()))
+    return merged
+
+def read_dashboard(form_id, granularity="day", start=None, end=None):
+    """
+    Dashboard cards for a form from its rollups, in the shape of
+    formAnalytics' dashboard(). `start`/`end` are epoch seconds; trends are
+    per `granularity` ("hour" or "day").
+    """
+    size = GRANULARITY_SECONDS[granularity]
+    conditions, args = "form_id = ?", [form_id]
+    if start is not None:
+        conditions += " AND bucket >= ?"
+        args.append(int(start) - int(start) % size)
+    if end is not None:
+        conditions += " AND bucket < ?"
+        args.append(int(end))
+    with _connect() as db:
+        # Hourly and compacted daily rows cover disjoint ranges; both are grouped by the requested size
+        rows = db.execute(
+            f"SELECT bucket - bucket % {size}, SUM(submissions), SUM(positive), SUM(negative), SUM(neutral) "
+            f"FROM submission_rollups WHERE {conditions} GROUP BY 1 ORDER BY 1",
+            args
+        ).fetchall()
+        options = db.execute(
+            f"SELECT question_id, option, SUM(count) FROM option_rollups WHERE {conditions} "
+            "GROUP BY question_id, option ORDER BY question_id, SUM(count) DESC",
+            args
+        ).fetchall()
+
+    series = np.array([row[1:] for row in rows], dtype=np.int64).reshape(-1, 4)
+    buckets = np.array([row[0] for row in rows], dtype=np.int64)
+    totals = series.sum(axis=0) if len(series) else np.zeros(4, dtype=np.int64)
+    trend = _series_points(buckets, series, size, granularity)
+    questions = {}
+    for question_id, option, count in options:
+        questions.setdefault(question_id, {"counts": {}})["counts"][option] = count
+
+    return {
+        "totalSubmissions": int(totals[0]),
+        "sentiment": {"sentiment": {"positive": int(totals[1]), "negative": int(totals[2]), "neutral": int(totals[3])}},
+        "positiveResponses": {
+            "total": int(totals[1]),
+            "percentageChange": percentage_change(trend["positive"]),
+            "chartData": {
+                "labels": [point["date"] for point in trend["positive"][-4:]],
+                "values": [point["value"] for point in trend["positive"][-4:]]
+            }
+        },
+        "negativeResponses": {
+            "negativeResponses": trend["negative"],
+            "percentageChange": percentage_change(trend["negative"]),
+            "totalNegative": int(totals[2])
+        },
+        "responseTrend": {"trendData": trend["submissions"]},
+        "questions": questions
+    }
+
+def _series_points(buckets, series, size, granularity):
+    """Gap-filled [{"date", "value"}] series for submissions, positive and negative counts."""
+    names = ("submissions", "positive", "negative")
+    if not len(buckets):
+        return {name: [] for name in names}
+    first = max(int(buckets[0]), int(buckets[-1]) - (MAX_DASHBOARD_BUCKETS - 1) * size)
+    keep = buckets >= first
+    slots = (buckets[keep] - first) // size
+    dense = np.zeros((int(buckets[-1] - first) // size + 1, 3), dtype=np.int64)
+    dense[slots] = series[keep][:, :3]
+    starts = (first + np.arange(len(dense)) * size).astype("datetime64[s]")
+    dates = np.datetime_as_string(starts, unit=BUCKET_UNITS[granularity]).tolist()
+    return {
+        name: [{"date": date, "value": value} for date, value in zip(dates, dense[:, column].tolist())]
+        for column, name in enumerate(names)
+    }
+
+def _epoch(value):
+    return int(parse_timestamps([value])[0]) if value else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-form dashboard rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("record", help='Read {"formId", "form", "submission"} from stdin and record it')
+    rebuild = commands.add_parser("rebuild", help='Rebuild from an optional {"form": ...} header line and one submission per line on stdin')
+    rebuild.add_argument("form_id")
+    dashboard = commands.add_parser("dashboard")
+    dashboard.add_argument("form_id")
+    dashboard.add_argument("--granularity", default="day", choices=list(GRANULARITY_SECONDS))
+    dashboard.add_argument("--start", help="ISO date/time (inclusive)")
+    dashboard.add_argument("--end", help="ISO date/time (exclusive)")
+    compact_command = commands.add_parser("compact")
+    compact_command.add_argument("--older-than-days", type=int, default=COMPACT_AFTER_DAYS)
+    compact_command.add_argument("--form-id")
+    args = parser.parse_args()
+
+    metrics = start_call(f"rollup_{args.command}")
+    try:
+        if args.command == "record":
+            with timed("parse"):
+                input_data = json.loads(sys.stdin.read())
+            recorded = record_submission(input_data.get("formId"), input_data.get("submission") or {}, input_data.get("form"))
+            result = {"recorded": recorded}
+        elif args.command == "rebuild":
+            form_data, submissions = split_header(iter_ndjson("-"), "form")
+            result = rebuild_form(args.form_id, form_data or {}, submissions)
+        elif args.command == "dashboard":
+            result = read_dashboard(args.form_id, args.granularity, _epoch(args.start), _epoch(args.end))
+        else:
+            result = {"mergedRows": compact(args.older_than_days, form_id=args.form_id)}
+        print(json.dumps(finish_call(metrics, result)))
+
+    except json.JSONDecodeError as e:
+        print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}))
+    except Exception as e:
+        print(json.dumps({"error": f"Error: {str(e)}"}))
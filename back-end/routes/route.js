@@ -17,6 +17,7 @@ import InputData from "../models/inputmodel.js";
 import CrossFormAnalysisSummary from '../models/CrossFormAnalysisSummary.js';
 import { AIForm, FormSubmission } from '../models/aiForm.model.js';
 import jwt from "jsonwebtoken";
+import { workerEnabled, callWorker, pythonExecutable } from '../utils/aiWorkerClient.js';
 
 const routes = express.Router();
 
@@ -151,9 +152,14 @@ routes.get("/get-summaries", async (req, res) => {
 
 routes.get('/analyze-cross-feedback', async (req, res) => {
     try {
+        // ?mode=hierarchical&limit=N summarizes up to N records in parallel cohorts
+        // and merges them; the default compares the latest 2 in one prompt
+        const hierarchical = req.query.mode === 'hierarchical';
+        const limit = hierarchical ? Math.max(2, parseInt(req.query.limit, 10) || 200) : 2;
+
         // Fetch the latest input data
-        const inputData = await InputData.find().sort({ createdAt: -1 }).limit(2);
-        console.log("Fetched inputData:", inputData);
+        const inputData = await InputData.find().sort({ createdAt: -1 }).limit(limit);
+        console.log("Fetched inputData:", inputData.length);
 
         if (!inputData || inputData.length < 2) {
             return res.status(400).json({ error: 'Not enough input data for analysis' });
@@ -162,14 +168,30 @@ routes.get('/analyze-cross-feedback', async (req, res) => {
         let outputData = '';
         let errorData = '';
 
-        // Pass input data to the Python script
-        const inputString = JSON.stringify(inputData).replace(/[\u2028\u2029]/g, '');
         const venvPython = join(__dirname, '..', 'venv', 'bin', 'python3');
         const pythonExecutable = existsSync(venvPython) ? venvPython : "python3";
-        const pythonProcess = spawn(pythonExecutable, ['strategy.py', inputString], {
-          env: { ...process.env },
-          cwd: join(__dirname, '..')
-        });
+        let pythonProcess;
+        if (hierarchical) {
+            // One record per line on stdin; hundreds of forms don't fit in argv
+            pythonProcess = spawn(pythonExecutable, ['strategy.py', '--hierarchical', '--ndjson'], {
+              env: { ...process.env },
+              cwd: join(__dirname, '..')
+            });
+            pythonProcess.stdin.on('error', (error) => {
+              console.error('Python stdin error:', error.message);
+            });
+            inputData.forEach(entry => {
+              pythonProcess.stdin.write(JSON.stringify(entry).replace(/[\u2028\u2029]/g, '') + '\n');
+            });
+            pythonProcess.stdin.end();
+        } else {
+            // Pass input data to the Python script
+            const inputString = JSON.stringify(inputData).replace(/[\u2028\u2029]/g, '');
+            pythonProcess = spawn(pythonExecutable, ['strategy.py', inputString], {
+              env: { ...process.env },
+              cwd: join(__dirname, '..')
+            });
+        }
 
         pythonProcess.stdout.on('data', (data) => {
             outputData += data.toString();
@@ -286,11 +308,32 @@ routes.get("/get-inputs", async (req, res) => {
     }
 });
 
+// Keeps formIndex.py's similarity index in step with the form templates so
+// /ai-forms/generate can serve a matching template without a model call.
+// Fire-and-forget: a failed update only costs a future index hit.
+function updateFormIndex(args, input) {
+  const indexProcess = spawn(pythonExecutable(), [join(__dirname, '..', 'formIndex.py'), ...args], {
+    env: { ...process.env },
+    cwd: join(__dirname, '..')
+  });
+  indexProcess.on("error", (error) => {
+    console.error("Form index update failed:", error.message);
+  });
+  indexProcess.stderr.on("data", (data) => {
+    console.error("Form index update failed:", data.toString());
+  });
+  indexProcess.stdin.on("error", (error) => {
+    console.error("Python stdin error:", error.message);
+  });
+  indexProcess.stdin.end(input || '');
+}
+
 // Create a new form
 routes.post("/forms", async (req, res) => {
   try {
     const form = new Form(req.body);
     await form.save();
+    updateFormIndex(['add-templates'], JSON.stringify([form]));
     res.status(201).json({ success: true, message: "Form created successfully", form });
   } catch (error) {
     res.status(400).json({ success: false, message: error.message });
@@ -307,6 +350,17 @@ routes.get("/forms", async (req, res) => {
   }
 });
 
+// Re-index every form template (e.g. templates created before the index existed)
+routes.post("/forms/reindex", async (req, res) => {
+  try {
+    const forms = await Form.find();
+    updateFormIndex(['add-templates'], JSON.stringify(forms));
+    res.status(202).json({ success: true, message: "Reindexing form templates", count: forms.length });
+  } catch (error) {
+    res.status(500).json({ success: false, message: error.message });
+  }
+});
+
 // Get a specific form by ID
 routes.get("/forms/:id", async (req, res) => {
   try {
@@ -327,6 +381,7 @@ routes.put("/forms/:id", async (req, res) => {
     if (!form) {
       return res.status(404).json({ success: false, message: "Form not found" });
     }
+    updateFormIndex(['add-templates'], JSON.stringify([form]));
     res.status(200).json({ success: true, message: "Form updated successfully", form });
   } catch (error) {
     res.status(400).json({ success: false, message: error.message });
@@ -340,6 +395,7 @@ routes.delete("/forms/:id", async (req, res) => {
     if (!form) {
       return res.status(404).json({ success: false, message: "Form not found" });
     }
+    updateFormIndex(['remove-template', String(form._id)]);
     res.status(200).json({ success: true, message: "Form deleted successfully" });
   } catch (error) {
     res.status(500).json({ success: false, message: error.message });
@@ -348,6 +404,41 @@ routes.delete("/forms/:id", async (req, res) => {
 
 // ==================== AI Form Generation Endpoints ====================
 
+// Generates the follow-ups for every option of a new form's choice questions
+// in the background (precomputeFollowUps.py), so answering one is a cache
+// lookup. Fire-and-forget: anything it misses is generated on demand.
+function precomputeFollowUps(aiForm) {
+  const precomputeProcess = spawn(pythonExecutable(), [join(__dirname, '..', 'precomputeFollowUps.py')], {
+    env: { ...process.env },
+    cwd: join(__dirname, '..')
+  });
+  let outputData = "";
+  precomputeProcess.stdout.on("data", (data) => {
+    outputData += data.toString();
+  });
+  precomputeProcess.stderr.on("data", (data) => {
+    console.error("Follow-up precompute failed:", data.toString());
+  });
+  precomputeProcess.on("error", (error) => {
+    console.error("Follow-up precompute failed:", error.message);
+  });
+  precomputeProcess.on("close", () => {
+    console.log("Follow-up precompute for", aiForm.formId, outputData.trim());
+  });
+  precomputeProcess.stdin.on("error", (error) => {
+    console.error("Python stdin error:", error.message);
+  });
+  precomputeProcess.stdin.end(JSON.stringify({
+    formId: aiForm.formId,
+    questions: aiForm.initialQuestions.map(q => ({
+      questionId: q.questionId,
+      question: q.question,
+      inputType: q.inputType,
+      options: q.options
+    }))
+  }));
+}
+
 // Generate AI form from business description
 routes.post("/ai-forms/generate", async (req, res) => {
   try {
@@ -483,6 +574,7 @@ routes.post("/ai-forms/generate", async (req, res) => {
         try {
           await aiForm.save();
           console.log("✅ AI Form saved successfully with formId:", formId);
+          precomputeFollowUps(aiForm);
         } catch (saveError) {
           console.error("Error saving AI form:", saveError);
           return res.status(500).json({ 
@@ -561,6 +653,44 @@ routes.get("/ai-forms", async (req, res) => {
   }
 });
 
+// Runs an AI task on a persistent worker (utils/aiWorkerClient.js) or, with
+// AI_WORKER=0, spawns its script with the input as JSON on stdin. Resolves
+// with the task's JSON result; rejects if the worker or script fails.
+function runAiTask(task, scriptArgs, input) {
+  if (workerEnabled) {
+    return callWorker(task, input);
+  }
+  return new Promise((resolve, reject) => {
+    let outputData = "";
+    let errorData = "";
+    const pythonProcess = spawn(pythonExecutable(), [join(__dirname, '..', scriptArgs[0]), ...scriptArgs.slice(1)], {
+      env: { ...process.env },
+      cwd: join(__dirname, '..')
+    });
+    pythonProcess.stdin.on("error", (error) => {
+      console.error("Python stdin error:", error.message);
+    });
+    pythonProcess.stdin.end(JSON.stringify(input));
+    pythonProcess.stdout.on("data", (data) => {
+      outputData += data.toString();
+    });
+    pythonProcess.stderr.on("data", (data) => {
+      errorData += data.toString();
+    });
+    pythonProcess.on("error", reject);
+    pythonProcess.on("close", () => {
+      if (errorData) {
+        return reject(new Error(errorData));
+      }
+      try {
+        resolve(JSON.parse(outputData));
+      } catch (error) {
+        reject(new Error(`Invalid response from AI: ${outputData.substring(0, 500)}`));
+      }
+    });
+  });
+}
+
 // Generate follow-up questions based on user response
 routes.post("/ai-forms/:formId/followup", async (req, res) => {
   try {
@@ -591,9 +721,6 @@ routes.post("/ai-forms/:formId/followup", async (req, res) => {
       });
     }
 
-    let outputData = "";
-    let errorData = "";
-
     // Prepare input for Python script
     const inputData = {
       question: {
@@ -603,88 +730,165 @@ routes.post("/ai-forms/:formId/followup", async (req, res) => {
         options: question.options
       },
       answer: answer,
-      allResponses: allResponses || []
+      allResponses: allResponses || [],
+      formId: formId
     };
 
-    const scriptPath = join(__dirname, '..', 'generateFollowUp.py');
-    // Use Python from virtual environment if it exists
-    const venvPython = join(__dirname, '..', 'venv', 'bin', 'python3');
-    const pythonExecutable = existsSync(venvPython) ? venvPython : "python3";
-    
-    const pythonProcess = spawn(pythonExecutable, [
-      scriptPath, 
-      JSON.stringify(inputData)
-    ], {
-      env: { ...process.env },
-      cwd: join(__dirname, '..')
-    });
+    let jsonResponse;
+    try {
+      jsonResponse = await runAiTask('generate_followup_questions', ['generateFollowUp.py'], inputData);
+    } catch (error) {
+      console.error("Python Error:", error.message);
+      return res.status(500).json({ 
+        success: false, 
+        error: "Follow-up generation failed", 
+        details: error.message 
+      });
+    }
 
-    pythonProcess.stdout.on("data", (data) => {
-      outputData += data.toString();
+    if (jsonResponse.error) {
+      return res.status(500).json({ 
+        success: false, 
+        error: jsonResponse.error 
+      });
+    }
+
+    // Update form with follow-up questions
+    const followUpQuestions = jsonResponse.followUpQuestions.map((q, index) => ({
+      questionId: `${questionId}_f${index + 1}`,
+      question: q.question,
+      inputType: q.inputType,
+      options: q.options || [],
+      required: q.required !== undefined ? q.required : false,
+      placeholder: q.placeholder || "",
+      parentQuestionId: questionId,
+      triggerAnswer: answer,
+      order: q.order || 1000 + index + 1,
+      isFollowUp: true
+    }));
+
+    // Add follow-up questions to form
+    form.initialQuestions.push(...followUpQuestions);
+    form.updatedAt = new Date();
+    await form.save();
+
+    res.status(200).json({
+      success: true,
+      message: "Follow-up questions generated",
+      followUpQuestions: followUpQuestions
     });
 
-    pythonProcess.stderr.on("data", (data) => {
-      errorData += data.toString();
+  } catch (error) {
+    console.error("Error generating follow-up:", error);
+    res.status(500).json({ 
+      success: false, 
+      message: "Server error", 
+      error: error.message 
     });
+  }
+});
 
-    pythonProcess.on("close", async (code) => {
-      if (errorData) {
-        console.error("Python Error:", errorData);
-        return res.status(500).json({ 
-          success: false, 
-          error: "Follow-up generation failed", 
-          details: errorData 
-        });
-      }
+// Generate follow-up questions for every answered question on a page in one call
+routes.post("/ai-forms/:formId/followup/batch", async (req, res) => {
+  try {
+    const { formId } = req.params;
+    const { answers, allResponses } = req.body;
 
-      try {
-        const jsonResponse = JSON.parse(outputData);
+    if (!Array.isArray(answers) || answers.length === 0) {
+      return res.status(400).json({ 
+        success: false, 
+        message: "answers array of { questionId, answer } is required" 
+      });
+    }
 
-        if (jsonResponse.error) {
-          return res.status(500).json({ 
-            success: false, 
-            error: jsonResponse.error 
-          });
-        }
+    const form = await AIForm.findOne({ formId });
+    if (!form) {
+      return res.status(404).json({ 
+        success: false, 
+        message: "Form not found" 
+      });
+    }
 
-        // Update form with follow-up questions
-        const followUpQuestions = jsonResponse.followUpQuestions.map((q, index) => ({
-          questionId: `${questionId}_f${index + 1}`,
-          question: q.question,
-          inputType: q.inputType,
-          options: q.options || [],
-          required: q.required !== undefined ? q.required : false,
-          placeholder: q.placeholder || "",
-          parentQuestionId: questionId,
-          triggerAnswer: answer,
-          order: q.order || 1000 + index + 1,
-          isFollowUp: true
-        }));
+    const answered = answers
+      .map(a => ({ entry: a, question: form.initialQuestions.find(q => q.questionId === a.questionId) }))
+      .filter(a => a.question && a.entry.answer !== undefined);
 
-        // Add follow-up questions to form
-        form.initialQuestions.push(...followUpQuestions);
-        form.updatedAt = new Date();
-        await form.save();
+    if (answered.length === 0) {
+      return res.status(404).json({ 
+        success: false, 
+        message: "None of the answered questions were found" 
+      });
+    }
 
-        res.status(200).json({
-          success: true,
-          message: "Follow-up questions generated",
-          followUpQuestions: followUpQuestions
-        });
+    const inputData = {
+      answers: answered.map(({ entry, question }) => ({
+        question: {
+          questionId: question.questionId,
+          question: question.question,
+          inputType: question.inputType,
+          options: question.options
+        },
+        answer: entry.answer
+      })),
+      allResponses: allResponses || [],
+      formId: formId
+    };
 
-      } catch (error) {
-        console.error("JSON Parse Error:", error.message);
-        console.error("Output:", outputData);
-        res.status(500).json({ 
-          success: false, 
-          error: "Invalid response from AI", 
-          details: outputData 
-        });
+    let jsonResponse;
+    try {
+      jsonResponse = await runAiTask('generate_followup_batch', ['generateFollowUp.py'], inputData);
+    } catch (error) {
+      console.error("Python Error:", error.message);
+      return res.status(500).json({ 
+        success: false, 
+        error: "Follow-up generation failed", 
+        details: error.message 
+      });
+    }
+
+    if (jsonResponse.error) {
+      return res.status(500).json({ 
+        success: false, 
+        error: jsonResponse.error 
+      });
+    }
+
+    // Keyed by the parent questionId, same shape as the single follow-up route
+    const followUps = {};
+    const errors = {};
+    answered.forEach(({ entry, question }) => {
+      const result = (jsonResponse.followUps || {})[question.questionId];
+      if (!result || result.error || !Array.isArray(result.followUpQuestions)) {
+        errors[question.questionId] = result && result.error ? result.error : "No follow-up generated";
+        return;
       }
+      followUps[question.questionId] = result.followUpQuestions.map((q, index) => ({
+        questionId: `${question.questionId}_f${index + 1}`,
+        question: q.question,
+        inputType: q.inputType,
+        options: q.options || [],
+        required: q.required !== undefined ? q.required : false,
+        placeholder: q.placeholder || "",
+        parentQuestionId: question.questionId,
+        triggerAnswer: entry.answer,
+        order: q.order || 1000 + index + 1,
+        isFollowUp: true
+      }));
+    });
+
+    Object.values(followUps).forEach(questions => form.initialQuestions.push(...questions));
+    form.updatedAt = new Date();
+    await form.save();
+
+    res.status(200).json({
+      success: true,
+      message: "Follow-up questions generated",
+      followUps: followUps,
+      errors: errors
     });
 
   } catch (error) {
-    console.error("Error generating follow-up:", error);
+    console.error("Error generating follow-ups:", error);
     res.status(500).json({ 
       success: false, 
       message: "Server error", 
@@ -722,6 +926,24 @@ routes.post("/ai-forms/:formId/submit", async (req, res) => {
       submission: submission
     });
 
+    // Dashboard rollups are updated after responding; the submission is already saved
+    try {
+      const form = await AIForm.findOne({ formId });
+      if (form) {
+        runRollupStore(['record'], JSON.stringify({
+          formId,
+          form: { questions: rollupQuestions(form) },
+          submission: {
+            _id: String(submission._id),
+            completedAt: submission.completedAt,
+            responses: submission.responses.map(r => ({ questionId: r.questionId, answer: r.answer }))
+          }
+        }));
+      }
+    } catch (error) {
+      console.error("Rollup update failed:", error.message);
+    }
+
   } catch (error) {
     console.error("Error submitting form:", error);
     res.status(500).json({ 
@@ -732,6 +954,142 @@ routes.post("/ai-forms/:formId/submit", async (req, res) => {
   }
 });
 
+function rollupQuestions(form) {
+  return form.initialQuestions.map(q => ({
+    questionId: q.questionId,
+    question: q.question,
+    inputType: q.inputType,
+    options: q.options,
+    isFollowUp: q.isFollowUp
+  }));
+}
+
+// Runs rollupStore.py and resolves with its parsed output (null on failure).
+// `input` is a string or an async iterable of lines for stdin.
+function runRollupStore(args, input) {
+  const pythonProcess = spawn(pythonExecutable(), [join(__dirname, '..', 'rollupStore.py'), ...args], {
+    env: { ...process.env },
+    cwd: join(__dirname, '..')
+  });
+
+  let outputData = "";
+  let errorData = "";
+  let exited = false;
+  pythonProcess.stdout.on("data", (data) => {
+    outputData += data.toString();
+  });
+  pythonProcess.stderr.on("data", (data) => {
+    errorData += data.toString();
+  });
+  const closed = new Promise((resolve) => {
+    pythonProcess.on("error", (error) => {
+      errorData += error.message;
+    });
+    pythonProcess.on("close", () => {
+      exited = true;
+      resolve();
+    });
+  });
+  pythonProcess.stdin.on("error", (error) => {
+    console.error("Python stdin error:", error.message);
+  });
+
+  const writeInput = async () => {
+    if (typeof input === 'string' || !input) {
+      pythonProcess.stdin.end(input || '');
+      return;
+    }
+    for await (const line of input) {
+      if (exited) break;
+      if (!pythonProcess.stdin.write(line)) {
+        await Promise.race([new Promise((resolve) => pythonProcess.stdin.once("drain", resolve)), closed]);
+      }
+    }
+    pythonProcess.stdin.end();
+  };
+
+  return writeInput().then(() => closed).then(() => {
+    if (errorData) {
+      console.error("Rollup store error:", errorData);
+      return null;
+    }
+    try {
+      return JSON.parse(outputData);
+    } catch (error) {
+      console.error("JSON Parse Error:", error.message);
+      return null;
+    }
+  });
+}
+
+// Dashboard cards from the form's incrementally maintained rollups (no model call).
+// ?granularity=hour|day&start=ISO&end=ISO
+routes.get("/ai-forms/:formId/dashboard", async (req, res) => {
+  try {
+    const { formId } = req.params;
+    const { granularity = 'day', start, end } = req.query;
+    if (!['hour', 'day'].includes(granularity)) {
+      return res.status(400).json({ success: false, message: "granularity must be hour or day" });
+    }
+
+    const args = ['dashboard', formId, '--granularity', granularity];
+    if (start) args.push('--start', String(start));
+    if (end) args.push('--end', String(end));
+    const dashboard = await runRollupStore(args);
+    if (!dashboard || dashboard.error) {
+      return res.status(500).json({ success: false, error: dashboard ? dashboard.error : "Dashboard read failed" });
+    }
+    res.status(200).json({ success: true, formId, dashboard });
+
+  } catch (error) {
+    console.error("Error reading dashboard rollups:", error);
+    res.status(500).json({ 
+      success: false, 
+      message: "Server error", 
+      error: error.message 
+    });
+  }
+});
+
+// Recomputes a form's rollups from all of its submissions (backfill after deploying rollups)
+routes.post("/ai-forms/:formId/dashboard/rebuild", async (req, res) => {
+  try {
+    const { formId } = req.params;
+    const form = await AIForm.findOne({ formId });
+    if (!form) {
+      return res.status(404).json({ 
+        success: false, 
+        message: "Form not found" 
+      });
+    }
+
+    async function* lines() {
+      yield JSON.stringify({ form: { questions: rollupQuestions(form) } }) + "\n";
+      const cursor = FormSubmission.find({ formId }).select({ responses: 1, completedAt: 1 }).lean().cursor();
+      for await (const submission of cursor) {
+        yield JSON.stringify({
+          _id: String(submission._id),
+          completedAt: submission.completedAt,
+          responses: submission.responses.map(r => ({ questionId: r.questionId, answer: r.answer }))
+        }) + "\n";
+      }
+    }
+    const result = await runRollupStore(['rebuild', formId], lines());
+    if (!result || result.error) {
+      return res.status(500).json({ success: false, error: result ? result.error : "Rollup rebuild failed" });
+    }
+    res.status(200).json({ success: true, ...result });
+
+  } catch (error) {
+    console.error("Error rebuilding dashboard rollups:", error);
+    res.status(500).json({ 
+      success: false, 
+      message: "Server error", 
+      error: error.message 
+    });
+  }
+});
+
 // Get form submissions/reports
 routes.get("/ai-forms/:formId/submissions", async (req, res) => {
   try {
@@ -787,7 +1145,7 @@ routes.get("/ai-forms/:formId/submissions", async (req, res) => {
     };
 
     // Generate AI report if requested
-    if (aiReport === 'true' && submissions.length > 0) {
+    if ((aiReport === 'true' || aiReport === 'queue') && submissions.length > 0) {
       try {
         let outputData = "";
         let errorData = "";
@@ -796,12 +1154,22 @@ routes.get("/ai-forms/:formId/submissions", async (req, res) => {
         const reportData = {
           form: {
             title: form.title,
-            description: form.description
+            description: form.description,
+            // Lets the report script compute counts and ratings from the options locally
+            questions: form.initialQuestions.map(q => ({
+              questionId: q.questionId,
+              question: q.question,
+              inputType: q.inputType,
+              options: q.options
+            }))
           },
           submissions: submissions.map(submission => ({
+            _id: String(submission._id),
+            completedAt: submission.completedAt,
             responses: submission.responses.map(r => {
               const question = form.initialQuestions.find(q => q.questionId === r.questionId);
               return {
+                questionId: r.questionId,
                 question: question ? question.question : '',
                 answer: r.answer
               };
@@ -809,15 +1177,74 @@ routes.get("/ai-forms/:formId/submissions", async (req, res) => {
           }))
         };
 
-        const scriptPath = join(__dirname, '..', 'generateReport.py');
         const venvPython = join(__dirname, '..', 'venv', 'bin', 'python3');
         const pythonExecutable = existsSync(venvPython) ? venvPython : "python3";
+
+        if (aiReport === 'queue') {
+          // Run the report on the background job queue (aiWorker.py --queue) so it
+          // can't hold up live follow-ups; clients poll GET /ai-jobs/:jobId
+          const queueProcess = spawn(pythonExecutable, [join(__dirname, '..', 'jobQueue.py'), 'enqueue', 'generate_ai_report'], {
+            env: { ...process.env },
+            cwd: join(__dirname, '..')
+          });
+          queueProcess.stdin.on("error", (error) => {
+            console.error("Python stdin error:", error.message);
+          });
+          queueProcess.stdin.end(JSON.stringify({ formId, ...reportData }));
+
+          queueProcess.stdout.on("data", (data) => {
+            outputData += data.toString();
+          });
+          queueProcess.stderr.on("data", (data) => {
+            errorData += data.toString();
+          });
+
+          await new Promise((resolve) => {
+            queueProcess.on("close", () => {
+              if (errorData) {
+                console.error("Python Error:", errorData);
+              } else {
+                try {
+                  responseData.aiReportJob = JSON.parse(outputData);
+                } catch (error) {
+                  console.error("JSON Parse Error:", error.message);
+                }
+              }
+              resolve();
+            });
+          });
+          return res.status(200).json(responseData);
+        }
+
+        if (workerEnabled) {
+          // The same incremental report as generateReport.py --form-id, on the persistent worker
+          try {
+            responseData.aiReport = await callWorker('generate_ai_report', { formId, ...reportData }, { pool: 'batch' });
+          } catch (error) {
+            // Don't fail the request if the AI report fails, just log it
+            console.error("AI worker error:", error.message);
+          }
+          return res.status(200).json(responseData);
+        }
+
+        const scriptPath = join(__dirname, '..', 'generateReport.py');
         
-        const pythonProcess = spawn(pythonExecutable, [scriptPath, JSON.stringify(reportData)], {
+        // --form-id makes the script reuse its stored report and only analyze new submissions
+        const pythonProcess = spawn(pythonExecutable, [scriptPath, '--ndjson', '--form-id', formId], {
           env: { ...process.env },
           cwd: join(__dirname, '..')
         });
 
+        // Stream submissions as NDJSON on stdin so large forms don't hit the argv size limit
+        pythonProcess.stdin.on("error", (error) => {
+          console.error("Python stdin error:", error.message);
+        });
+        pythonProcess.stdin.write(JSON.stringify({ form: reportData.form }) + "\n");
+        reportData.submissions.forEach(submission => {
+          pythonProcess.stdin.write(JSON.stringify(submission) + "\n");
+        });
+        pythonProcess.stdin.end();
+
         pythonProcess.stdout.on("data", (data) => {
           outputData += data.toString();
         });
@@ -862,6 +1289,148 @@ routes.get("/ai-forms/:formId/submissions", async (req, res) => {
   }
 });
 
+// Exact dashboard analytics (option counts, rating means, sentiment and
+// trends per hour/day/week) computed by formAnalytics.py, without a model call.
+// ?crosstab=q1,q2 (repeatable) adds the crosstab of two choice questions.
+routes.get("/ai-forms/:formId/analytics", async (req, res) => {
+  try {
+    const { formId } = req.params;
+    const bucket = req.query.bucket || 'day';
+    if (!['hour', 'day', 'week'].includes(bucket)) {
+      return res.status(400).json({ success: false, message: "bucket must be hour, day or week" });
+    }
+    const crosstabs = [].concat(req.query.crosstab || []);
+    if (!crosstabs.every(pair => typeof pair === 'string' && /^[^,]+,[^,]+$/.test(pair))) {
+      return res.status(400).json({ success: false, message: "crosstab must be two question ids: q1,q2" });
+    }
+
+    const form = await AIForm.findOne({ formId });
+    if (!form) {
+      return res.status(404).json({ 
+        success: false, 
+        message: "Form not found" 
+      });
+    }
+
+    let outputData = "";
+    let errorData = "";
+
+    const crosstabArgs = crosstabs.flatMap(pair => ['--crosstab', pair]);
+    const pythonProcess = spawn(pythonExecutable(), [join(__dirname, '..', 'formAnalytics.py'), '--ndjson', '-', '--bucket', bucket, ...crosstabArgs], {
+      env: { ...process.env },
+      cwd: join(__dirname, '..')
+    });
+
+    pythonProcess.stdout.on("data", (data) => {
+      outputData += data.toString();
+    });
+
+    pythonProcess.stderr.on("data", (data) => {
+      errorData += data.toString();
+    });
+
+    let exited = false;
+    const closed = new Promise((resolve) => pythonProcess.on("close", () => {
+      exited = true;
+      resolve();
+    }));
+
+    // Stream submissions straight from the cursor so large forms are never held in memory
+    pythonProcess.stdin.on("error", (error) => {
+      console.error("Python stdin error:", error.message);
+    });
+    pythonProcess.stdin.write(JSON.stringify({
+      form: {
+        questions: form.initialQuestions.map(q => ({
+          questionId: q.questionId,
+          question: q.question,
+          inputType: q.inputType,
+          options: q.options,
+          isFollowUp: q.isFollowUp
+        }))
+      }
+    }) + "\n");
+    const cursor = FormSubmission.find({ formId }).select({ responses: 1, completedAt: 1 }).lean().cursor();
+    for await (const submission of cursor) {
+      if (exited) break;
+      const line = JSON.stringify({
+        completedAt: submission.completedAt,
+        responses: submission.responses.map(r => ({ questionId: r.questionId, answer: r.answer }))
+      }) + "\n";
+      if (!pythonProcess.stdin.write(line)) {
+        await Promise.race([new Promise((resolve) => pythonProcess.stdin.once("drain", resolve)), closed]);
+      }
+    }
+    pythonProcess.stdin.end();
+
+    await closed;
+    if (errorData) {
+      console.error("Python Error:", errorData);
+      return res.status(500).json({ 
+        success: false, 
+        error: "Analytics failed", 
+        details: errorData 
+      });
+    }
+
+    const analytics = JSON.parse(outputData);
+    if (analytics.error) {
+      return res.status(400).json({ success: false, error: analytics.error });
+    }
+    res.status(200).json({ success: true, formId, analytics });
+
+  } catch (error) {
+    console.error("Error computing form analytics:", error);
+    res.status(500).json({ 
+      success: false, 
+      message: "Server error", 
+      error: error.message 
+    });
+  }
+});
+
+// Poll a queued AI job (status, queue position, and the result once done)
+routes.get("/ai-jobs/:jobId", async (req, res) => {
+  try {
+    const { jobId } = req.params;
+    let outputData = "";
+    let errorData = "";
+
+    const pythonProcess = spawn(pythonExecutable(), [join(__dirname, '..', 'jobQueue.py'), 'status', jobId], {
+      env: { ...process.env },
+      cwd: join(__dirname, '..')
+    });
+
+    pythonProcess.stdout.on("data", (data) => {
+      outputData += data.toString();
+    });
+
+    pythonProcess.stderr.on("data", (data) => {
+      errorData += data.toString();
+    });
+
+    pythonProcess.on("close", () => {
+      if (errorData) {
+        console.error("Python Error:", errorData);
+        return res.status(500).json({ success: false, error: "Job lookup failed", details: errorData });
+      }
+      try {
+        const job = JSON.parse(outputData);
+        if (job.error && !job.jobId) {
+          return res.status(404).json({ success: false, message: job.error });
+        }
+        res.status(200).json({ success: true, job });
+      } catch (error) {
+        console.error("JSON Parse Error:", error.message);
+        res.status(500).json({ success: false, error: "Invalid response from job queue", details: outputData });
+      }
+    });
+  } catch (error) {
+    console.error("Error fetching job:", error);
+    res.status(500).json({ success: false, message: "Server error", error: error.message });
+  }
+});
+
 // Get form strategy/analysis
 routes.get("/ai-forms/:formId/strategy", async (req, res) => {
   try {
@@ -899,7 +1468,6 @@ routes.get("/ai-forms/:formId/strategy", async (req, res) => {
     let outputData = "";
     let errorData = "";
 
-    const inputString = JSON.stringify(feedbackData).replace(/[\u2028\u2029]/g, '');
     const venvPython = join(__dirname, '..', 'venv', 'bin', 'python3');
     const pythonExecutable = existsSync(venvPython) ? venvPython : "python3";
     
@@ -908,11 +1476,21 @@ routes.get("/ai-forms/:formId/strategy", async (req, res) => {
     console.log(`Strategy script exists: ${existsSync(join(__dirname, '..', 'strategy.py'))}`);
     console.log(`Feedback data entries: ${feedbackData.length}`);
     
-    const pythonProcess = spawn(pythonExecutable, [join(__dirname, '..', 'strategy.py'), inputString], {
+    // --form-id scopes the run for stale-while-revalidate (see singleFlight.py)
+    const pythonProcess = spawn(pythonExecutable, [join(__dirname, '..', 'strategy.py'), '--form-id', formId, '--ndjson'], {
       env: { ...process.env },
       cwd: join(__dirname, '..')
     });
 
+    // Stream one feedback entry per line on stdin instead of a single argv blob
+    pythonProcess.stdin.on('error', (error) => {
+      console.error('Python stdin error:', error.message);
+    });
+    feedbackData.forEach(entry => {
+      pythonProcess.stdin.write(JSON.stringify(entry).replace(/[\u2028\u2029]/g, '') + '\n');
+    });
+    pythonProcess.stdin.end();
+
     pythonProcess.stdout.on('data', (data) => {
       outputData += data.toString();
     });
@@ -3,6 +3,7 @@ import cors from "cors";
 import dotenv from "dotenv";
 import { connectDB, isConnected } from "./db.js";
 import routes from "./routes/route.js";
+import { startQueueWorkers } from "./utils/aiWorkerClient.js";
 
 dotenv.config();
 
@@ -11,6 +12,9 @@ const app = express();
 // Connect to MongoDB
 connectDB();
 
+// Background AI job workers (aiWorker.py --queue) for reports requested with aiReport=queue
+startQueueWorkers();
+
 // Middleware
 app.use(cors());
 app.use(express.json()); 
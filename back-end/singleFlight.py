@@ -0,0 +1,279 @@
+"""
+Coalescing of identical concurrent AI runs across processes.
+
+When several dashboard users open the same form's report or strategy at
+once, route.js starts one script per request, all with the same input.
+Each run is keyed by its task and a hash of its input; the first process
+to claim the key (the leader) runs the model calls, the others wait for
+its result instead of starting their own:
+
+    key = flight_key("generate_ai_report", digest, form_id)
+    result = single_flight(key, lambda: generate_ai_report(...))
+
+Flights are rows in AI_DATA_DIR/single_flight.sqlite3. The leader holds a
+lease it renews while it works; if it dies, the lease runs out and a
+waiter takes over. A finished result is also handed to identical requests
+that arrive within AI_SINGLE_FLIGHT_TTL seconds (default 30).
+
+Stale-while-revalidate (AI_STALE_WHILE_REVALIDATE=SECONDS, off by default):
+runs can name a scope, such as the form they belong to. While a result for
+the scope is at most that old, a request whose input changed (say, a new
+submission) gets the previous result at once, marked "stale": true, and
+the new run continues in a detached process. Later requests wait for or
+reuse that run as usual.
+
+AI_SINGLE_FLIGHT=0 turns coalescing off.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from aiSettings import data_path
+
+SINGLE_FLIGHT_ENABLED = os.getenv("AI_SINGLE_FLIGHT", "1") != "0"
+LEASE_SECONDS = float(os.getenv("AI_SINGLE_FLIGHT_LEASE", 60))
+RESULT_TTL_SECONDS = float(os.getenv("AI_SINGLE_FLIGHT_TTL", 30))
+STALE_SECONDS = float(os.getenv("AI_STALE_WHILE_REVALIDATE", 0))
+POLL_SECONDS = 0.2
+
+# Spooled stdin is kept for detached refreshes and swept once this old
+SPOOL_MAX_AGE_SECONDS = 60 * 60
+KEEP_FINISHED_SECONDS = 24 * 60 * 60
+READ_BLOCK = 1 << 20
+
+# Set on a detached refresh so it takes over the claim its parent made
+TOKEN_ENV = "AI_SINGLE_FLIGHT_TOKEN"
+
+@contextmanager
+def _connect():
+    db = sqlite3.connect(data_path("single_flight.sqlite3"), timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                "key TEXT PRIMARY KEY, owner TEXT, lease_until REAL NOT NULL DEFAULT 0, "
+                "generation INTEGER NOT NULL DEFAULT 0, result TEXT, succeeded INTEGER, finished_at REAL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS latest ("
+                "scope TEXT PRIMARY KEY, key TEXT NOT NULL, result TEXT NOT NULL, finished_at REAL NOT NULL)"
+            )
+            yield db
+    finally:
+        db.close()
+
+def flight_key(task, *parts):
+    """Key of one run: its task plus everything that determines its output."""
+    digest = hashlib.sha256(task.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+    return f"{task}:{digest.hexdigest()}"
+
+def spool_input(source="-"):
+    """
+    Hashes NDJSON input, returning (digest, path to read it from).
+
+    A file is hashed in place. Stdin can only be read once, so it is copied
+    to a spool file while being hashed; the spool outlives the call for a
+    detached refresh to read and is swept after SPOOL_MAX_AGE_SECONDS.
+    """
+    digest = hashlib.sha256()
+    if source != "-":
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                digest.update(block)
+        return digest.hexdigest(), source
+
+    spool_dir = data_path("spool")
+    os.makedirs(spool_dir, exist_ok=True)
+    _sweep_spool(spool_dir)
+    with tempfile.NamedTemporaryFile("wb", dir=spool_dir, suffix=".ndjson", delete=False) as spool:
+        for block in iter(lambda: sys.stdin.buffer.read(READ_BLOCK), b""):
+            digest.update(block)
+            spool.write(block)
+    return digest.hexdigest(), spool.name
+
+def _sweep_spool(spool_dir):
+    cutoff = time.time() - SPOOL_MAX_AGE_SECONDS
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            # Another process swept it first
+            pass
+
+def _claim(key, token, scope):
+    """
+    One atomic look at a flight. Returns one of
+        ("result", value)      a recent successful result to reuse
+        ("lead", None)         the flight is now claimed by `token`
+        ("wait", generation)   another process is running it
+        ("stale", value)       a scope result to serve; another process is running it
+        ("revalidate", value)  a scope result to serve; the flight is claimed
+                               by `token` and has to be run elsewhere
+    """
+    now = time.time()
+    with _connect() as db:
+        # Take the write lock up front so two processes can't both lead
+        db.execute("BEGIN IMMEDIATE")
+        row = db.execute(
+            "SELECT owner, lease_until, generation, result, succeeded, finished_at FROM flights WHERE key = ?",
+            (key,)
+        ).fetchone()
+        owner, lease_until, generation, result, succeeded, finished_at = row or (None, 0, 0, None, 0, None)
+        # Failures are only handed to the requests that waited for them
+        if succeeded and now - finished_at <= RESULT_TTL_SECONDS:
+            return "result", json.loads(result)
+        in_flight = owner is not None and owner != token and lease_until > now
+
+        stale = None
+        if scope and STALE_SECONDS > 0:
+            stale = db.execute(
+                "SELECT result, finished_at FROM latest WHERE scope = ? AND finished_at >= ?",
+                (scope, now - STALE_SECONDS)
+            ).fetchone()
+        if in_flight:
+            return ("stale", json.loads(stale[0])) if stale else ("wait", generation)
+
+        db.execute(
+            "INSERT INTO flights (key, owner, lease_until) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until",
+            (key, token, now + LEASE_SECONDS)
+        )
+        return ("revalidate", json.loads(stale[0])) if stale else ("lead", None)
+
+def _wait(key, generation):
+    """Polls until the flight finishes (returns its result) or its leader's lease runs out (None)."""
+    while True:
+        time.sleep(POLL_SECONDS)
+        with _connect() as db:
+            row = db.execute(
+                "SELECT owner, lease_until, generation, result FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        owner, lease_until, current_generation, result = row
+        if current_generation > generation and result is not None:
+            return json.loads(result)
+        if owner is None or lease_until <= time.time():
+            return None
+
+def _renew_lease(key, token, stop):
+    while not stop.wait(LEASE_SECONDS / 3):
+        with _connect() as db:
+            db.execute(
+                "UPDATE flights SET lease_until = ? WHERE key = ? AND owner = ?",
+                (time.time() + LEASE_SECONDS, key, token)
+            )
+
+def _lead(key, token, compute, scope):
+    """Runs `compute` as the flight's leader and publishes its result to the waiters."""
+    stop = threading.Event()
+    threading.Thread(target=_renew_lease, args=(key, token, stop), daemon=True).start()
+    try:
+        result = compute()
+    except BaseException:
+        # Let a waiter take over rather than wait out the lease
+        stop.set()
+        with _connect() as db:
+            db.execute("UPDATE flights SET owner = NULL, lease_until = 0 WHERE key = ? AND owner = ?", (key, token))
+        raise
+    stop.set()
+
+    now = time.time()
+    encoded = json.dumps(result)
+    succeeded = not (isinstance(result, dict) and "error" in result)
+    with _connect() as db:
+        # A leader that lost its lease still publishes, but leaves the new owner's claim alone
+        db.execute(
+            "UPDATE flights SET result = ?, succeeded = ?, finished_at = ?, generation = generation + 1, "
+            "owner = CASE WHEN owner = ? THEN NULL ELSE owner END, "
+            "lease_until = CASE WHEN owner = ? THEN 0 ELSE lease_until END WHERE key = ?",
+            (encoded, int(succeeded), now, token, token, key)
+        )
+        if scope and succeeded:
+            db.execute(
+                "INSERT OR REPLACE INTO latest (scope, key, result, finished_at) VALUES (?, ?, ?, ?)",
+                (scope, key, encoded, now)
+            )
+        db.execute(
+            "DELETE FROM flights WHERE owner IS NULL AND finished_at < ?", (now - KEEP_FINISHED_SECONDS,)
+        )
+    return result
+
+def refresh_in_background(argv, token):
+    """Starts `python argv...` detached, as the leader of the flight claimed with `token`."""
+    subprocess.Popen(
+        [sys.executable] + argv,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, **{TOKEN_ENV: token}),
+        start_new_session=True
+    )
+
+def single_flight(key, compute, scope=None, refresh_argv=None, spool=None):
+    """
+    Returns the result of `compute()` for `key`, running it in at most one
+    process at a time.
+
+    With stale-while-revalidate on, `scope` names the results a stale one
+    may stand in for, and `refresh_argv` is the script command line (without
+    the interpreter) that recomputes this key in a detached process. Without
+    `refresh_argv` no stale result is served. `spool` is the input path
+    from spool_input(); spool files are removed unless a refresh still
+    needs them.
+    """
+    handed_off = False
+    try:
+        if not SINGLE_FLIGHT_ENABLED:
+            return compute()
+
+        adopted = os.environ.pop(TOKEN_ENV, None)
+        token = adopted or uuid.uuid4().hex
+        # A detached refresh is the revalidation; it never serves stale results itself
+        stale_scope = scope if refresh_argv and not adopted else None
+        while True:
+            state, value = _claim(key, token, stale_scope)
+            if state == "result":
+                return value
+            if state == "lead":
+                return _lead(key, token, compute, scope)
+            if state == "revalidate":
+                try:
+                    refresh_in_background(refresh_argv, token)
+                    handed_off = True
+                except OSError:
+                    # Run it here instead; the claim is already this process's
+                    return _lead(key, token, compute, scope)
+            if state in ("stale", "revalidate"):
+                if isinstance(value, dict):
+                    value["stale"] = True
+                return value
+            result = _wait(key, value)
+            if result is not None:
+                return result
+    finally:
+        if spool and not handed_off:
+            _remove_spool(spool)
+
+def _remove_spool(path):
+    """Removes `path` if it is a spool file (inputs given as files are left alone)."""
+    if os.path.dirname(os.path.abspath(path)) != os.path.abspath(data_path("spool")):
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,40 +1,44 @@
 import sys
 import json
 import os
-import re
-from groq import Groq
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from modelRouter import complete_json
+from ndjsonInput import iter_ndjson
+from singleFlight import flight_key, single_flight, spool_input
+from promptBudget import PromptPacker, count_tokens
+from answerDedup import AnswerGroups
+from aiMetrics import finish_call, propagate, start_call, timed
+from promptBatches import batch_collapsed_submissions, batch_submissions, group_partials
 
-def extract_json(text):
-    """Extracts the first valid JSON object from a given text string."""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        return match.group(0)
-    return None
+# Token budget for the reviews in one strategy prompt; reviews past it are dropped
+STRATEGY_PROMPT_TOKENS = int(os.getenv("STRATEGY_PROMPT_TOKENS", 6000))
+# Collapse near-duplicate answers into one line with a count (STRATEGY_DEDUP=0 to list every review)
+STRATEGY_DEDUP = os.getenv("STRATEGY_DEDUP", "1") != "0"
+# Hierarchical mode: how many cohort digests may be requested at once
+STRATEGY_MAP_CONCURRENCY = int(os.getenv("STRATEGY_MAP_CONCURRENCY", 4))
 
-def analyze_cross_feedback(feedback_forms):
-    # Handle both old format (with 'questions') and new format (with 'responses')
-    formatted_feedback = ""
-    for i, form in enumerate(feedback_forms, 1):
-        formatted_feedback += f"\n### Customer Review {i} ###\n"
-        if 'responses' in form:
-            # New format: form has 'responses' array
-            for response in form['responses']:
-                question = response.get('question', '')
-                answer = response.get('answer', '')
-                formatted_feedback += f"- {question}: {answer}\n"
-        elif 'questions' in form:
-            # Old format: form has 'questions' array
-            formatted_feedback += "\n".join([f"- {q['question']}: {q['answer']}" for q in form['questions']])
-        formatted_feedback += "\n\n"
+NO_FEEDBACK_ERROR = "No feedback data provided"
 
-    prompt = f"""
-You are an expert product strategist specializing in product review analysis. Analyze the following customer product reviews and generate actionable business strategies focused on product improvement, customer satisfaction, and market positioning.
+STRATEGY_SYSTEM_PROMPT = (
+    "You are an expert product strategist. Analyze product reviews and generate actionable business strategies. "
+    "Always return valid JSON only."
+)
 
-The output **must be a valid JSON** following this exact structure. Focus on product-specific insights:
+# Digest issue counts -> the "metrics"/"tasks" entries they fill in the final schema
+ISSUE_COUNTS = {
+    "criticalIssues": ("metrics", {"label": "Critical Issues", "bgColor": "bg-red-100"}),
+    "highPriority": ("metrics", {"label": "High Priority", "bgColor": "bg-orange-100"}),
+    "improvementOpportunities": ("metrics", {"label": "Improvement Opportunities", "bgColor": "bg-blue-100"}),
+    "productImprovements": ("tasks", {"label": "Product Improvements", "actionType": "Enhancement", "iconColor": "bg-green-100"}),
+    "customerConcerns": ("tasks", {"label": "Customer Concerns", "actionType": "Address", "iconColor": "bg-yellow-100"}),
+}
 
-    JSON format:
-    {{
-        "summary": {{
+# The strategy schema the Node routes and front end expect
+STRATEGY_JSON_FORMAT = """    {
+        "summary": {
             "keyInsights": [
                 "Key insight 1 based on product reviews",
                 "Key insight 2 based on product reviews",
@@ -63,83 +67,143 @@ The output **must be a valid JSON** following this exact structure. Focus on pro
                 "High priority area 1",
                 "High priority area 2"
             ]
-        }},
+        },
         "strategies": [
-            {{
+            {
                 "id": 1,
                 "title": "Product Quality Enhancement",
                 "status": "ACTIVE",
                 "year": "2025",
                 "category": "product_improvement",
                 "actions": [
-                    {{
+                    {
                         "description": "Specific action based on reviews",
                         "completed": false,
                         "priority": "high"
-                    }}
+                    }
                 ]
-            }},
-            {{
+            },
+            {
                 "id": 2,
                 "title": "Pricing Strategy Optimization",
                 "status": "ACTIVE",
                 "year": "2025",
                 "category": "pricing",
                 "actions": [
-                    {{
+                    {
                         "description": "Action based on price feedback",
                         "completed": false,
                         "priority": "medium"
-                    }}
+                    }
                 ]
-            }},
-            {{
+            },
+            {
                 "id": 3,
                 "title": "Customer Experience Improvement",
                 "status": "ACTIVE",
                 "year": "2025",
                 "category": "customer_experience",
                 "actions": [
-                    {{
+                    {
                         "description": "Action to improve customer experience",
                         "completed": false,
                         "priority": "high"
-                    }}
+                    }
                 ]
-            }}
+            }
         ],
         "metrics": [
-            {{
+            {
                 "label": "Critical Issues",
                 "count": 0,
                 "bgColor": "bg-red-100"
-            }},
-            {{
+            },
+            {
                 "label": "High Priority",
                 "count": 0,
                 "bgColor": "bg-orange-100"
-            }},
-            {{
+            },
+            {
                 "label": "Improvement Opportunities",
                 "count": 0,
                 "bgColor": "bg-blue-100"
-            }}
+            }
         ],
         "tasks": [
-            {{
+            {
                 "label": "Product Improvements",
                 "count": 0,
                 "actionType": "Enhancement",
                 "iconColor": "bg-green-100"
-            }},
-            {{
+            },
+            {
                 "label": "Customer Concerns",
                 "count": 0,
                 "actionType": "Address",
                 "iconColor": "bg-yellow-100"
-            }}
+            }
         ]
-    }}
+    }"""
+
+def format_feedback(feedback_forms, packer):
+    """Yields the prompt text for one review at a time, with long answers truncated."""
+    # Handle both old format (with 'questions') and new format (with 'responses')
+    for i, form in enumerate(feedback_forms, 1):
+        lines = [f"\n### Customer Review {i} ###\n"]
+        if 'responses' in form:
+            # New format: form has 'responses' array
+            for response in form['responses']:
+                question = response.get('question', '')
+                answer = packer.truncate_answer(response.get('answer', ''))
+                lines.append(f"- {question}: {answer}\n")
+        elif 'questions' in form:
+            # Old format: form has 'questions' array
+            lines.append("\n".join([f"- {q['question']}: {packer.truncate_answer(q['answer'])}" for q in form['questions']]))
+        lines.append("\n\n")
+        yield "".join(lines)
+
+def collapse_feedback(feedback_forms, packer):
+    """
+    Returns the reviews' answers grouped by question with near-duplicates
+    collapsed into one line and a count, stopping once the packer's budget
+    is full (later reviews are counted as dropped).
+    """
+    groups = AnswerGroups(packer.truncate_answer)
+    for form in feedback_forms:
+        responses = form.get('responses') or form.get('questions') or []
+        if groups.submissions and groups.tokens >= packer.budget:
+            packer.skip(sum(count_tokens(f"- {r.get('question', '')}: {r.get('answer', '')}\n") for r in responses))
+            continue
+        groups.add_submission(responses)
+    text = groups.text()
+    packer.record(count_tokens(text), groups.submissions)
+    packer.collapsed_answers += groups.collapsed_answers()
+    return text
+
+def analyze_cross_feedback(feedback_forms):
+    # feedback_forms may be a list or a one-shot iterable such as an NDJSON stream
+    packer = PromptPacker(STRATEGY_PROMPT_TOKENS)
+    if STRATEGY_DEDUP:
+        formatted_feedback = collapse_feedback(feedback_forms, packer)
+    else:
+        for chunk in format_feedback(feedback_forms, packer):
+            packer.add(chunk)
+        formatted_feedback = packer.text()
+
+    json_data = request_strategy_json(strategy_prompt(formatted_feedback))
+    if isinstance(json_data, dict) and "error" not in json_data:
+        json_data["promptUsage"] = packer.usage()
+    return json_data
+
+def strategy_prompt(formatted_feedback):
+    """The single-prompt strategy analysis of already formatted feedback."""
+    return f"""
+You are an expert product strategist specializing in product review analysis. Analyze the following customer product reviews and generate actionable business strategies focused on product improvement, customer satisfaction, and market positioning.
+
+The output **must be a valid JSON** following this exact structure. Focus on product-specific insights:
+
+    JSON format:
+{STRATEGY_JSON_FORMAT}
 
     Analyze the product reviews focusing on:
     - Product quality, design, and functionality
@@ -155,63 +219,298 @@ The output **must be a valid JSON** following this exact structure. Focus on pro
     {formatted_feedback}
     """
 
+def request_strategy_json(prompt, temperature=0.4, task="strategy", required=("summary",)):
+    """
+    Sends one strategy prompt through the task's model cascade (modelRouter)
+    and returns the parsed JSON (or an error dict).
+    """
     api_key = os.getenv("GROQ_API")
     if not api_key:
         return {"error": "API key not found"}
 
     try:
-        client = Groq(api_key=api_key)
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an expert product strategist. Analyze product reviews and generate actionable business strategies. Always return valid JSON only."},
+        json_data, raw_response = complete_json(
+            task,
+            [
+                {"role": "system", "content": STRATEGY_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            model="llama-3.1-8b-instant",
-            temperature=0.4
+            temperature=temperature,
+            required=required
         )
 
-        # Debugging: only print if needed
-        # print("Raw AI Response:", chat_completion)
-
-        if not chat_completion.choices or len(chat_completion.choices) == 0:
+        if raw_response is None:
             return {"error": "No valid response from AI"}
-
-        raw_response = chat_completion.choices[0].message.content
-        
-        # Try to extract JSON
-        json_text = extract_json(raw_response)
-        if json_text:
-            try:
-                return json.loads(json_text)
-            except json.JSONDecodeError:
-                pass
         
-        # If extraction failed, try to parse the raw response directly
-        try:
-            return json.loads(raw_response)
-        except json.JSONDecodeError:
+        if json_data is None:
             return {"error": "AI did not return valid JSON", "raw_response": raw_response[:500]}
+        return json_data
 
     except json.JSONDecodeError:
         return {"error": "Invalid JSON output from AI"}
     except Exception as e:
         return {"error": f"AI API error: {str(e)}"}
 
+def iter_cohorts(feedback_forms, packer, cohort_key=None):
+    """
+    Splits feedback forms into cohorts that each fit in one digest prompt.
+
+    Yields (cohort_text, form_count). Forms are packed in order up to
+    STRATEGY_PROMPT_TOKENS, with near-duplicate answers collapsed unless
+    STRATEGY_DEDUP=0. With `cohort_key` (e.g. "formId"), only forms with the
+    same value for that key share a cohort; large groups still split.
+    """
+    if cohort_key:
+        groups = {}
+        for form in feedback_forms:
+            groups.setdefault(str(form.get(cohort_key)), []).append(form)
+        sources = groups.values()
+    else:
+        sources = [feedback_forms]
+
+    for forms in sources:
+        forms = ({"responses": form.get('responses') or form.get('questions') or []} for form in forms)
+        if STRATEGY_DEDUP:
+            yield from batch_collapsed_submissions(forms, STRATEGY_PROMPT_TOKENS, packer)
+        else:
+            yield from batch_submissions(format_feedback(forms, packer), STRATEGY_PROMPT_TOKENS, packer)
+
+def digest_json_format():
+    """Compact per-cohort structure used by the map and intermediate merge passes."""
+    return """{
+    "formCount": 0,
+    "customerSentiment": "positive/negative/mixed",
+    "keyInsights": ["Insight"],
+    "productStrengths": ["Strength"],
+    "productWeaknesses": ["Weakness"],
+    "priorityAreas": ["Area"],
+    "recommendations": ["Recommendation"],
+    "issueCounts": {
+        "criticalIssues": 0,
+        "highPriority": 0,
+        "improvementOpportunities": 0,
+        "productImprovements": 0,
+        "customerConcerns": 0
+    }
+}"""
+
+def summarize_cohort(cohort_text, form_count):
+    """Map step: condenses one cohort of feedback forms into a digest."""
+    prompt = f"""
+You are an expert product strategist. Below is one cohort of {form_count} customer feedback forms. Other cohorts are analyzed separately and merged later, so only describe THIS cohort.
+
+Feedback Data:
+{cohort_text}
+
+Return ONLY valid JSON in this format (issue counts must cover exactly these {form_count} forms; keep at most 5 items per list):
+
+{digest_json_format()}
+"""
+    digest = request_strategy_json(prompt, temperature=0.2, task="strategy_digest", required=("issueCounts",))
+    if isinstance(digest, dict) and "error" not in digest:
+        digest["formCount"] = form_count
+    return digest
+
+def sum_issue_counts(digests):
+    """Adds up the digests' issue counts."""
+    totals = dict.fromkeys(ISSUE_COUNTS, 0)
+    for digest in digests:
+        counts = digest.get("issueCounts") or {}
+        for key in ISSUE_COUNTS:
+            value = counts.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] += value
+    return totals
+
+def merge_digests_with_ai(digests):
+    """Intermediate reduce step: folds several cohort digests into one."""
+    prompt = f"""
+You are an expert product strategist. Merge the following digests of customer feedback cohorts into a single digest. Combine duplicate insights, keep the most important items, and weigh them by how many forms they cover.
+
+Digests:
+{json.dumps(digests)}
+
+Return ONLY valid JSON in this format:
+
+{digest_json_format()}
+"""
+    merged = request_strategy_json(prompt, temperature=0.2, task="strategy_merge", required=("issueCounts",))
+    if not isinstance(merged, dict) or "error" in merged:
+        return digests
+    # Counts are summed locally rather than trusted to the model
+    merged["formCount"] = sum(digest.get("formCount", 0) for digest in digests)
+    merged["issueCounts"] = sum_issue_counts(digests)
+    return [merged]
+
+def apply_issue_counts(strategy, totals):
+    """Overwrites the strategy's metrics/tasks counts with the summed digest counts."""
+    for key, (section, template) in ISSUE_COUNTS.items():
+        entries = strategy.get(section)
+        if not isinstance(entries, list):
+            entries = strategy[section] = []
+        entry = next((e for e in entries if isinstance(e, dict) and e.get("label") == template["label"]), None)
+        if entry is None:
+            entry = dict(template)
+            entries.append(entry)
+        entry["count"] = totals[key]
+    return strategy
+
+def reduce_digests(digests, total_forms):
+    """Reduce step: merges cohort digests into the full strategy schema."""
+    totals = sum_issue_counts(digests)
+    # Fold digests in groups until they fit in one prompt
+    while len(digests) > 1 and count_tokens(json.dumps(digests)) > STRATEGY_PROMPT_TOKENS:
+        groups = group_partials(digests, STRATEGY_PROMPT_TOKENS)
+        if len(groups) == len(digests):
+            break
+        with ThreadPoolExecutor(max_workers=STRATEGY_MAP_CONCURRENCY) as executor:
+            results = list(executor.map(
+                propagate(lambda group: group if len(group) == 1 else merge_digests_with_ai(group)),
+                groups
+            ))
+        merged = [digest for result in results for digest in result]
+        if len(merged) >= len(digests):
+            break
+        digests = merged
+
+    prompt = f"""
+You are an expert product strategist specializing in product review analysis. {total_forms} customer feedback forms were analyzed in cohorts. Merge the cohort digests below into one set of actionable business strategies focused on product improvement, customer satisfaction, and market positioning.
+
+Cohort Digests:
+{json.dumps(digests)}
+
+Combine duplicate insights, weigh them by how many forms they cover, and prioritize what recurs across cohorts.
+
+The output **must be a valid JSON** following this exact structure:
+
+{STRATEGY_JSON_FORMAT}
+"""
+    strategy = request_strategy_json(prompt)
+    if not isinstance(strategy, dict) or "error" in strategy:
+        return strategy
+    return apply_issue_counts(strategy, totals)
+
+def analyze_cross_feedback_hierarchical(feedback_forms, cohort_key=None):
+    """
+    Cross-form strategy over any number of forms.
+
+    Forms are split into cohorts (iter_cohorts) that are summarized into
+    digests concurrently, at most STRATEGY_MAP_CONCURRENCY at a time (the
+    model calls dominate, and the shared client keeps the rate limits), and
+    the digests are merged into the usual summary/strategies/metrics/tasks
+    schema. When everything fits in one cohort this is the same single
+    prompt as analyze_cross_feedback.
+    """
+    packer = PromptPacker(STRATEGY_PROMPT_TOKENS)
+    cohorts = iter_cohorts(feedback_forms, packer, cohort_key)
+    first = next(cohorts, None)
+    if first is None:
+        return {"error": NO_FEEDBACK_ERROR}
+    second = next(cohorts, None)
+    if second is None:
+        strategy = request_strategy_json(strategy_prompt(first[0]))
+        if isinstance(strategy, dict) and "error" not in strategy:
+            strategy["promptUsage"] = packer.usage()
+        return strategy
+
+    digests = []
+    failed_cohorts = 0
+    total_forms = 0
+
+    def collect(future):
+        nonlocal failed_cohorts
+        digest = future.result()
+        if isinstance(digest, dict) and "error" not in digest:
+            digests.append(digest)
+        else:
+            failed_cohorts += 1
+
+    summarize = propagate(summarize_cohort)
+    try:
+        with ThreadPoolExecutor(max_workers=STRATEGY_MAP_CONCURRENCY) as executor:
+            in_flight = deque()
+            for cohort_text, form_count in chain([first, second], cohorts):
+                total_forms += form_count
+                if len(in_flight) >= STRATEGY_MAP_CONCURRENCY:
+                    collect(in_flight.popleft())
+                in_flight.append(executor.submit(summarize, cohort_text, form_count))
+            while in_flight:
+                collect(in_flight.popleft())
+
+        if not digests:
+            return {"error": "AI failed to analyze any feedback cohort"}
+        strategy = reduce_digests(digests, total_forms)
+    except Exception as e:
+        return {"error": f"AI API error: {str(e)}"}
+
+    if isinstance(strategy, dict) and "error" not in strategy:
+        strategy["cohorts"] = {"forms": total_forms, "cohorts": len(digests) + failed_cohorts, "failedCohorts": failed_cohorts}
+        strategy["promptUsage"] = packer.usage()
+    return strategy
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a business strategy from feedback across forms")
+    parser.add_argument("input", nargs="?", help="JSON list of feedback forms, or a single form")
+    parser.add_argument("--ndjson", nargs="?", const="-", metavar="PATH",
+                        help="Read feedback forms as NDJSON from PATH (default: stdin)")
+    parser.add_argument("--hierarchical", action="store_true",
+                        help="Summarize cohorts of forms in parallel, then merge the digests")
+    parser.add_argument("--cohort-key", help="Form field to group cohorts by (hierarchical mode)")
+    parser.add_argument("--form-id",
+                        help="Lets a changed input be answered with the form's previous result (singleFlight)")
+    args = parser.parse_args()
+
+    metrics = start_call("analyze_cross_feedback")
     try:
-        input_data = json.loads(sys.argv[1])
-        
-        # Handle both single form and multiple forms
-        if isinstance(input_data, list):
-            if len(input_data) < 1:
-                print(json.dumps({"error": "No feedback data provided"}))
-                sys.exit(1)
-        elif isinstance(input_data, dict):
-            # Single form, wrap in list
-            input_data = [input_data]
-
-        analysis_result = analyze_cross_feedback(input_data)
-        print(json.dumps(analysis_result, indent=2))
+        spool = None
+        if args.ndjson:
+            # Hashed (and spooled, from stdin) up front so identical concurrent runs share one
+            with timed("parse"):
+                digest, spool = spool_input(args.ndjson)
+        else:
+            digest = args.input or ""
+
+        def run():
+            if spool:
+                # Streaming mode: one feedback form per line, read lazily
+                records = iter_ndjson(spool)
+                first = next(records, None)
+                if first is None:
+                    return {"error": NO_FEEDBACK_ERROR}
+                input_data = chain([first], records)
+            else:
+                with timed("parse"):
+                    input_data = json.loads(args.input)
+
+                # Handle both single form and multiple forms
+                if isinstance(input_data, list):
+                    if len(input_data) < 1:
+                        return {"error": NO_FEEDBACK_ERROR}
+                elif isinstance(input_data, dict):
+                    # Single form, wrap in list
+                    input_data = [input_data]
+
+            if args.hierarchical:
+                return analyze_cross_feedback_hierarchical(input_data, cohort_key=args.cohort_key)
+            return analyze_cross_feedback(input_data)
+
+        refresh_argv = None
+        if spool and args.form_id:
+            refresh_argv = [os.path.abspath(__file__), "--form-id", args.form_id, "--ndjson", spool]
+            if args.hierarchical:
+                refresh_argv.append("--hierarchical")
+            if args.cohort_key:
+                refresh_argv += ["--cohort-key", args.cohort_key]
+        analysis_result = single_flight(
+            flight_key("analyze_cross_feedback", digest, args.form_id or "", args.hierarchical, args.cohort_key or ""),
+            run,
+            scope=f"analyze_cross_feedback:{args.form_id}:{args.hierarchical}" if args.form_id else None,
+            refresh_argv=refresh_argv,
+            spool=spool
+        )
+        print(json.dumps(finish_call(metrics, analysis_result), indent=2))
+        if isinstance(analysis_result, dict) and analysis_result.get("error") == NO_FEEDBACK_ERROR:
+            sys.exit(1)
 
     except json.JSONDecodeError:
         print(json.dumps({"error": "Invalid JSON input"}))
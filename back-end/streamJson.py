@@ -0,0 +1,149 @@
+import json
+
+class ArrayItemParser:
+    """
+    Incremental JSON scanner that reports array elements as soon as they close.
+
+    Feed it the model's output chunk by chunk; whenever an object inside one
+    of the `keys` arrays of the top-level object is complete (e.g. each entry
+    of "followUpQuestions" or "questions"), `on_item(key, index, item)` is
+    called with the parsed element. Text before the first "{" (preambles,
+    code fences) is skipped. The scanner never backtracks, so the work per
+    chunk is proportional to the chunk's length. Only the text of a key or
+    element still being read is kept for scanning; `text` joins the chunks
+    into the full output.
+    """
+
+    def __init__(self, keys, on_item):
+        self.keys = set(keys)
+        self.on_item = on_item
+        self.chunks = []
+        # Unconsumed text; `offset` is its position in the full text
+        self.buffer = ""
+        self.offset = 0
+        self.position = 0
+        self.started = False
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.current_key = None
+        self.item_start = None
+        self.counts = {}
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self.chunks.append(chunk)
+        self.buffer += chunk
+        buffer, offset = self.buffer, self.offset
+        for i in range(self.position, offset + len(buffer)):
+            self._step(buffer[i - offset], i)
+        self.position = offset + len(buffer)
+        self._drop_consumed()
+
+    @property
+    def text(self):
+        """Everything fed so far."""
+        return "".join(self.chunks)
+
+    def _slice(self, start, end):
+        return self.buffer[start - self.offset:end - self.offset]
+
+    def _drop_consumed(self):
+        keep = self.position
+        if self.in_string:
+            keep = min(keep, self.string_start)
+        if self.last_string:
+            keep = min(keep, self.last_string[0])
+        if self.item_start is not None:
+            keep = min(keep, self.item_start)
+        self.buffer = self.buffer[keep - self.offset:]
+        self.offset = keep
+
+    def _step(self, char, i):
+
+        if self.in_string:
+            if self.escaped:
+                self.escaped = False
+            elif char == "\\":
+                self.escaped = True
+            elif char == '"':
+                self.in_string = False
+                self.last_string = (self.string_start, i + 1)
+            return
+
+        if not self.started:
+            if char == "{":
+                self.started = True
+                self.stack.append(("{", None))
+            return
+        if not self.stack:
+            # Top-level value already closed; ignore trailing text
+            return
+
+        if char == '"':
+            self.in_string = True
+            self.string_start = i
+        elif char == ":":
+            if self.last_string and self.stack[-1][0] == "{":
+                try:
+                    self.current_key = json.loads(self._slice(*self.last_string))
+                except json.JSONDecodeError:
+                    self.current_key = None
+                # The key is read; don't hold on to its text while the value streams
+                self.last_string = None
+        elif char in "{[":
+            parent = self.stack[-1]
+            key = self.current_key if parent[0] == "{" else None
+            if char == "{" and self._in_target_array():
+                self.item_start = i
+            self.stack.append((char, key))
+            self.current_key = None
+        elif char in "}]":
+            closed = self.stack.pop()
+            if closed[0] == "{" and self.item_start is not None and self._in_target_array():
+                self._emit(self._slice(self.item_start, i + 1))
+                self.item_start = None
+        elif char == ",":
+            self.current_key = None
+            self.last_string = None
+
+    def _in_target_array(self):
+        return (
+            len(self.stack) == 2
+            and self.stack[1][0] == "["
+            and self.stack[1][1] in self.keys
+        )
+
+    def _emit(self, item_text):
+        key = self.stack[1][1]
+        try:
+            item = json.loads(item_text)
+        except json.JSONDecodeError:
+            return
+        index = self.counts.get(key, 0)
+        self.counts[key] = index + 1
+        self.on_item(key, index, item)
+
+def collect_stream(chunks, keys, on_item):
+    """Feeds streamed text chunks through an ArrayItemParser and returns the full text."""
+    parser = ArrayItemParser(keys, on_item)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.text
+
+def ndjson_emitter(stream):
+    """Returns an on_item callback that writes {"type": "item", ...} lines to `stream`."""
+    def emit(key, index, item):
+        stream.write(json.dumps({"type": "item", "key": key, "index": index, "item": item}) + "\n")
+        stream.flush()
+    return emit
+
+def ndjson_reset(stream):
+    """Returns an on_reset callback that writes a {"type": "reset"} line (drop the items so far) to `stream`."""
+    def reset():
+        stream.write(json.dumps({"type": "reset"}) + "\n")
+        stream.flush()
+    return reset
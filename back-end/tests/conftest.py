@@ -0,0 +1,51 @@
+"""
+Shared setup for the AI script tests.
+
+The scripts read most settings from the environment at import time, so
+they are pinned here before any test module imports them: no rate limits,
+no response cache. Every test gets its own AI_DATA_DIR, and model calls go
+to the fake Groq server from bench/fakeGroq.py.
+
+    cd back-end && python -m pytest -q
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "bench"))
+
+os.environ.update({
+    "GROQ_RPM": "0",
+    "GROQ_TPM": "0",
+    "GROQ_MAX_RETRIES": "0",
+    "AI_CACHE": "0",
+    "AI_SINGLE_FLIGHT": "1",
+    "AI_METRICS_FILE": ""
+})
+
+import pytest
+import aiSettings
+import groqClient
+from fakeGroq import start_server
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Keeps each test's queues, stores and counters in its own directory."""
+    monkeypatch.setattr(aiSettings, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture(scope="session")
+def fake_server():
+    server, fake, url = start_server()
+    yield fake, url
+    server.shutdown()
+
+@pytest.fixture
+def fake_groq(fake_server, monkeypatch):
+    """Points the Groq client at the fake server; returns the FakeGroq for its stats."""
+    fake, url = fake_server
+    monkeypatch.setenv("GROQ_API", "test")
+    monkeypatch.setenv("GROQ_BASE_URL", url)
+    monkeypatch.setattr(groqClient, "_client", None)
+    return fake
@@ -0,0 +1,58 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from aiWorker import JsonLineChannel, handle_request
+
+QUESTION = {"questionId": "q1", "question": "What do you think of the price?", "inputType": "text"}
+
+def _serve(*lines):
+    reader = io.StringIO("".join(line + "\n" for line in lines))
+    writer = io.StringIO()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        JsonLineChannel(reader, writer, executor).serve()
+    return [json.loads(line) for line in writer.getvalue().splitlines()]
+
+def test_handle_request_runs_the_task():
+    response = handle_request({"id": "1", "task": "ping", "payload": None})
+    assert response["id"] == "1"
+    assert response["result"] == "pong"
+
+def test_unknown_task_and_non_object_requests():
+    assert handle_request({"id": "2", "task": "nope"}) == {"id": "2", "error": "Unknown task: nope"}
+    assert handle_request(["ping"]) == {"id": None, "error": "Request must be a JSON object"}
+
+def test_task_errors_come_back_as_error_dicts():
+    response = handle_request({"id": "3", "task": "generate_followup_questions", "payload": "not a dict"})
+    assert response["result"] == {"error": "Missing input data"}
+
+def test_channel_answers_every_line_by_id():
+    responses = _serve(
+        json.dumps({"id": "a", "task": "ping"}),
+        "",
+        "{not json",
+        json.dumps({"id": "b", "task": "missing"})
+    )
+    by_id = {response["id"]: response for response in responses}
+    assert len(responses) == 3
+    assert by_id["a"]["result"] == "pong"
+    assert by_id["b"]["error"] == "Unknown task: missing"
+    assert by_id[None] == {"id": None, "error": "Invalid JSON request"}
+
+def test_streamed_followups_send_partials_before_the_result(fake_groq):
+    payload = {"question": QUESTION, "answer": "It feels a little expensive for what it does", "allResponses": []}
+    responses = _serve(json.dumps({"id": "s", "task": "generate_followup_questions", "payload": payload, "stream": True}))
+
+    *partials, final = responses
+    questions = final["result"]["followUpQuestions"]
+    assert partials == [
+        {"id": "s", "partial": {"key": "followUpQuestions", "index": i, "item": question}}
+        for i, question in enumerate(questions)
+    ]
+    assert questions[0]["questionId"] == "f1"
+    assert fake_groq.snapshot()["requests"] >= 1
+
+def test_unstreamed_request_gets_only_the_result(fake_groq):
+    payload = {"question": QUESTION, "answer": "Honestly the shipping took far too long", "allResponses": []}
+    responses = _serve(json.dumps({"id": "u", "task": "generate_followup_questions", "payload": payload}))
+    assert len(responses) == 1
+    assert responses[0]["result"]["followUpQuestions"][0]["questionId"] == "f1"
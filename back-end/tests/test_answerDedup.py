@@ -0,0 +1,44 @@
+from answerDedup import AnswerDeduplicator, AnswerGroups, meaning_key, normalize_text
+
+def _collapse(answers):
+    dedup = AnswerDeduplicator()
+    for answer in answers:
+        dedup.add(answer)
+    return dedup.collapsed()
+
+def test_near_duplicates_share_a_group():
+    collapsed = _collapse(["Great product", "great product!!", "GREAT PRODUCT", "Great produkt", "Runs small"])
+    assert collapsed == [("Great product", 4), ("Runs small", 1)]
+
+def test_negated_answers_are_not_merged_into_their_opposite():
+    answers = ["I would recommend this to friends"] * 5 + ["I would not recommend this to friends"] * 3
+    groups = AnswerGroups()
+    for answer in answers:
+        groups.add_submission([{"question": "Would you recommend us?", "answer": answer}])
+
+    text = groups.text()
+    assert '"I would recommend this to friends" x5' in text
+    assert '"I would not recommend this to friends" x3' in text
+    assert groups.collapsed_answers() == 6
+
+def test_contracted_negation_is_kept_apart():
+    collapsed = _collapse(["I would recommend this to friends", "I wouldn't recommend this to friends"])
+    assert len(collapsed) == 2
+
+def test_opposite_polarity_is_kept_apart():
+    assert meaning_key("The fit is good") != meaning_key("The fit is bad")
+    collapsed = _collapse(["Sizing was good overall", "Sizing was bad overall"])
+    assert len(collapsed) == 2
+
+def test_meaning_key():
+    assert meaning_key("I don't like it") == (("dont",), -1)
+    assert meaning_key("Great!") == ((), 1)
+    assert meaning_key("It arrived on Tuesday") == ((), 0)
+
+def test_empty_answers_are_skipped():
+    dedup = AnswerDeduplicator()
+    assert dedup.add("  ...  ") == (None, False)
+    assert dedup.collapsed() == []
+
+def test_normalize_text():
+    assert normalize_text("  Sooooo   GOOD!!! ") == "soo good"
@@ -0,0 +1,20 @@
+import pytest
+import answerDedup, followUpCache, followUpRules, formAnalytics, formIndex, reportStats, rollupStore
+from answerText import normalize_answer
+
+@pytest.mark.parametrize("answer, key", [
+    ("  Too   HIGH!! ", "too high"),
+    ("Very-Good", "very good"),
+    ("very good.", "very good"),
+    ("$50-75", "$50 75"),
+    ("Above $150", "above $150"),
+    (4, "4"),
+    ("...", "")
+])
+def test_normalize_answer(answer, key):
+    assert normalize_answer(answer) == key
+
+def test_every_module_shares_it():
+    for module in (followUpCache, followUpRules, formAnalytics, formIndex, reportStats, rollupStore):
+        assert module.normalize_answer is normalize_answer
+    assert answerDedup.normalize_text("Sooooo-GOOD!!") == "soo good"
@@ -0,0 +1,66 @@
+import pytest
+import followUpCache
+from aiCounters import read_counters
+from followUpCache import clear_form, get_cached_followups, is_cacheable, store_followups
+from generateFollowUp import generate_followup_questions
+
+QUESTION = {"questionId": "q1", "question": "How was the fit?", "inputType": "radio"}
+RESULT = {"followUpQuestions": [{"questionId": "q1_f1", "question": "What would fit better?"}], "source": "model"}
+CONTEXT = [{"question": "Name", "answer": "Sam"}]
+
+def _counts():
+    counters = read_counters("followup_cache.")
+    return counters.get("followup_cache.hits", 0), counters.get("followup_cache.misses", 0)
+
+def test_miss_then_hit_on_the_normalized_answer():
+    hits, misses = _counts()
+    assert get_cached_followups("form-1", QUESTION, "Runs small") is None
+    store_followups("form-1", QUESTION, "Runs small", RESULT)
+
+    cached = get_cached_followups("form-1", QUESTION, "  RUNS small!", CONTEXT)
+    assert cached == {"followUpQuestions": RESULT["followUpQuestions"], "source": "cache"}
+    assert _counts() == (hits + 1, misses + 1)
+
+def test_entries_are_scoped_to_form_and_question():
+    store_followups("form-1", QUESTION, "Runs small", RESULT)
+    assert get_cached_followups("form-2", QUESTION, "Runs small") is None
+    assert get_cached_followups("form-1", {**QUESTION, "questionId": "q2"}, "Runs small") is None
+    assert get_cached_followups(None, QUESTION, "Runs small") is None
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    store_followups("form-1", QUESTION, "Runs small", RESULT)
+    monkeypatch.setattr(followUpCache, "CACHE_TTL_SECONDS", -1)
+    assert get_cached_followups("form-1", QUESTION, "Runs small") is None
+
+def test_failed_results_are_not_stored():
+    store_followups("form-1", QUESTION, "Runs small", {"error": "AI API error"})
+    store_followups("form-1", QUESTION, "Runs small", {"followUpQuestions": []})
+    assert get_cached_followups("form-1", QUESTION, "Runs small") is None
+
+def test_clear_form():
+    store_followups("form-1", QUESTION, "Runs small", RESULT)
+    clear_form("form-1")
+    assert get_cached_followups("form-1", QUESTION, "Runs small") is None
+
+@pytest.mark.parametrize("policy, question, context, cacheable", [
+    ("choice", QUESTION, CONTEXT, True),
+    ("choice", {**QUESTION, "inputType": "text"}, None, False),
+    ("no-context", {**QUESTION, "inputType": "text"}, None, True),
+    ("no-context", QUESTION, CONTEXT, False),
+    ("always", {**QUESTION, "inputType": "textarea"}, CONTEXT, True),
+    ("off", QUESTION, None, False)
+])
+def test_policies(policy, question, context, cacheable):
+    assert is_cacheable(question, "Runs small", context, policy) is cacheable
+
+def test_multi_select_answers_are_never_cached():
+    assert not is_cacheable(QUESTION, ["a", "b"], policy="always")
+
+def test_second_identical_answer_skips_the_model(fake_groq):
+    requests = fake_groq.snapshot()["requests"]
+    first = generate_followup_questions(QUESTION, "Runs a bit small", [], form_id="form-1")
+    second = generate_followup_questions(QUESTION, "runs a bit small.", CONTEXT, form_id="form-1")
+
+    assert fake_groq.snapshot()["requests"] == requests + 1
+    assert second["source"] == "cache"
+    assert second["followUpQuestions"] == first["followUpQuestions"]
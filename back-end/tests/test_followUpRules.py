@@ -0,0 +1,82 @@
+import json
+import os
+import pytest
+import followUpRules
+from aiSettings import data_path
+from followUpRules import get_rule_table, match_followup_rules, rule_stats
+
+PRICE = {"questionId": "q1", "question": "How do you feel about the price?", "inputType": "radio"}
+
+@pytest.fixture(autouse=True)
+def fresh_tables(monkeypatch):
+    monkeypatch.setattr(followUpRules, "_compiled", followUpRules.OrderedDict())
+
+def _write_rules(config):
+    path = data_path("followup_rules.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+def test_default_rule_matches_normalized_choice():
+    result = match_followup_rules(PRICE, "  Too HIGH! ")
+    assert result["source"] == "rule"
+    assert result["rule"] == "price_high"
+    follow_up = result["followUpQuestions"][0]
+    assert follow_up["questionId"] == "q1_f1"
+    assert follow_up["options"] == followUpRules.PRICE_RANGES
+
+def test_free_text_and_other_answers_miss():
+    assert match_followup_rules(PRICE, "It is too high for what you get") is None
+    assert match_followup_rules({**PRICE, "inputType": "text"}, "Too high") is None
+    assert match_followup_rules(PRICE, ["Too high"]) is None
+    assert match_followup_rules(PRICE, None) is None
+
+def test_hits_and_misses_are_counted():
+    before = rule_stats()
+    match_followup_rules(PRICE, "Excellent")
+    match_followup_rules(PRICE, "Something else")
+    after = rule_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+    assert after["byRule"]["positive"] - before["byRule"].get("positive", 0) == 1
+
+def test_inline_contains_rule_with_question_pattern():
+    rules = [{
+        "name": "shipping",
+        "answers": ["late"],
+        "match": "contains",
+        "questionPattern": "deliver",
+        "followUpQuestions": [{"question": "How late was it?"}]
+    }]
+    question = {"questionId": "q2", "question": "How was delivery?", "inputType": "text"}
+    assert match_followup_rules(question, "It came late again", rules=rules)["rule"] == "shipping"
+    # Whole words only
+    assert match_followup_rules(question, "Arrived in a latex bag", rules=rules) is None
+    assert match_followup_rules(PRICE, "late", rules=rules) is None
+
+def test_form_rules_come_before_defaults_and_can_drop_them():
+    _write_rules({"forms": {
+        "form-1": {"rules": [{"name": "mine", "answers": ["too high"], "followUpQuestions": [{"question": "Why?"}]}]},
+        "form-2": {"inheritDefaults": False, "rules": []}
+    }})
+    assert match_followup_rules(PRICE, "Too high", form_id="form-1")["rule"] == "mine"
+    assert match_followup_rules(PRICE, "Too high", form_id="form-2") is None
+    assert match_followup_rules(PRICE, "Too high", form_id="other")["rule"] == "price_high"
+
+def test_table_is_recompiled_when_the_file_changes():
+    path = _write_rules({"forms": {"form-1": {"inheritDefaults": False, "rules": []}}})
+    assert get_rule_table("form-1") == []
+    _write_rules({"forms": {"form-1": {"inheritDefaults": False, "rules": [
+        {"name": "new", "answers": ["ok"], "followUpQuestions": [{"question": "Why?"}]}
+    ]}}})
+    os.utime(path, (1, 1))
+    assert [rule.name for rule in get_rule_table("form-1")] == ["new"]
+
+def test_compiled_tables_are_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(followUpRules, "RULE_TABLE_ENTRIES", 2)
+    first = get_rule_table("a")
+    get_rule_table("b")
+    assert get_rule_table("a") is first
+    get_rule_table("c")
+    assert list(followUpRules._compiled) == [("a", None), ("c", None)]
+    assert get_rule_table("a") is first
@@ -0,0 +1,70 @@
+import numpy as np
+from formAnalytics import SubmissionColumns, form_analytics, parse_timestamps
+
+FORM = {"questions": [
+    {"questionId": "q1", "question": "Quality?", "inputType": "radio", "options": ["Good", "Poor"]},
+    {"questionId": "q2", "question": "Size?", "inputType": "select", "options": ["Small", "Large"]},
+    {"questionId": "q3", "question": "Colors?", "inputType": "checkbox", "options": ["Red", "Blue"]},
+    {"questionId": "q4", "question": "Comments", "inputType": "textarea"}
+]}
+
+def _submission(quality, size, colors=(), completed_at=None):
+    responses = [
+        {"questionId": "q1", "answer": quality},
+        {"questionId": "q2", "answer": size},
+        {"questionId": "q3", "answer": list(colors)}
+    ]
+    return {"completedAt": completed_at, "responses": responses}
+
+SUBMISSIONS = [
+    _submission("Good", "Small", ["Red"]),
+    _submission("good", "Large", ["Red", "Blue"]),
+    _submission("Poor", "Small", ["Blue"]),
+    _submission("Good", "Small"),
+    _submission("Poor", None)
+]
+
+def test_crosstab_of_single_choice_questions():
+    columns = SubmissionColumns(FORM).observe_many(SUBMISSIONS)
+    assert columns.crosstab("q1", "q2") == {
+        "rows": ["Good", "Poor"], "columns": ["Small", "Large"], "counts": [[2, 1], [1, 0]]
+    }
+
+def test_crosstab_with_a_multi_select_question():
+    columns = SubmissionColumns(FORM).observe_many(SUBMISSIONS)
+    assert columns.crosstab("q1", "q3")["counts"] == [[2, 1], [0, 1]]
+    assert columns.crosstab("q3", "q3")["counts"] == [[2, 1], [1, 2]]
+
+def test_form_analytics_adds_requested_crosstabs():
+    result = form_analytics(FORM, SUBMISSIONS, crosstabs=[("q1", "q2")])
+    assert result["crosstabs"] == [
+        {"questionIds": ["q1", "q2"], "rows": ["Good", "Poor"], "columns": ["Small", "Large"], "counts": [[2, 1], [1, 0]]}
+    ]
+    assert "crosstabs" not in form_analytics(FORM, SUBMISSIONS)
+
+def test_crosstab_of_a_text_question_is_an_error():
+    assert "error" in form_analytics(FORM, SUBMISSIONS, crosstabs=[("q1", "q4")])
+    assert "error" in form_analytics(FORM, SUBMISSIONS, crosstabs=[("q1",)])
+
+def test_parse_timestamps():
+    values = ["2024-03-01T12:00:00Z", "2024-03-01T12:00:00.500Z", 1709294400000, None, "", "not a date"]
+    assert parse_timestamps(values).tolist() == [1709294400, 1709294400, 1709294400, -1, -1, -1]
+
+def test_parse_timestamps_applies_utc_offsets():
+    assert parse_timestamps(["2024-03-01T14:00:00+02:00", "2024-03-01T12:00:00"]).tolist() == [1709294400] * 2
+
+def test_trend_counts_per_bucket_including_empty_ones():
+    submissions = [
+        _submission("Good", "Small", completed_at="2024-03-01T10:00:00Z"),
+        _submission("Good", "Small", completed_at="2024-03-01T18:00:00Z"),
+        _submission("Poor", "Small", completed_at="2024-03-03T09:00:00Z"),
+        _submission("Poor", "Small")
+    ]
+    columns = SubmissionColumns(FORM).observe_many(submissions)
+    assert columns.trend("day") == [
+        {"date": "2024-03-01", "value": 2}, {"date": "2024-03-02", "value": 0}, {"date": "2024-03-03", "value": 1}
+    ]
+    poor = columns.answered("q1", "poor")
+    assert poor.tolist() == [False, False, True, True]
+    assert [point["value"] for point in columns.trend("day", mask=poor)] == [0, 0, 1]
+    assert np.array_equal(columns.timestamps() >= 0, [True, True, True, False])
@@ -0,0 +1,51 @@
+from formIndex import FormIndex, form_key, template_form, text_terms
+
+FORM = {"title": "Shoe feedback", "questions": [{"questionId": "q1", "question": "How do they fit?"}]}
+DESCRIPTIONS = [
+    "Nike wants feedback on their new shoe line",
+    "Restaurant dining experience for our Italian bistro",
+    "Hotel stay satisfaction"
+]
+
+def _index():
+    index = FormIndex()
+    for description in DESCRIPTIONS:
+        index.add(form_key(description), "generated", description, FORM)
+    return index
+
+def test_reworded_description_finds_the_earlier_form():
+    match = _index().lookup("feedback for Nike's new shoes")
+    assert match["key"] == form_key(DESCRIPTIONS[0])
+    assert match["source"] == "generated"
+    assert match["form"] == FORM
+    assert match["similarity"] >= 0.7
+
+def test_unrelated_description_does_not_match():
+    index = _index()
+    assert index.lookup("car dealership service") is None
+    # A related but different business stays under the default threshold
+    assert index.lookup("Italian restaurant dinner") is None
+    assert index.lookup("Italian restaurant dinner", threshold=0.5)["key"] == form_key(DESCRIPTIONS[1])
+
+def test_filler_words_and_plurals_are_ignored():
+    assert text_terms("Nike shoes feedback form") == text_terms("the nike shoe survey")
+    assert text_terms("feedback form for our customers") == {}
+
+def test_other_index_picks_up_changes_on_sync():
+    writer = _index()
+    reader = FormIndex()
+    assert reader.lookup("Hotel stay satisfaction")["similarity"] == 1.0
+
+    writer.remove(form_key(DESCRIPTIONS[2]))
+    assert reader.lookup("Hotel stay satisfaction") is None
+    writer.add("template:t1", "template", "Hotel guest satisfaction", FORM)
+    assert reader.lookup("Hotel stay satisfaction")["key"] == "template:t1"
+
+def test_template_form_maps_fields():
+    form = template_form({"title": "Contact", "fields": [
+        {"question": "Phone", "inputType": "tel", "required": True},
+        {"question": "Rating", "inputType": "radio", "options": ["1", "2"]}
+    ]})
+    assert [question["inputType"] for question in form["questions"]] == ["text", "radio"]
+    assert form["questions"][0]["required"] is True
+    assert form["questions"][1]["options"] == ["1", "2"]
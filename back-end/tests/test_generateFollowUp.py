@@ -0,0 +1,27 @@
+from generateFollowUp import generate_followup_batch
+
+PRICE = {"questionId": "q1", "question": "How do you feel about the price?", "inputType": "radio"}
+FIT = {"questionId": "q2", "question": "How was the fit?", "inputType": "text"}
+
+def test_malformed_items_are_skipped(fake_groq):
+    result = generate_followup_batch(
+        ["not an item", None, {"question": "not a dict"}, {"question": PRICE, "answer": "Too high"}], []
+    )
+    assert list(result["followUps"]) == ["q1"]
+    assert result["followUps"]["q1"]["source"] == "rule"
+
+def test_rule_hits_skip_the_model(fake_groq):
+    requests = fake_groq.snapshot()["requests"]
+    result = generate_followup_batch([{"question": PRICE, "answer": "Too high"}], [])
+    assert result["followUps"]["q1"]["rule"] == "price_high"
+    assert fake_groq.snapshot()["requests"] == requests
+
+def test_misses_go_to_the_model(fake_groq):
+    result = generate_followup_batch(
+        [{"question": PRICE, "answer": "Too high"}, {"question": FIT, "answer": "The sleeves ran long"}], [], form_id="form-1"
+    )
+    assert set(result["followUps"]) == {"q1", "q2"}
+    assert result["followUps"]["q2"]["followUpQuestions"]
+
+def test_empty_batch():
+    assert generate_followup_batch([], []) == {"followUps": {}}
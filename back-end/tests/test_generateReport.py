@@ -0,0 +1,94 @@
+from generateReport import _track_new_submissions, generate_incremental_report
+from reportStore import load_report_state
+
+FORM = {
+    "title": "Shoes",
+    "questions": [
+        {"questionId": "q1", "question": "Quality?", "inputType": "radio", "options": ["Excellent", "Good", "Average", "Poor"]},
+        {"questionId": "q2", "question": "Rate us", "inputType": "rating", "options": ["1", "2", "3", "4", "5"]},
+        {"questionId": "q3", "question": "Anything else?", "inputType": "text"}
+    ]
+}
+
+def _submission(number, day, grade="Good", rating="4"):
+    return {
+        "_id": f"s{number}",
+        "completedAt": f"2026-03-{day:02d}T10:00:00.000Z",
+        "responses": [
+            {"questionId": "q1", "question": "Quality?", "answer": grade},
+            {"questionId": "q2", "question": "Rate us", "answer": rating},
+            {"questionId": "q3", "question": "Anything else?", "answer": "Love the comfort"}
+        ]
+    }
+
+def _requests(fake):
+    return fake.snapshot()["requests"]
+
+def test_first_run_stores_the_report_and_its_high_water_mark(fake_groq):
+    # route.js sends submissions newest first
+    submissions = [_submission(number, day=10 - number) for number in range(5)]
+    report = generate_incremental_report("form-1", FORM, submissions)
+
+    assert "error" not in report
+    assert report["executiveSummary"]["totalSubmissions"] == 5
+    state = load_report_state("form-1")
+    assert state["submissionCount"] == 5
+    assert state["lastCompletedAt"] == "2026-03-10T10:00:00.000Z"
+    assert state["submissionIds"] == {f"s{number}" for number in range(5)}
+    assert state["totals"]["responseDistribution"]["Quality?"]["good"] == 5
+
+def test_later_run_merges_only_new_submissions(fake_groq):
+    submissions = [_submission(number, day=10 - number) for number in range(5)]
+    generate_incremental_report("form-1", FORM, submissions)
+    before = _requests(fake_groq)
+
+    # One newer submission and one completed at the same time as the newest stored one
+    newer = [_submission(6, day=11, grade="Poor", rating="1"), _submission(5, day=10, grade="Excellent", rating="5")]
+    report = generate_incremental_report("form-1", FORM, newer + submissions)
+
+    # A report on the two new submissions, then the merge prompt
+    assert _requests(fake_groq) - before == 2
+    assert report["executiveSummary"]["totalSubmissions"] == 7
+    assert report["statistics"]["responseDistribution"]["Quality?"] == {"excellent": 1, "good": 5, "average": 0, "poor": 1}
+    assert report["statistics"]["responseDistribution"]["Rate us"] == {"excellent": 1, "good": 5, "average": 0, "poor": 1}
+    state = load_report_state("form-1")
+    assert state["submissionCount"] == 7
+    assert state["lastCompletedAt"] == "2026-03-11T10:00:00.000Z"
+    assert {"s5", "s6"} <= state["submissionIds"]
+
+def test_run_without_new_submissions_serves_the_stored_report(fake_groq):
+    submissions = [_submission(number, day=10 - number) for number in range(3)]
+    first = generate_incremental_report("form-1", FORM, submissions)
+    before = _requests(fake_groq)
+
+    again = generate_incremental_report("form-1", FORM, submissions)
+    assert _requests(fake_groq) == before
+    assert again == first
+    assert load_report_state("form-1")["submissionCount"] == 3
+
+def test_failed_update_keeps_the_stored_report(fake_groq, monkeypatch):
+    submissions = [_submission(number, day=10 - number) for number in range(3)]
+    first = generate_incremental_report("form-1", FORM, submissions)
+    monkeypatch.setattr("generateReport.merge_reports", lambda *args: {"error": "AI failed"})
+
+    report = generate_incremental_report("form-1", FORM, [_submission(3, day=11)] + submissions)
+    assert report == first
+    assert load_report_state("form-1")["submissionCount"] == 3
+
+def test_submissions_without_ids_fall_back_to_timestamps():
+    state = {"lastCompletedAt": "2026-03-10T10:00:00.000Z", "submissionIds": set(), "submissionCount": 2}
+    progress = {"lastCompletedAt": None, "newSubmissions": 0, "submissionIds": []}
+    submissions = [
+        {"completedAt": "2026-03-11T10:00:00.000Z"},
+        {"completedAt": "2026-03-10T10:00:00.000Z"},
+        {"completedAt": "2026-03-09T10:00:00.000Z"}
+    ]
+    assert list(_track_new_submissions(submissions, state, progress)) == submissions[:1]
+    assert progress["lastCompletedAt"] == "2026-03-11T10:00:00.000Z"
+
+def test_submissions_without_ids_or_timestamps_are_taken_newest_first():
+    state = {"lastCompletedAt": None, "submissionIds": set(), "submissionCount": 3}
+    progress = {"lastCompletedAt": None, "newSubmissions": 0, "submissionIds": []}
+    submissions = [{"number": number} for number in range(5)]
+    assert list(_track_new_submissions(submissions, state, progress)) == submissions[:2]
+    assert progress["newSubmissions"] == 2
@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import aiWorker
+import jobQueue
+from jobQueue import claim_job, enqueue_job, finish_job, get_job, recover_jobs, renew_lease
+
+@pytest.fixture
+def urgent_class(monkeypatch):
+    monkeypatch.setitem(jobQueue.JOB_CLASSES, "urgent", {"priority": -1, "concurrency": 1, "deadline": 30})
+
+def test_higher_priority_class_is_claimed_first(urgent_class):
+    report = enqueue_job("generate_ai_report", {"formId": "f1"})
+    urgent = enqueue_job("analyze_feedback", {}, job_class="urgent")
+
+    job = claim_job("worker-1")
+    assert job["id"] == urgent
+    assert job["jobClass"] == "urgent"
+    assert claim_job("worker-1")["id"] == report
+
+def test_every_task_defaults_to_the_batch_class():
+    job_id = enqueue_job("generate_followup_questions", {"question": "q"})
+    assert get_job(job_id)["jobClass"] == "batch"
+    with pytest.raises(ValueError):
+        enqueue_job("generate_followup_questions", {}, job_class="interactive")
+
+def test_batch_class_concurrency_is_shared_across_workers(monkeypatch):
+    monkeypatch.setitem(jobQueue.JOB_CLASSES["batch"], "concurrency", 1)
+    first = enqueue_job("generate_ai_report", {"formId": "f1"})
+    enqueue_job("analyze_cross_feedback", {})
+
+    assert claim_job("worker-1")["id"] == first
+    assert claim_job("worker-2") is None
+    finish_job(first, {"ok": True})
+    assert claim_job("worker-2")["task"] == "analyze_cross_feedback"
+
+def test_job_past_its_deadline_expires_instead_of_running():
+    job_id = enqueue_job("generate_followup_questions", {}, deadline_seconds=0.01)
+    time.sleep(0.05)
+
+    assert claim_job("worker-1") is None
+    assert get_job(job_id)["status"] == "queued"
+    recover_jobs()
+    job = get_job(job_id)
+    assert job["status"] == "expired"
+    assert "Deadline" in job["error"]
+
+def test_job_is_requeued_when_its_lease_runs_out(monkeypatch):
+    job_id = enqueue_job("generate_ai_report", {})
+    monkeypatch.setattr(jobQueue, "LEASE_SECONDS", -1)
+    assert claim_job("worker-1")["id"] == job_id
+
+    # worker-1 stopped renewing; once recovered, worker-2 takes the job over
+    monkeypatch.setattr(jobQueue, "LEASE_SECONDS", 60)
+    assert claim_job("worker-2") is None
+    recover_jobs()
+    assert claim_job("worker-2")["id"] == job_id
+    assert renew_lease(job_id, "worker-2")
+    assert not renew_lease(job_id, "worker-1")
+
+def test_job_fails_after_max_attempts(monkeypatch):
+    job_id = enqueue_job("generate_ai_report", {})
+    monkeypatch.setattr(jobQueue, "LEASE_SECONDS", -1)
+    for attempt in range(jobQueue.MAX_ATTEMPTS):
+        recover_jobs()
+        assert claim_job(f"worker-{attempt}")["id"] == job_id
+
+    recover_jobs()
+    assert claim_job("worker-last") is None
+    job = get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Worker stopped responding"
+
+def test_renewed_lease_keeps_the_job():
+    job_id = enqueue_job("generate_ai_report", {})
+    claim_job("worker-1")
+    assert renew_lease(job_id, "worker-1")
+    assert claim_job("worker-2") is None
+    assert get_job(job_id)["status"] == "running"
+
+def test_finish_job_stores_result():
+    job_id = enqueue_job("generate_ai_report", {})
+    claim_job("worker-1")
+    finish_job(job_id, {"executiveSummary": {}})
+
+    job = get_job(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"executiveSummary": {}}
+    assert not renew_lease(job_id, "worker-1")
+
+def test_error_result_fails_the_job():
+    job_id = enqueue_job("generate_ai_report", {})
+    claim_job("worker-1")
+    finish_job(job_id, {"error": "AI API error: boom"})
+
+    job = get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "AI API error: boom"
+    assert job["result"] == {"error": "AI API error: boom"}
+
+def test_queue_position_while_queued():
+    first = enqueue_job("generate_ai_report", {})
+    second = enqueue_job("generate_ai_report", {})
+    assert get_job(first)["queuePosition"] == 0
+    assert get_job(second)["queuePosition"] == 1
+    assert get_job("missing") is None
+
+def test_serve_queue_runs_jobs_and_backs_off_when_idle(monkeypatch):
+    monkeypatch.setattr(aiWorker, "QUEUE_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(aiWorker, "QUEUE_IDLE_POLL_SECONDS", 0.05)
+    claims = []
+    real_claim = aiWorker.claim_job
+    monkeypatch.setattr(aiWorker, "claim_job", lambda worker_id: claims.append(worker_id) or real_claim(worker_id))
+    jobs = [enqueue_job("ping", None) for _ in range(3)]
+
+    stop = threading.Event()
+    threading.Timer(0.5, stop.set).start()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        aiWorker.serve_queue(executor, 2, stop=stop)
+
+    assert [get_job(job_id)["result"] for job_id in jobs] == ["pong"] * 3
+    # Without backoff, 0.5 s of polling every 0.01 s would be ~50 claims
+    assert len(claims) < 20
+    assert len(set(claims)) == len(claims)
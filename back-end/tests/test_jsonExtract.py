@@ -0,0 +1,42 @@
+import json
+import pytest
+from jsonExtract import extract_json
+
+OBJECT = {"questions": [{"id": 1, "text": "Why [this] {that}?"}], "note": "a \"quoted\" } brace"}
+
+@pytest.mark.parametrize("text", [
+    json.dumps(OBJECT),
+    "Here is the form:\n```json\n" + json.dumps(OBJECT, indent=2) + "\n```\nLet me know!",
+    "Sure! " + json.dumps(OBJECT) + " Anything else?",
+    "```\n" + json.dumps(OBJECT) + "\n```"
+])
+def test_object_is_found_in_surrounding_text(text):
+    assert extract_json(text) == OBJECT
+
+def test_arrays_are_returned_too():
+    assert extract_json("Result: [1, 2, {\"a\": [3]}]") == [1, 2, {"a": [3]}]
+
+def test_malformed_candidate_is_skipped():
+    text = 'Draft: {"a": 1,} and the final answer {"b": 2}'
+    assert extract_json(text) == {"b": 2}
+
+def test_brackets_in_prose_strings_are_skipped():
+    text = 'The {"hint": "use [brackets]"} format, so: {"ok": true}'
+    assert extract_json(text) == {"hint": "use [brackets]"}
+
+@pytest.mark.parametrize("text", [
+    '{"questions": [{"id": 1}, {"id": 2',
+    '{"questions": [{"id": 1}], "note": "cut off',
+    '```json\n{"a": {"b": 1}'
+])
+def test_truncated_response_returns_none_not_a_fragment(text):
+    assert extract_json(text) is None
+
+@pytest.mark.parametrize("text", [None, "", "no json here", "only a } closing brace"])
+def test_no_json(text):
+    assert extract_json(text) is None
+
+def test_long_malformed_input_stays_linear():
+    # Many broken candidates in a row: each is skipped by one bracket scan
+    text = '{"a": 1,} ' * 20000 + '{"done": true}'
+    assert extract_json(text) == {"done": True}
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from lexiconSentiment import count_labels, label_scores, label_texts, score_texts, with_label
+
+@pytest.mark.parametrize("text, label", [
+    ("Great product!", "positive"),
+    ("Excellent quality, love it", "positive"),
+    ("Terrible, it broke in a week", "negative"),
+    ("not comfortable", "negative"),
+    ("I don't like the color", "negative"),
+    ("Not bad at all", "positive"),
+    ("a bit too tight", "negative"),
+    ("It arrived on Tuesday", "neutral"),
+    ("", "neutral")
+])
+def test_labels(text, label):
+    assert label_texts([text]) == [label]
+
+def test_scores_are_bounded_and_ordered():
+    scores = score_texts(["good", "very good", "AMAZING!!! best ever, love it", "awful, worst purchase, hate it"])
+    assert np.all(np.abs(scores) <= 1)
+    assert scores[0] < scores[1] < scores[2]
+    assert scores[3] < 0
+
+def test_negation_does_not_cross_clauses():
+    assert label_texts(["Not cheap. But great quality"]) == ["positive"]
+
+def test_label_scores_threshold():
+    assert label_scores([0.25, 0.2, -0.2, -0.25]).tolist() == ["positive", "neutral", "neutral", "negative"]
+
+def test_count_labels_and_prompt_tags():
+    labels = label_texts(["Great", "Awful", "Okay I guess", "Love it"])
+    assert count_labels(labels) == {"positive": 2, "negative": 1, "neutral": 1}
+    assert with_label("Great", "positive") == "Great [positive]"
+    assert with_label("Tuesday", "neutral") == "Tuesday"
@@ -0,0 +1,57 @@
+import pytest
+import groqClient
+import modelRouter
+from llmCache import LLMCache, cache_key
+
+MESSAGES = [{"role": "user", "content": 'Return JSON with "followUpQuestions"'}]
+
+@pytest.fixture
+def cache(fake_groq, monkeypatch):
+    cache = LLMCache()
+    monkeypatch.setattr(groqClient, "get_cache", lambda: cache)
+    monkeypatch.setattr(fake_groq, "bad_json_models", {"bad-model"})
+    return cache
+
+def test_hits_and_misses(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    key = cache_key("model", MESSAGES, 0.3)
+    assert cache.get(key) is None
+    cache.set(key, "response")
+    assert cache.get(key) == "response"
+    assert cache_key("model", MESSAGES, 0.7) != key
+
+def test_accepted_completion_is_cached(cache, fake_groq):
+    requests = fake_groq.snapshot()["requests"]
+    text, cached = groqClient.complete_with_source(MESSAGES, model="good-model", accept=lambda text: True)
+    assert not cached
+    assert groqClient.complete_with_source(MESSAGES, model="good-model") == (text, True)
+    assert fake_groq.snapshot()["requests"] == requests + 1
+
+def test_rejected_completion_is_not_cached(cache, fake_groq):
+    groqClient.complete_with_source(MESSAGES, model="good-model", accept=lambda text: False)
+    assert cache.get(cache_key("good-model", MESSAGES, 0.3)) is None
+
+def test_cached_entry_the_caller_rejects_is_a_miss(cache, fake_groq):
+    cache.set(cache_key("good-model", MESSAGES, 0.3), "not json")
+    text, cached = groqClient.complete_with_source(
+        MESSAGES, model="good-model", accept=lambda text: text.startswith("{")
+    )
+    assert not cached
+    assert cache.get(cache_key("good-model", MESSAGES, 0.3)) == text
+
+def test_complete_json_caches_only_usable_json(cache, fake_groq, monkeypatch):
+    # Without JSON mode the bad model answers with truncated JSON
+    monkeypatch.setattr(modelRouter, "JSON_MODE", False)
+    json_data, _ = modelRouter.complete_json(
+        "followup", MESSAGES, required=("followUpQuestions",), models=["bad-model", "good-model"]
+    )
+    assert json_data["followUpQuestions"]
+    assert cache.get(cache_key("bad-model", MESSAGES, 0.3)) is None
+    assert cache.get(cache_key("good-model", MESSAGES, 0.3)) is not None
+
+def test_streamed_text_is_cached_only_when_accepted(cache, fake_groq):
+    "".join(groqClient.stream_complete(MESSAGES, model="bad-model", accept=lambda text: False))
+    assert cache.get(cache_key("bad-model", MESSAGES, 0.3)) is None
+
+    text = "".join(groqClient.stream_complete(MESSAGES, model="good-model", accept=lambda text: True))
+    assert cache.get(cache_key("good-model", MESSAGES, 0.3)) == text
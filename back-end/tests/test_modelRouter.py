@@ -0,0 +1,80 @@
+import pytest
+import modelRouter
+from fakeGroq import FORM
+from modelRouter import stream_json
+
+FORM_MESSAGES = [{"role": "user", "content": 'Return JSON with "questions"'}]
+
+@pytest.fixture
+def bad_model(fake_groq, monkeypatch):
+    monkeypatch.setattr(fake_groq, "bad_json_models", {"bad-model"})
+    monkeypatch.setattr(fake_groq, "chunk_delay", 0)
+    return fake_groq
+
+def _stream(task, events):
+    return stream_json(
+        task, FORM_MESSAGES, 0.3, ("questions",),
+        lambda key, index, item: events.append((key, index, item["questionId"])),
+        required=("questions",),
+        on_reset=lambda: events.append("reset")
+    )
+
+def test_escalated_stream_resets_and_resends_items(bad_model, monkeypatch):
+    monkeypatch.setitem(modelRouter.ROUTES, "stream_reset", ["bad-model", "good-model"])
+    events = []
+    json_data, _ = _stream("stream_reset", events)
+
+    assert json_data == FORM
+    reset = events.index("reset")
+    # The truncated attempt got some questions out before it failed
+    assert 0 < reset < len(FORM["questions"])
+    assert events[reset + 1:] == [("questions", i, q["questionId"]) for i, q in enumerate(FORM["questions"])]
+
+def test_usable_stream_has_no_reset(bad_model, monkeypatch):
+    monkeypatch.setitem(modelRouter.ROUTES, "stream_ok", ["good-model", "bad-model"])
+    events = []
+    json_data, _ = _stream("stream_ok", events)
+    assert json_data == FORM
+    assert events == [("questions", i, q["questionId"]) for i, q in enumerate(FORM["questions"])]
+
+def test_json_mode_rejection_escalates(bad_model):
+    json_data, raw_text = modelRouter.complete_json(
+        "cascade_reject", FORM_MESSAGES, required=("questions",), models=["bad-model", "good-model"]
+    )
+    assert json_data == FORM
+    assert raw_text
+
+    stats = modelRouter.model_stats()["tasks"]["cascade_reject"]
+    assert stats["escalations"] == 1
+    assert stats["models"]["bad-model"]["parseFailures"] == 1
+    assert stats["models"]["good-model"]["successes"] == 1
+    assert stats["models"]["good-model"]["successRate"] == 1
+
+def test_truncated_json_escalates_without_json_mode(bad_model, monkeypatch):
+    monkeypatch.setattr(modelRouter, "JSON_MODE", False)
+    json_data, _ = modelRouter.complete_json(
+        "cascade_truncated", FORM_MESSAGES, required=("questions",), models=["bad-model", "good-model"]
+    )
+    assert json_data == FORM
+    assert modelRouter.model_stats()["tasks"]["cascade_truncated"]["escalations"] == 1
+
+def test_first_usable_answer_stops_the_cascade(bad_model):
+    requests = bad_model.snapshot()["requests"]
+    modelRouter.complete_json("cascade_first", FORM_MESSAGES, required=("questions",), models=["good-model", "bad-model"])
+    assert bad_model.snapshot()["requests"] == requests + 1
+    assert modelRouter.model_stats()["tasks"]["cascade_first"]["escalations"] == 0
+
+def test_missing_required_key_fails_every_model(bad_model):
+    json_data, raw_text = modelRouter.complete_json(
+        "cascade_missing", FORM_MESSAGES, required=("followUpQuestions",), models=["good-model", "other-model"]
+    )
+    assert json_data is None
+    assert '"questions"' in raw_text
+    assert modelRouter.model_stats()["tasks"]["cascade_missing"]["escalations"] == 1
+
+def test_route_overrides(monkeypatch):
+    monkeypatch.setenv("AI_MODEL_ROUTES", '{"default": "small", "report": ["large", "larger"], "bad": []}')
+    routes = modelRouter._load_routes()
+    assert routes == {"default": ["small"], "report": ["large", "larger"]}
+    monkeypatch.setenv("AI_MODEL_ROUTES", "not json")
+    assert modelRouter._load_routes() == {"default": modelRouter.DEFAULT_ROUTE}
@@ -0,0 +1,32 @@
+from aiCounters import read_counters
+from followUpRules import rule_stats
+from precomputeFollowUps import choice_pairs, precompute_followups
+
+QUESTIONS = [
+    {"questionId": "q1", "question": "How was the fit?", "inputType": "radio", "options": ["Excellent", "Runs small"]},
+    {"questionId": "q2", "question": "Anything else?", "inputType": "textarea"}
+]
+
+def _cache_counts():
+    counters = read_counters("followup_cache.")
+    return counters.get("followup_cache.hits", 0), counters.get("followup_cache.misses", 0)
+
+def test_choice_pairs():
+    assert [(question["questionId"], option) for question, option in choice_pairs(QUESTIONS)] == [
+        ("q1", "Excellent"), ("q1", "Runs small")
+    ]
+
+def test_second_run_finds_every_pair_answered(fake_groq):
+    first = precompute_followups("form-1", QUESTIONS)
+    assert (first["pairs"], first["ruleHits"], first["generated"]) == (2, 1, 1)
+    second = precompute_followups("form-1", QUESTIONS)
+    assert (second["ruleHits"], second["cached"], second["generated"]) == (1, 1, 0)
+
+def test_precompute_leaves_the_hit_rates_alone(fake_groq):
+    cache = _cache_counts()
+    rules = rule_stats()
+    precompute_followups("form-1", QUESTIONS)
+    precompute_followups("form-1", QUESTIONS)
+
+    assert _cache_counts() == cache
+    assert (rule_stats()["hits"], rule_stats()["misses"]) == (rules["hits"], rules["misses"])
@@ -0,0 +1,56 @@
+import pytest
+from promptBudget import PromptPacker, count_tokens, truncate_to_tokens
+
+@pytest.mark.parametrize("text, tokens", [
+    ("", 0),
+    (None, 0),
+    ("Hello world", 2),
+    ("Hello, world!", 4),
+    ("It's 12345 dollars", 6),
+    ("extraordinarily", 3)
+])
+def test_count_tokens(text, tokens):
+    assert count_tokens(text) == tokens
+
+def test_short_text_is_not_truncated():
+    assert truncate_to_tokens("Fits easily", 10) == ("Fits easily", False)
+
+def test_long_text_keeps_its_start_and_end():
+    text = "Start of the answer. " + "filler words here " * 200 + "The point is at the end."
+    short, truncated = truncate_to_tokens(text, 50)
+    assert truncated
+    assert short.startswith("Start of the answer.")
+    assert short.endswith("at the end.")
+    assert "characters truncated...]" in short
+    assert count_tokens(short) <= 70
+
+def test_packer_drops_sections_past_the_budget():
+    packer = PromptPacker(budget_tokens=11)
+    # 6, 4, 5 and 1 tokens (a trailing space is a token of its own)
+    assert packer.add("one two three four five ")
+    assert packer.add("six seven eight ")
+    assert not packer.add("nine ten eleven twelve ")
+    assert packer.add("end")
+
+    assert packer.text() == "one two three four five six seven eight end"
+    usage = packer.usage()
+    assert (usage["includedItems"], usage["droppedItems"]) == (3, 1)
+    assert usage["includedTokens"] == 11
+    assert usage["droppedTokens"] == 5
+
+def test_first_section_is_kept_even_when_over_budget():
+    packer = PromptPacker(budget_tokens=1)
+    assert packer.add("far more than one token")
+    assert not packer.add("x")
+
+def test_record_skip_and_truncated_answers():
+    packer = PromptPacker(budget_tokens=100)
+    packer.record(40, items=2)
+    packer.skip(30, items=3)
+    packer.truncate_answer("word " * 100, max_tokens=10)
+    packer.truncate_answer("short", max_tokens=10)
+
+    usage = packer.usage()
+    assert usage["includedTokens"] == 40
+    assert (usage["includedItems"], usage["droppedItems"], usage["droppedTokens"]) == (2, 3, 30)
+    assert usage["truncatedAnswers"] == 1
@@ -0,0 +1,95 @@
+import threading
+import pytest
+import groqClient
+from rateLimiter import TokenBucket, parse_duration, parse_int
+
+def test_reserve_within_capacity_does_not_wait():
+    bucket = TokenBucket(3, period=60)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+
+def test_reserve_past_capacity_waits_for_the_refill():
+    bucket = TokenBucket(2, period=60)
+    bucket.reserve(2)
+    # One unit refills every 30 s; callers queue up behind each other
+    assert bucket.reserve() == pytest.approx(30, abs=0.1)
+    assert bucket.reserve() == pytest.approx(60, abs=0.1)
+
+def test_oversized_request_is_capped_at_capacity():
+    bucket = TokenBucket(10, period=60)
+    assert bucket.reserve(50) == 0
+    assert bucket.reserve(10) == pytest.approx(60, abs=0.1)
+
+def test_refund_returns_units():
+    bucket = TokenBucket(10, period=60)
+    bucket.reserve(10)
+    bucket.refund(4)
+    assert bucket.reserve(4) == 0
+    assert bucket.reserve(1) > 0
+
+def test_pause_blocks_even_with_units_left():
+    bucket = TokenBucket(100, period=60)
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5, abs=0.1)
+
+def test_sync_adopts_the_server_budget():
+    bucket = TokenBucket(100, period=60)
+    bucket.sync(remaining=0, reset_seconds=7)
+    assert bucket.reserve() == pytest.approx(7, abs=0.1)
+
+    bucket = TokenBucket(100, period=60)
+    bucket.sync(limit=6000)
+    assert bucket.capacity == 6000
+    assert bucket.rate == pytest.approx(100)
+
+def test_concurrent_reservations_are_spread_out():
+    bucket = TokenBucket(5, period=5)
+    waits = []
+    lock = threading.Lock()
+
+    def reserve():
+        wait = bucket.reserve()
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=reserve) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    waits.sort()
+    assert waits[:5] == [0] * 5
+    assert waits[5:] == pytest.approx([1, 2, 3, 4, 5], abs=0.1)
+
+@pytest.mark.parametrize("value, seconds", [
+    ("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600), ("2", 2.0), (3, 3.0),
+    (None, None), ("soon", None)
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+def test_parse_int():
+    assert parse_int("42") == 42
+    assert parse_int("42.9") == 42
+    assert parse_int(None) is None
+    assert parse_int("many") is None
+
+@pytest.fixture
+def settled(fake_groq, monkeypatch):
+    """Records the (reserved, used) token counts each call settles the bucket with."""
+    calls = []
+    monkeypatch.setattr(fake_groq, "chunk_delay", 0)
+    monkeypatch.setattr(groqClient, "_settle_tokens", lambda reserved, used: calls.append((reserved, used)))
+    return calls
+
+STREAM_MESSAGES = [{"role": "user", "content": 'Return JSON with "questions"'}]
+
+def test_stream_settles_with_the_reported_usage(settled):
+    text = "".join(groqClient.stream_complete(STREAM_MESSAGES))
+    prompt = len(STREAM_MESSAGES[0]["content"]) // 4 + 1
+    assert settled == [(groqClient.estimate_request_tokens(STREAM_MESSAGES), prompt + len(text) // 4)]
+
+def test_stream_without_usage_settles_with_the_estimate(settled, fake_groq, monkeypatch):
+    monkeypatch.setattr(fake_groq, "stream_usage", False)
+    text = "".join(groqClient.stream_complete(STREAM_MESSAGES))
+    reserved = groqClient.estimate_request_tokens(STREAM_MESSAGES)
+    assert settled == [(reserved, reserved - groqClient.COMPLETION_TOKEN_ESTIMATE + len(text) // 4 + 1)]
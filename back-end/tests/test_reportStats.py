@@ -0,0 +1,46 @@
+from reportStats import ReportStatistics, merge_totals, statistics_from_totals
+
+FORM = {
+    "questions": [
+        {"questionId": "q1", "question": "Quality?", "inputType": "radio", "options": ["Excellent", "Good", "Average", "Poor"]},
+        {"questionId": "q2", "question": "Service?", "inputType": "radio", "options": ["Excellent", "Good", "Average", "Poor"]},
+        {"questionId": "q3", "question": "Rate us", "inputType": "rating", "options": ["1", "2", "3", "4", "5"]}
+    ]
+}
+
+def _observe(stats, answers):
+    stats.observe({"responses": [{"questionId": question, "answer": answer} for question, answer in answers.items()]})
+
+def test_distribution_is_kept_per_question():
+    stats = ReportStatistics(FORM)
+    for _ in range(200):
+        _observe(stats, {"q1": "Good", "q2": "Poor"})
+    for rating in "12345":
+        _observe(stats, {"q3": rating})
+
+    distribution = stats.totals()["responseDistribution"]
+    assert distribution["Quality?"] == {"excellent": 0, "good": 200, "average": 0, "poor": 0}
+    assert distribution["Service?"] == {"excellent": 0, "good": 0, "average": 0, "poor": 200}
+    assert distribution["Rate us"] == {"excellent": 1, "good": 1, "average": 1, "poor": 2}
+    assert stats.total == 205
+
+def test_unanswered_questions_are_left_out():
+    stats = ReportStatistics(FORM)
+    _observe(stats, {"q1": "Excellent"})
+    assert list(stats.totals()["responseDistribution"]) == ["Quality?"]
+
+def test_merge_totals_adds_nested_counts():
+    stored = {"totalSubmissions": 2, "responseDistribution": {"Quality?": {"good": 2, "poor": 0}}}
+    new = {"totalSubmissions": 1, "responseDistribution": {"Quality?": {"good": 0, "poor": 1}, "Rate us": {"good": 1}}}
+    assert merge_totals(stored, new) == {
+        "totalSubmissions": 3,
+        "responseDistribution": {"Quality?": {"good": 2, "poor": 1}, "Rate us": {"good": 1}}
+    }
+
+def test_statistics_from_merged_totals():
+    first, second = ReportStatistics(FORM), ReportStatistics(FORM)
+    _observe(first, {"q1": "Excellent"})
+    _observe(second, {"q1": "Poor"})
+    statistics = statistics_from_totals(merge_totals(first.totals(), second.totals()))["statistics"]
+    assert statistics["averageRating"] == 3.5
+    assert statistics["responseDistribution"] == {"Quality?": {"excellent": 1, "good": 0, "average": 0, "poor": 1}}
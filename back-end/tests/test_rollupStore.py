@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, timezone
+import pytest
+from formAnalytics import form_analytics
+from rollupStore import compact, read_dashboard, rebuild_form, record_submission
+
+FORM = {"questions": [
+    {"questionId": "q1", "question": "Quality?", "inputType": "radio", "options": ["Excellent", "Poor"]},
+    {"questionId": "q2", "question": "Anything else?", "inputType": "textarea"}
+]}
+DAY = 24 * 60 * 60
+# Noon today (UTC), so hourly buckets never straddle midnight
+NOON = int(time.time()) // DAY * DAY + 12 * 60 * 60
+
+def _iso(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()
+
+def _submission(submission_id, seconds, quality, comment=""):
+    return {
+        "_id": submission_id,
+        "completedAt": _iso(seconds),
+        "responses": [{"questionId": "q1", "answer": quality}, {"questionId": "q2", "answer": comment}]
+    }
+
+SUBMISSIONS = [
+    _submission("s1", NOON - 2 * DAY, "Excellent", "Love it, great quality"),
+    _submission("s2", NOON - 2 * DAY + 60, "poor", "Terrible, it broke"),
+    _submission("s3", NOON - DAY, "Excellent"),
+    _submission("s4", NOON - 60 * 60, "Poor", "Awful stitching")
+]
+
+@pytest.fixture
+def recorded():
+    for submission in SUBMISSIONS:
+        assert record_submission("form-1", submission, FORM)
+    return read_dashboard("form-1")
+
+def test_read_matches_a_full_scan(recorded):
+    expected = form_analytics(FORM, SUBMISSIONS)
+    assert recorded["totalSubmissions"] == 4
+    assert recorded["sentiment"] == expected["sentiment"]
+    assert recorded["responseTrend"] == expected["responseTrend"]
+    assert recorded["negativeResponses"] == expected["negativeResponses"]
+    assert recorded["questions"] == {"q1": {"counts": {"Excellent": 2, "Poor": 2}}}
+
+def test_replayed_submission_is_ignored(recorded):
+    assert not record_submission("form-1", SUBMISSIONS[0], FORM)
+    assert read_dashboard("form-1")["totalSubmissions"] == 4
+
+def test_compaction_keeps_daily_totals(recorded):
+    assert compact(older_than_days=0, now=NOON + DAY) == 3
+    assert read_dashboard("form-1") == recorded
+    # Compacted ranges can no longer be read per hour
+    hourly = read_dashboard("form-1", granularity="hour")
+    assert hourly["totalSubmissions"] == 4
+    assert len(hourly["responseTrend"]["trendData"]) == 24 * 2 + 1
+
+def test_hourly_read_and_time_range(recorded):
+    hourly = read_dashboard("form-1", granularity="hour", start=NOON - DAY - 60 * 60)
+    assert hourly["totalSubmissions"] == 2
+    trend = hourly["responseTrend"]["trendData"]
+    assert trend[0] == {"date": _iso(NOON - DAY)[:16], "value": 1}
+    assert trend[-1]["value"] == 1
+    assert read_dashboard("form-1", end=NOON - DAY)["totalSubmissions"] == 2
+
+def test_rebuild_replaces_the_rollups(recorded):
+    assert rebuild_form("form-1", FORM, SUBMISSIONS[:2]) == {"formId": "form-1", "submissions": 2}
+    rebuilt = read_dashboard("form-1")
+    assert rebuilt["totalSubmissions"] == 2
+    assert rebuilt["questions"]["q1"]["counts"] == {"Excellent": 1, "Poor": 1}
+    # Rebuilt submissions count as recorded
+    assert not record_submission("form-1", SUBMISSIONS[1], FORM)
+    assert record_submission("form-1", SUBMISSIONS[2], FORM)
+
+def test_unknown_form_is_empty():
+    dashboard = read_dashboard("missing")
+    assert dashboard["totalSubmissions"] == 0
+    assert dashboard["responseTrend"]["trendData"] == []
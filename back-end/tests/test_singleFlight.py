@@ -0,0 +1,106 @@
+import threading
+import pytest
+import singleFlight
+from singleFlight import _claim, _connect, _lead, flight_key, single_flight
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(singleFlight, "POLL_SECONDS", 0.01)
+
+def _flight(key):
+    with _connect() as db:
+        return db.execute("SELECT owner, lease_until, generation, succeeded FROM flights WHERE key = ?", (key,)).fetchone()
+
+def test_flight_key_depends_on_every_part():
+    assert flight_key("report", "abc", 1) == flight_key("report", "abc", 1)
+    assert flight_key("report", "abc", 1) != flight_key("report", "abc", 2)
+    assert flight_key("report", "ab", "c") != flight_key("report", "a", "bc")
+
+def test_first_claim_leads_and_others_wait():
+    key = flight_key("task", "input")
+    assert _claim(key, "leader", None) == ("lead", None)
+    assert _claim(key, "other", None) == ("wait", 0)
+    # The leader re-claiming its own flight still leads
+    assert _claim(key, "leader", None) == ("lead", None)
+
+def test_expired_lease_is_taken_over():
+    key = flight_key("task", "input")
+    _claim(key, "leader", None)
+    with _connect() as db:
+        db.execute("UPDATE flights SET lease_until = 0 WHERE key = ?", (key,))
+    assert _claim(key, "other", None) == ("lead", None)
+    assert _flight(key)[0] == "other"
+
+def test_lead_publishes_result_for_later_claims():
+    key = flight_key("task", "input")
+    _claim(key, "leader", None)
+    assert _lead(key, "leader", lambda: {"value": 1}, None) == {"value": 1}
+
+    owner, lease_until, generation, succeeded = _flight(key)
+    assert (owner, lease_until, generation, succeeded) == (None, 0, 1, 1)
+    assert _claim(key, "other", None) == ("result", {"value": 1})
+
+def test_old_result_is_not_reused(monkeypatch):
+    key = flight_key("task", "input")
+    _claim(key, "leader", None)
+    _lead(key, "leader", lambda: {"value": 1}, None)
+    monkeypatch.setattr(singleFlight, "RESULT_TTL_SECONDS", -1)
+    assert _claim(key, "other", None) == ("lead", None)
+
+def test_error_result_is_published_but_not_reused():
+    key = flight_key("task", "input")
+    _claim(key, "leader", None)
+    assert _lead(key, "leader", lambda: {"error": "failed"}, None) == {"error": "failed"}
+    assert _flight(key)[3] == 0
+    assert _claim(key, "other", None) == ("lead", None)
+
+def test_failed_compute_releases_the_claim():
+    key = flight_key("task", "input")
+    _claim(key, "leader", None)
+
+    def compute():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        _lead(key, "leader", compute, None)
+    owner, lease_until, generation, _ = _flight(key)
+    assert (owner, lease_until, generation) == (None, 0, 0)
+    assert _claim(key, "other", None) == ("lead", None)
+
+def test_stale_result_is_served_for_a_changed_input(monkeypatch):
+    monkeypatch.setattr(singleFlight, "STALE_SECONDS", 60)
+    old_key = flight_key("task", "old input")
+    _claim(old_key, "leader", "form-1")
+    _lead(old_key, "leader", lambda: {"value": "old"}, "form-1")
+
+    new_key = flight_key("task", "new input")
+    # Nobody runs the new input yet: serve the old result and claim the refresh
+    assert _claim(new_key, "first", "form-1") == ("revalidate", {"value": "old"})
+    # The refresh is in flight: serve the old result without claiming
+    assert _claim(new_key, "second", "form-1") == ("stale", {"value": "old"})
+    assert _flight(new_key)[0] == "first"
+
+def test_concurrent_requests_run_compute_once():
+    key = flight_key("task", "input")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"value": len(calls)}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight(key, compute)))
+    leader.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(single_flight(key, compute)))
+    waiter.start()
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert calls == [1]
+    assert results == [{"value": 1}, {"value": 1}]
@@ -0,0 +1,68 @@
+import json
+import random
+from streamJson import ArrayItemParser, collect_stream
+
+DOCUMENT = {
+    "title": "Feedback {form}",
+    "followUpQuestions": [
+        {"question": f"Why \"{i}\"? [a, b] {{c}} \\ done", "options": ["a", "b,c"], "meta": {"order": [i, i + 1]}}
+        for i in range(20)
+    ],
+    "questions": [{"id": i} for i in range(3)],
+    "other": [{"ignored": True}]
+}
+TEXT = "Here you go:\n```json\n" + json.dumps(DOCUMENT) + "\n```"
+
+def _split(text, pieces, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), pieces))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def _collect(chunks, keys=("followUpQuestions", "questions")):
+    items = []
+    text = collect_stream(chunks, keys, lambda key, index, item: items.append((key, index, item)))
+    return text, items
+
+def test_items_are_reported_in_order_for_any_chunking():
+    rng = random.Random(7)
+    expected = (
+        [("followUpQuestions", i, item) for i, item in enumerate(DOCUMENT["followUpQuestions"])]
+        + [("questions", i, item) for i, item in enumerate(DOCUMENT["questions"])]
+    )
+    for pieces in (0, 1, 5, 50, 500):
+        text, items = _collect(_split(TEXT, pieces, rng))
+        assert items == expected
+        assert text == TEXT
+
+def test_character_by_character():
+    text, items = _collect(list(TEXT))
+    assert len(items) == len(DOCUMENT["followUpQuestions"]) + len(DOCUMENT["questions"])
+    assert text == TEXT
+
+def test_items_are_reported_as_soon_as_they_close():
+    seen = []
+    parser = ArrayItemParser(["questions"], lambda key, index, item: seen.append(item))
+    parser.feed('{"questions": [{"id": 1}, {"id"')
+    assert seen == [{"id": 1}]
+    parser.feed(': 2}')
+    assert seen == [{"id": 1}, {"id": 2}]
+
+def test_other_keys_and_nested_arrays_are_ignored():
+    text = json.dumps({"other": [{"a": 1}], "wrapper": {"questions": [{"b": 2}]}, "questions": [[{"c": 3}], {"d": 4}]})
+    _, items = _collect([text], keys=("questions",))
+    assert items == [("questions", 0, {"d": 4})]
+
+def test_malformed_item_is_skipped():
+    _, items = _collect(['{"questions": [{"id": 1,}, {"id": 2}]}'], keys=("questions",))
+    assert items == [("questions", 0, {"id": 2})]
+
+def test_trailing_text_after_the_object_is_ignored():
+    text, items = _collect(['{"questions": [{"id": 1}]} and {"questions": [{"id": 2}]}'], keys=("questions",))
+    assert items == [("questions", 0, {"id": 1})]
+    assert text.endswith('{"id": 2}]}')
+
+def test_consumed_text_is_dropped():
+    parser = ArrayItemParser(["questions"], lambda *args: None)
+    for i in range(1000):
+        parser.feed(('{"questions": [' if i == 0 else ", ") + json.dumps({"id": i, "text": "x" * 50}))
+    assert len(parser.buffer) < 100
+    assert parser.text.count('"id"') == 1000
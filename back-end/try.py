@@ -1,21 +1,37 @@
 import sys
 import json
 import os
-import re
-from groq import Groq
+from modelRouter import complete_json
+from promptBudget import PromptPacker
+from lexiconSentiment import PROMPT_LABELS, PROMPT_LABELS_NOTE, count_labels, label_scores, with_label
+from reportStats import answer_polarities
+from aiMetrics import finish_call, start_call, timed
 
-def extract_json(text):
-    """Extracts valid JSON from a response string."""
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            return {"error": "AI response did not contain valid JSON"}
-    return {"error": "No JSON found in AI response"}
+# Token budget for the answers in one analysis prompt; answers past it are dropped
+FEEDBACK_PROMPT_TOKENS = int(os.getenv("FEEDBACK_PROMPT_TOKENS", 4000))
+
+def apply_sentiment_counts(analysis, counts):
+    """Overwrites the model's sentiment numbers with the locally computed counts."""
+    for key in ("sentiment", "positiveResponses", "negativeResponses"):
+        if not isinstance(analysis.get(key), dict):
+            analysis[key] = {}
+    analysis["sentiment"]["sentiment"] = dict(counts)
+    analysis["positiveResponses"]["total"] = counts["positive"]
+    analysis["negativeResponses"]["totalNegative"] = counts["negative"]
+    return analysis
 
 def analyze_feedback(feedback_data):
-    formatted_feedback = "\n".join([f"- {q['question']}: {q['answer']}" for q in feedback_data])
+    # Sentiment is counted locally over every answer, including any the prompt drops
+    labels = label_scores(answer_polarities([str(q['answer']) for q in feedback_data])).tolist()
+    counts = count_labels(labels)
+
+    packer = PromptPacker(FEEDBACK_PROMPT_TOKENS)
+    for q, label in zip(feedback_data, labels):
+        answer = packer.truncate_answer(q['answer'])
+        if PROMPT_LABELS:
+            answer = with_label(answer, label)
+        packer.add(f"- {q['question']}: {answer}\n")
+    formatted_feedback = (PROMPT_LABELS_NOTE if PROMPT_LABELS else "") + packer.text()
 
     prompt = f"""
 Analyze the following customer feedback responses and generate structured insights. Extract trends based on sentiment, urgency, and common themes.whenever we have a customer feedback. annalyse the answers and fill the following JSON format.
@@ -120,22 +136,27 @@ Make sure the response follows **exactly** the JSON format above. Only return th
     if not api_key:
         return {"error": "Missing GROQ_API key. Set the environment variable or pass it explicitly."}
     
-    client = Groq(api_key=api_key) 
-
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "system", "content": prompt},
-                      {"role": "user", "content": formatted_feedback}],
+        json_data, result_text = complete_json(
+            "feedback_analysis",
+            [{"role": "system", "content": prompt},
+             {"role": "user", "content": formatted_feedback}],
             temperature=0.2
         )
-        result_text = response.choices[0].message.content
-        return extract_json(result_text)
+        if result_text is None:
+            return {"error": "No valid response from AI"}
+        if json_data is None:
+            return {"error": "AI response did not contain valid JSON"}
+        if isinstance(json_data, dict):
+            apply_sentiment_counts(json_data, counts)
+            json_data["promptUsage"] = packer.usage()
+        return json_data
 
     except Exception as e:
         return {"error": str(e)}
 
 if __name__ == "__main__":
+    metrics = start_call("analyze_feedback")
     try:
         # Validate that the input is passed correctly as a JSON string
         if len(sys.argv) < 2:
@@ -143,7 +164,8 @@ if __name__ == "__main__":
             sys.exit(1)
 
         # Parse the input JSON
-        input_data = json.loads(sys.argv[1])
+        with timed("parse"):
+            input_data = json.loads(sys.argv[1])
 
         # Check if the "questions" key is present
         if "questions" not in input_data:
@@ -153,7 +175,7 @@ if __name__ == "__main__":
         # Proceed with analyzing the feedback
         feedback_data = input_data["questions"]
         output = analyze_feedback(feedback_data)
-        print(json.dumps(output, indent=2))  # Ensure only valid JSON is printed
+        print(json.dumps(finish_call(metrics, output), indent=2))  # Ensure only valid JSON is printed
 
     except json.JSONDecodeError:
         print(json.dumps({"error": "Invalid JSON format. Please ensure the input is valid JSON."}))
@@ -0,0 +1,169 @@
+// Client for the long-running Python AI worker (aiWorker.py).
+//
+// Routes hand their AI tasks to persistent `aiWorker.py` processes over
+// JSON lines on stdin/stdout instead of spawning an interpreter per request,
+// so the groq client, its TLS connections and the caches stay warm. There is
+// one worker per pool: 'interactive' for follow-ups and other requests a
+// respondent waits on, and 'batch' for reports, so a burst of long report
+// generations never takes the slots live follow-ups need. A worker is started
+// on first use and restarted if it exits; requests that were in flight when
+// it died are rejected.
+//
+// The server also supervises the queue workers (`aiWorker.py --queue`) that
+// run jobs queued with aiReport=queue.
+//
+//   AI_WORKER=0                 spawn one script per request instead
+//   AI_WORKER_CONCURRENCY       jobs the interactive worker runs at once (default 4)
+//   AI_BATCH_WORKER_CONCURRENCY jobs the batch worker runs at once (default 2)
+//   AI_WORKER_TIMEOUT_MS        per-request timeout (default 10 minutes)
+//   AI_QUEUE_WORKERS            queue worker processes to keep running (default 1, 0 = none)
+
+import { spawn } from 'child_process';
+import { join, dirname } from 'path';
+import { fileURLToPath } from 'url';
+import { existsSync } from 'fs';
+import { randomBytes } from 'crypto';
+
+const backEndDir = join(dirname(fileURLToPath(import.meta.url)), '..');
+
+const workerEnabled = process.env.AI_WORKER !== '0';
+const poolConcurrency = {
+  interactive: parseInt(process.env.AI_WORKER_CONCURRENCY || '4', 10),
+  batch: parseInt(process.env.AI_BATCH_WORKER_CONCURRENCY || '2', 10)
+};
+const requestTimeoutMs = parseInt(process.env.AI_WORKER_TIMEOUT_MS || String(10 * 60 * 1000), 10);
+const queueWorkerCount = parseInt(process.env.AI_QUEUE_WORKERS || '1', 10);
+const QUEUE_RESTART_DELAY_MS = 5000;
+
+const children = new Set();
+let shuttingDown = false;
+const pending = new Map();
+const workers = {};
+
+function pythonExecutable() {
+  const venvPython = join(backEndDir, 'venv', 'bin', 'python3');
+  return existsSync(venvPython) ? venvPython : "python3";
+}
+
+function spawnWorker(args) {
+  const child = spawn(pythonExecutable(), [join(backEndDir, 'aiWorker.py'), ...args], {
+    env: { ...process.env },
+    cwd: backEndDir
+  });
+  children.add(child);
+  child.on('exit', () => children.delete(child));
+  child.stderr.on('data', (data) => {
+    console.error('AI worker error:', data.toString());
+  });
+  return child;
+}
+
+function failPending(child, error) {
+  for (const [id, request] of pending) {
+    if (request.child === child) {
+      pending.delete(id);
+      clearTimeout(request.timer);
+      request.reject(error);
+    }
+  }
+}
+
+function handleLine(line) {
+  if (!line.trim()) return;
+  let response;
+  try {
+    response = JSON.parse(line);
+  } catch (error) {
+    console.error('AI worker sent invalid JSON:', line.substring(0, 200));
+    return;
+  }
+  const request = pending.get(response.id);
+  if (!request) return;
+  if (response.partial) {
+    if (request.onPartial) request.onPartial(response.partial);
+    return;
+  }
+  pending.delete(response.id);
+  clearTimeout(request.timer);
+  if (response.error) {
+    request.reject(new Error(response.error));
+  } else {
+    request.resolve(response.result);
+  }
+}
+
+function getWorker(pool) {
+  if (workers[pool]) return workers[pool];
+  if (!(pool in poolConcurrency)) throw new Error(`Unknown AI worker pool: ${pool}`);
+
+  const child = spawnWorker(['--concurrency', String(poolConcurrency[pool])]);
+  let buffered = '';
+  child.stdout.setEncoding('utf8');
+  child.stdout.on('data', (chunk) => {
+    buffered += chunk;
+    let newline;
+    while ((newline = buffered.indexOf('\n')) !== -1) {
+      handleLine(buffered.slice(0, newline));
+      buffered = buffered.slice(newline + 1);
+    }
+  });
+  child.stdin.on('error', (error) => {
+    console.error('AI worker stdin error:', error.message);
+  });
+  const stopped = (reason) => {
+    if (workers[pool] === child) delete workers[pool];
+    failPending(child, new Error(`AI worker stopped (${reason})`));
+  };
+  child.on('exit', (code, signal) => stopped(signal || `exit code ${code}`));
+  child.on('error', (error) => stopped(error.message));
+
+  workers[pool] = child;
+  return child;
+}
+
+// Runs one task on the `pool` worker; resolves with its result, rejects with
+// its error. onPartial receives {key, index, item} for streaming tasks, or
+// {reset: true} when the items so far were replaced and will be sent again.
+function callWorker(task, payload, { onPartial, pool = 'interactive' } = {}) {
+  return new Promise((resolve, reject) => {
+    const child = getWorker(pool);
+    const id = randomBytes(8).toString('hex');
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      reject(new Error(`AI worker timed out after ${requestTimeoutMs} ms`));
+    }, requestTimeoutMs);
+    pending.set(id, { resolve, reject, onPartial, child, timer });
+
+    const request = { id, task, payload };
+    if (onPartial) request.stream = true;
+    child.stdin.write(JSON.stringify(request) + '\n');
+  });
+}
+
+// Keeps AI_QUEUE_WORKERS `aiWorker.py --queue` processes running, restarting
+// any that exit, so jobs queued with aiReport=queue get picked up. With
+// --stop-on-eof they stop when this process dies and their stdin closes.
+function startQueueWorkers() {
+  for (let i = 0; i < queueWorkerCount; i++) {
+    const run = () => {
+      const child = spawnWorker(['--queue', '--stop-on-eof']);
+      child.stdout.resume();
+      child.on('exit', (code, signal) => {
+        if (shuttingDown) return;
+        console.error(`AI queue worker exited (${signal || `exit code ${code}`}), restarting`);
+        setTimeout(run, QUEUE_RESTART_DELAY_MS);
+      });
+      child.on('error', (error) => {
+        console.error('AI queue worker failed to start:', error.message);
+      });
+    };
+    run();
+  }
+}
+
+process.on('exit', () => {
+  shuttingDown = true;
+  children.forEach(child => child.kill());
+});
+
+export { workerEnabled, callWorker, startQueueWorkers, pythonExecutable };